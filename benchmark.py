@@ -0,0 +1,512 @@
+"""
+.. module:: benchmark module.
+:synopsis: Module contains benchmarks of the application, run with
+           'python benchmark.py [startup|triangulation]'. The startup
+           benchmark measures how long a fresh interpreter takes to load the
+           designer and the parser and fails if the time exceeds the budget.
+           The triangulation benchmark runs every engine on a corpus of
+           synthetic polygons, checks the results and fails if the fitted
+           complexity exponent exceeds the limit.
+
+.. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
+"""
+
+import argparse
+from math import cos, log, pi, sin
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+
+class TStartupBenchmark(object):
+    """
+    Class contains static methods measuring the cold-start time of the
+    application modules.
+    """
+
+    BUDGET = 0.5    #: maximal startup time in seconds.
+    REPEAT = 5      #: number of measurements, the shortest one is reported.
+    #: statements loading the measured parts of the application.
+    TARGETS = {"parser": "import parsetofile",
+               "designer": "import runpy; runpy.run_path('main.pyw', run_name = 'benchmark')"}
+
+    @staticmethod
+    def measure(statement, repeat = None):
+        """
+        Measure the wall time of starting a fresh interpreter and executing a
+        statement in the application directory.
+
+        :param statement: statement to be executed.
+        :type statement: string
+        :param repeat: number of measurements, defaults to REPEAT.
+        :type repeat: integer
+
+        :return: shortest measured time in seconds.
+        :rtype: float
+        """
+        if(repeat is None):
+            repeat = TStartupBenchmark.REPEAT
+        cwd = os.path.dirname(os.path.abspath(__file__))
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", statement], cwd = cwd, check = True)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    @staticmethod
+    def run(budget = None, repeat = None):
+        """
+        Measure startup time of all the targets and compare it with the budget.
+
+        :param budget: maximal startup time in seconds, defaults to BUDGET.
+        :type budget: float
+        :param repeat: number of measurements, defaults to REPEAT.
+        :type repeat: integer
+
+        :return: True if all the targets start within the budget, False
+                 otherwise.
+        :rtype: boolean
+        """
+        if(budget is None):
+            budget = TStartupBenchmark.BUDGET
+        within_budget = True
+        for name, statement in TStartupBenchmark.TARGETS.items():
+            elapsed = TStartupBenchmark.measure(statement, repeat)
+            status = "ok"
+            if(elapsed > budget):
+                status = "over budget"
+                within_budget = False
+            print("{}: {:.3f} s (budget {:.3f} s) {}".format(name, elapsed, budget, status))
+        return within_budget
+
+
+class TPolygonCorpus(object):
+    """
+    Class contains static methods generating synthetic simple polygons with
+    a given approximate number of vertices. Coordinates are integers, so
+    areas can be compared exactly, and vertices are in counterclockwise
+    order.
+    """
+
+    @staticmethod
+    def star(n, seed = 1):
+        """
+        Generate a star-shaped polygon with random radii.
+
+        :param n: number of vertices.
+        :type n: integer
+        :param seed: random generator seed.
+        :type seed: integer
+
+        :rtype: list of Vertex
+        """
+        from triangulate import Vertex
+        rnd = random.Random(seed)
+        radius = 100*n
+        points = []
+        for k in range(n):
+            alpha = (k + rnd.uniform(0.0, 0.9))*2*pi/n
+            r = rnd.uniform(0.2*radius, radius)
+            points.append(Vertex(round(r*cos(alpha)), round(r*sin(alpha))))
+        return points
+
+    @staticmethod
+    def comb(n):
+        """
+        Generate a comb with teeth of unit width, the worst case for
+        algorithms looking for ears among reflex vertices.
+
+        :param n: number of vertices, rounded down to a multiple of 4.
+        :type n: integer
+
+        :rtype: list of Vertex
+        """
+        from triangulate import Vertex
+        teeth = max(1, n//4)
+        height = 10
+        points = [Vertex(0, 0), Vertex(2*teeth - 1, 0)]
+        for k in range(teeth - 1, -1, -1):
+            points.append(Vertex(2*k + 1, height))
+            points.append(Vertex(2*k, height))
+            if(k > 0):
+                points.append(Vertex(2*k, 1))
+                points.append(Vertex(2*k - 1, 1))
+        return points
+
+    @staticmethod
+    def spiral(n):
+        """
+        Generate a band winding around its centre several times.
+
+        :param n: number of vertices, rounded down to an even number.
+        :type n: integer
+
+        :rtype: list of Vertex
+        """
+        from triangulate import Vertex
+        m = max(3, n//2)
+        turns = max(1, min(8, m//16))
+        step = 10*m     # distance between consecutive turns
+        outer = []
+        inner = []
+        for k in range(m):
+            t = 2*pi*turns*k/(m - 1)
+            r = step*(1 + t/(2*pi))
+            inner.append(Vertex(round(r*cos(t)), round(r*sin(t))))
+            outer.append(Vertex(round((r + step/2)*cos(t)), \
+                                round((r + step/2)*sin(t))))
+        return outer + inner[::-1]
+
+    @staticmethod
+    def random_polygon(n, seed = 1):
+        """
+        Generate a random simple polygon on random points by space
+        partitioning: the points are split by the line through two of them
+        and each half is connected by a chain, which recursively passes
+        through a random point and splits the remaining ones by a random
+        line through that point crossing the chain ends' segment. The chains
+        of the parts lie in disjoint convex regions, so they never cross.
+        Points collinear with the first two are dropped.
+
+        :param n: number of points.
+        :type n: integer
+        :param seed: random generator seed.
+        :type seed: integer
+
+        :rtype: list of Vertex
+        """
+        from triangulate import Vertex
+        rnd = random.Random(seed)
+        size = 100*n
+        coordinates = set()
+        while(len(coordinates) < max(n, 3)):
+            coordinates.add((rnd.randint(0, size), rnd.randint(0, size)))
+        coordinates = sorted(coordinates)
+        rnd.shuffle(coordinates)
+
+        def side(a, b, p):
+            """
+            Calculate the orientation of a point relative to a directed line.
+
+            :rtype: float
+            """
+            return (b[0] - a[0])*(p[1] - a[1]) - (b[1] - a[1])*(p[0] - a[0])
+
+        def chain(a, b, inner):
+            """
+            Connect two points by a chain through the given ones.
+
+            :param a: first chain point.
+            :type a: tuple
+            :param b: last chain point.
+            :type b: tuple
+            :param inner: points lying in a convex region with a and b on its
+                          boundary.
+            :type inner: list of tuple
+
+            :return: chain points without the last one.
+            :rtype: list of tuple
+            """
+            result = []
+            stack = [(a, b, inner)]
+            while(stack):
+                a, b, inner = stack.pop()
+                if(not inner):
+                    result.append(a)
+                    continue
+                c = inner.pop(rnd.randrange(len(inner)))
+                t = rnd.random()
+                u = (a[0] + t*(b[0] - a[0]), a[1] + t*(b[1] - a[1]))
+                a_side = side(c, u, a) > 0
+                first = []
+                second = []
+                for p in inner:
+                    if((side(c, u, p) > 0) == a_side):
+                        first.append(p)
+                    else:
+                        second.append(p)
+                stack.append((c, b, second))
+                stack.append((a, c, first))
+            return result
+
+        s, t = coordinates[0], coordinates[1]
+        upper = [p for p in coordinates[2:] if side(s, t, p) > 0]
+        lower = [p for p in coordinates[2:] if side(s, t, p) < 0]
+        points = chain(s, t, upper) + chain(t, s, lower)
+        area = 0
+        for i in range(len(points)):
+            area += side((0, 0), points[i - 1], points[i])
+        if(area < 0):
+            points.reverse()
+        return [Vertex(x, y) for x, y in points]
+
+    @staticmethod
+    def staircase(n):
+        """
+        Generate a rectilinear staircase.
+
+        :param n: number of vertices, rounded down to an even number.
+        :type n: integer
+
+        :rtype: list of Vertex
+        """
+        from triangulate import Vertex
+        steps = max(1, (n - 2)//2)
+        points = [Vertex(0, 0), Vertex(steps, 0)]
+        for k in range(1, steps + 1):
+            points.append(Vertex(steps - k + 1, k))
+            points.append(Vertex(steps - k, k))
+        return points
+
+    #: names and generators of the polygon families.
+    SHAPES = {"star": star.__func__,
+              "comb": comb.__func__,
+              "spiral": spiral.__func__,
+              "random": random_polygon.__func__,
+              "staircase": staircase.__func__}
+
+
+class TTriangulationBenchmark(object):
+    """
+    Class contains static methods measuring the triangulation engines on the
+    polygon corpus.
+    """
+
+    SIZES = (10, 100, 1000, 10000, 100000)  #: approximate numbers of vertices.
+    FIT_MIN_SIZE = 1000                     #: smallest size used to fit the exponent.
+    MAX_EXPONENT = 1.5                      #: maximal accepted complexity exponent.
+    #: engines with their own exponent limits, ear clipping is quadratic in
+    #: the worst case and chosen only for small polygons.
+    ENGINE_MAX_EXPONENT = {"earclipping": 2.2}
+    ENGINE_MAX_SIZE = {"earclipping": 10000}    #: largest polygons given to engines.
+
+    @staticmethod
+    def doubled_area(points, i, j, k):
+        """
+        Calculate the doubled signed area of a triangle.
+
+        :param points: polygon vertices with integer coordinates.
+        :type points: list of Vertex
+        :param i: first vertex index.
+        :type i: integer
+        :param j: second vertex index.
+        :type j: integer
+        :param k: third vertex index.
+        :type k: integer
+
+        :rtype: integer
+        """
+        a, b, c = points[i], points[j], points[k]
+        return (b.x - a.x)*(c.y - a.y) - (b.y - a.y)*(c.x - a.x)
+
+    @staticmethod
+    def covers(points, triangles):
+        """
+        Check that triangles exactly cover the polygon: there are n - 2 of
+        them, all counterclockwise, and every triangle edge is either
+        a polygon edge in its direction or a diagonal traversed once in each
+        direction. The triangle boundaries then add up to the polygon
+        boundary, so the number of triangles covering any point equals its
+        winding number, 1 inside the polygon and 0 outside: the triangles
+        neither overlap nor leave gaps. Integer arithmetic is used, so the
+        check is exact.
+
+        :param points: polygon vertices with integer coordinates in
+                       counterclockwise order.
+        :type points: list of Vertex
+        :param triangles: triangles as triples of vertex indices.
+        :type triangles: list of tuple
+
+        :rtype: boolean
+        """
+        n = len(points)
+        if(len(triangles) != n - 2):
+            return False
+        # Directed edges counted +1 one way and -1 the other way, the
+        # polygon edges are subtracted, so a sum of zero everywhere means
+        # the boundaries cancel out
+        edges = {}
+
+        def add(a, b, count):
+            """
+            Add a directed edge to the balance.
+            """
+            key = (a, b) if a < b else (b, a)
+            edges[key] = edges.get(key, 0) + (count if a < b else -count)
+
+        for i in range(n):
+            add(i, (i + 1)%n, -1)
+        for i, j, k in triangles:
+            if(TTriangulationBenchmark.doubled_area(points, i, j, k) <= 0):
+                return False
+            add(i, j, 1)
+            add(j, k, 1)
+            add(k, i, 1)
+        return not any(edges.values())
+
+    @staticmethod
+    def measure(engine, points):
+        """
+        Triangulate a polygon, once to measure the time and once more to
+        measure the peak memory, as tracing allocations slows the engine
+        down.
+
+        :param engine: examined triangulation engine.
+        :type engine: TriangulationEngine
+        :param points: polygon vertices.
+        :type points: list of Vertex
+
+        :return: time in seconds, peak memory in bytes, number of triangles
+                 and the coverage check result.
+        :rtype: tuple
+        """
+        start = time.perf_counter()
+        triangles = engine.triangulate(points)
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        try:
+            engine.triangulate(points)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return elapsed, peak, len(triangles), \
+               TTriangulationBenchmark.covers(points, triangles)
+
+    @staticmethod
+    def exponent(sizes, times):
+        """
+        Fit the exponent k of the model time = c*n^k with the least squares
+        method in the log-log scale.
+
+        :param sizes: numbers of vertices.
+        :type sizes: list of integer
+        :param times: measured times in seconds.
+        :type times: list of float
+
+        :return: fitted exponent, None if there are less than two samples.
+        :rtype: float
+        """
+        samples = [(log(n), log(max(t, 1e-9))) for n, t in zip(sizes, times)]
+        if(len(samples) < 2):
+            return None
+        mean_x = sum(x for x, _ in samples)/len(samples)
+        mean_y = sum(y for _, y in samples)/len(samples)
+        sxx = sum((x - mean_x)**2 for x, _ in samples)
+        if(sxx == 0.0):
+            return None
+        return sum((x - mean_x)*(y - mean_y) for x, y in samples)/sxx
+
+    @staticmethod
+    def run(sizes = None, shapes = None, engines = None, max_exponent = None):
+        """
+        Run every engine on every polygon of the corpus and report the
+        results.
+
+        :param sizes: approximate numbers of vertices, defaults to SIZES.
+        :type sizes: list of integer
+        :param shapes: names of polygon families, defaults to all of them.
+        :type shapes: list of string
+        :param engines: names of engines, defaults to all of them.
+        :type engines: list of string
+        :param max_exponent: maximal accepted complexity exponent of all the
+                             engines, defaults to ENGINE_MAX_EXPONENT or
+                             MAX_EXPONENT.
+        :type max_exponent: float
+
+        :return: True if all the triangulations are correct and no exponent
+                 exceeds the limit, False otherwise.
+        :rtype: boolean
+        """
+        from triangulate import ENGINES
+        if(sizes is None):
+            sizes = TTriangulationBenchmark.SIZES
+        if(shapes is None):
+            shapes = list(TPolygonCorpus.SHAPES)
+        if(engines is None):
+            engines = list(ENGINES)
+        passed = True
+        print("{:<10} {:<12} {:>8} {:>10} {:>10} {:>10} {}".format("shape", "engine", \
+              "vertices", "time [s]", "peak [MB]", "triangles", "coverage"))
+        for shape in shapes:
+            corpus = [TPolygonCorpus.SHAPES[shape](size) for size in sizes]
+            for name in engines:
+                limit = max_exponent
+                if(limit is None):
+                    limit = TTriangulationBenchmark.ENGINE_MAX_EXPONENT.get(name, \
+                            TTriangulationBenchmark.MAX_EXPONENT)
+                max_size = TTriangulationBenchmark.ENGINE_MAX_SIZE.get(name)
+                fit_sizes = []
+                fit_times = []
+                for points in corpus:
+                    if(max_size is not None and len(points) > max_size):
+                        continue
+                    try:
+                        elapsed, peak, count, covered = \
+                            TTriangulationBenchmark.measure(ENGINES[name], points)
+                    except Exception as message:
+                        print("{:<10} {:<12} {:>8} error: {}".format(shape, name, \
+                              len(points), message))
+                        passed = False
+                        continue
+                    status = "ok" if covered else "FAILED"
+                    passed = passed and covered
+                    print("{:<10} {:<12} {:>8} {:>10.4f} {:>10.2f} {:>10} {}".format(\
+                          shape, name, len(points), elapsed, peak/2**20, count, status))
+                    if(len(points) >= TTriangulationBenchmark.FIT_MIN_SIZE):
+                        fit_sizes.append(len(points))
+                        fit_times.append(elapsed)
+                k = TTriangulationBenchmark.exponent(fit_sizes, fit_times)
+                if(k is not None):
+                    status = "ok"
+                    if(k > limit):
+                        status = "over limit"
+                        passed = False
+                    print("{:<10} {:<12} exponent {:.2f} (limit {:.2f}) {}".format(\
+                          shape, name, k, limit, status))
+        return passed
+
+
+def main(argv = None):
+    """
+    Run the benchmarks.
+
+    :param argv: command line arguments, defaults to sys.argv[1:].
+    :type argv: list of string
+
+    :return: exit status, 1 if any budget has been exceeded.
+    :rtype: integer
+    """
+    arg_parser = argparse.ArgumentParser(description = "gprMax Designer benchmarks.")
+    arg_parser.add_argument("suite", nargs = "?", default = "startup", \
+                            choices = ["startup", "triangulation"], \
+                            help = "benchmark to be run")
+    arg_parser.add_argument("--budget", type = float, default = TStartupBenchmark.BUDGET, \
+                            help = "maximal startup time in seconds")
+    arg_parser.add_argument("--repeat", type = int, default = TStartupBenchmark.REPEAT, \
+                            help = "number of measurements")
+    arg_parser.add_argument("--sizes", type = int, nargs = "+", \
+                            default = TTriangulationBenchmark.SIZES, \
+                            help = "approximate numbers of polygon vertices")
+    arg_parser.add_argument("--shapes", nargs = "+", choices = list(TPolygonCorpus.SHAPES), \
+                            help = "polygon families, all by default")
+    arg_parser.add_argument("--engines", nargs = "+", \
+                            help = "triangulation engines, all by default")
+    arg_parser.add_argument("--max-exponent", type = float, \
+                            help = "maximal accepted complexity exponent of all engines")
+    args = arg_parser.parse_args(argv)
+    if(args.suite == "triangulation"):
+        passed = TTriangulationBenchmark.run(args.sizes, args.shapes, args.engines, \
+                                             args.max_exponent)
+    else:
+        passed = TStartupBenchmark.run(args.budget, args.repeat)
+    if(not passed):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
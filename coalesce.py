@@ -0,0 +1,118 @@
+"""
+.. module:: coalesce module.
+:synopsis: Module contains functions used to merge rectangles of the same
+           material, touching or overlapping along a whole side, into larger
+           boxes, so layers, brick walls and tiled slabs drawn as many
+           rectangles are written as a few #box commands.
+
+.. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
+"""
+
+from culling import TBoxIndex
+
+
+COORDINATE_DIGITS = 12  #: decimal places of coordinates in metres compared when merging.
+
+def coalesce_rectangles(shapes):
+    """
+    Merge rectangles of the same material into larger boxes. Every rectangle
+    absorbs the earlier rectangles of its material sharing its y range and
+    touching or overlapping it in x, or sharing its x range and touching or
+    overlapping it in y, as long as their union is a box. A merged box takes
+    the place of the latest of its rectangles, so an earlier rectangle is
+    absorbed only if no shape of another material between the two overlaps
+    it (see blocked()), which keeps the model unchanged. Coordinates are
+    compared rounded to COORDINATE_DIGITS decimal places, so rounding errors
+    of edited shapes don't prevent merging.
+
+    :param shapes: list of shapes in the order they are built.
+    :type shapes: list of TShape
+
+    :return: merged boxes as (x1, y1, x2, y2, material) records keyed by
+             the positions of the rectangles they replace, and the positions
+             of the absorbed rectangles, which are dropped.
+    :rtype: tuple
+    """
+    if(len(shapes) < 2):
+        return {}, set()
+    boxes = [tuple(round(v, COORDINATE_DIGITS) for v in single_shape.bounding_box()) \
+             for single_shape in shapes]
+    index = TBoxIndex.sized_for(boxes)
+    for key, box in enumerate(boxes):
+        index.insert(key, box)
+    rows = {}       # (material, min y, max y) -> keys of rectangles
+    columns = {}    # (material, min x, max x) -> keys of rectangles
+    absorbed = set()
+    merged = set()
+    for q, single_shape in enumerate(shapes):
+        if(single_shape.type != "Rectangle"):
+            continue
+        material = single_shape.material
+        while(True):
+            box = boxes[q]
+            partner = None
+            for p in rows.get((material, box[1], box[3]), ()):
+                if(boxes[p][0] <= box[2] and box[0] <= boxes[p][2] and \
+                   not blocked(p, q, shapes, boxes, index)):
+                    partner = p
+                    break
+            if(partner is None):
+                for p in columns.get((material, box[0], box[2]), ()):
+                    if(boxes[p][1] <= box[3] and box[1] <= boxes[p][3] and \
+                       not blocked(p, q, shapes, boxes, index)):
+                        partner = p
+                        break
+            if(partner is None):
+                break
+            other = boxes[partner]
+            rows[(material, other[1], other[3])].remove(partner)
+            columns[(material, other[0], other[2])].remove(partner)
+            index.remove(partner)
+            absorbed.add(partner)
+            merged.discard(partner)
+            boxes[q] = (min(box[0], other[0]), min(box[1], other[1]), \
+                        max(box[2], other[2]), max(box[3], other[3]))
+            index.remove(q)
+            index.insert(q, boxes[q])
+            merged.add(q)
+        box = boxes[q]
+        rows.setdefault((material, box[1], box[3]), []).append(q)
+        columns.setdefault((material, box[0], box[2]), []).append(q)
+    return {key: boxes[key] + (shapes[key].material,) for key in merged}, absorbed
+
+
+def blocked(p, q, shapes, boxes, index):
+    """
+    Check whether a rectangle can't be moved to a later position in the
+    shapes list, because a shape of another material lying between the two
+    positions overlaps it. Rectangles have to overlap it with a positive
+    area, as gprMax rounds box sides to cell boundaries, other shapes are
+    examined by their bounding boxes.
+
+    :param p: current position of the rectangle.
+    :type p: integer
+    :param q: new position of the rectangle.
+    :type q: integer
+    :param shapes: list of shapes.
+    :type shapes: list of TShape
+    :param boxes: current bounding boxes of the shapes.
+    :type boxes: list of tuple
+    :param index: spatial index of the current bounding boxes.
+    :type index: TBoxIndex
+
+    :rtype: boolean
+    """
+    if(q - p < 2):
+        return False
+    box = boxes[p]
+    material = shapes[p].material
+    for k in index.query(box):
+        if(k <= p or k >= q or shapes[k].material == material):
+            continue
+        if(shapes[k].type != "Rectangle"):
+            return True
+        other = boxes[k]
+        if(other[0] < box[2] and box[0] < other[2] and \
+           other[1] < box[3] and box[1] < other[3]):
+            return True
+    return False
@@ -0,0 +1,185 @@
+"""
+.. module:: compilemodel module.
+:synopsis: Module contains a command line compiler of models, which works
+           without a display server. It reads gprMax input files the way
+           the designer does and writes them back with the shapes parsed by
+           TParser, eg. 'python -m compilemodel model.in -o output.in'.
+           Errors are printed on the standard error stream and make the
+           compiler exit with a non-zero status instead of opening dialogs.
+
+.. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
+"""
+
+import argparse
+import os
+import sys
+
+from inputreader import TInputReader
+from parsetofile import TParser
+from settings import TModel_Size, TParserSettings, TSurveySettings
+
+
+class TModelCompiler(object):
+    """
+    Class compiles models given as gprMax input files. The model and survey
+    settings read from a file are global, so they are restored to their
+    defaults before every model.
+
+    :param digits: significant digits of written numbers (see TInputWriter).
+    :type digits: integer
+    :param mode: geometry output mode, "shapes" for the commands of drawn
+                 shapes (see TParser.write_shapes()), "boxes" for boxes
+                 dividing the rasterised model (see TParser.write_raster_boxes())
+                 or "voxels" for a voxel grid (see TParser.write_voxels()).
+    :type mode: string
+    :param allow_python: toggle of running Python blocks of the inputs (see
+                         TInputReader).
+    :type allow_python: boolean
+    """
+
+    SETTINGS = (TModel_Size, TSurveySettings)   #: classes holding the settings of a model.
+
+    def __init__(self, digits = None, mode = "shapes", allow_python = False):
+        """
+        Initialise the compiler and remember the default settings.
+        """
+        self.digits = digits
+        self.mode = mode
+        self.allow_python = allow_python
+        self.defaults = [(settings, {name: value for name, value in vars(settings).items() \
+                                     if not name.startswith("__")}) \
+                         for settings in TModelCompiler.SETTINGS]
+
+    def reset(self):
+        """
+        Restore the default model and survey settings.
+        """
+        for settings, values in self.defaults:
+            for name, value in values.items():
+                setattr(settings, name, value)
+
+    def compile(self, input_name, sink, output_name = None):
+        """
+        Read a model from a gprMax input file and stream it to a sink.
+
+        :param input_name: input file name.
+        :type input_name: string
+        :param sink: file-like object or a callable accepting strings (see
+                     TInputWriter).
+        :type sink: file or callable
+        :param output_name: output file name, the voxel grid and materials
+                            files are written next to it. Required only if
+                            the geometry is written as voxels.
+        :type output_name: string
+
+        :return: writer holding the parse statistics.
+        :rtype: TInputWriter
+        """
+        self.reset()
+        reader = TInputReader(allow_python = self.allow_python)
+        with open(input_name) as infile:
+            reader.read(infile)
+        if(self.mode == "voxels"):
+            if(output_name is None):
+                raise Exception("Voxelised geometry requires an output file!")
+            stem = os.path.splitext(output_name)[0]
+            return TParser.write_voxels(sink, reader.materials, reader.shapes, \
+                                        reader.title, stem + ".h5", \
+                                        stem + "_materials.txt", self.digits)
+        if(self.mode == "boxes"):
+            return TParser.write_raster_boxes(sink, reader.materials, reader.shapes, \
+                                              reader.title, self.digits)
+        return TParser.write_shapes(sink, reader.materials, reader.shapes, \
+                                    reader.title, self.digits)
+
+    def compile_to_file(self, input_name, output_name):
+        """
+        Compile a model to a file. The output is written to a temporary file
+        first, so a failed compilation doesn't leave a truncated output.
+
+        :param input_name: input file name.
+        :type input_name: string
+        :param output_name: output file name.
+        :type output_name: string
+
+        :return: writer holding the parse statistics.
+        :rtype: TInputWriter
+        """
+        if(os.path.exists(output_name) and os.path.samefile(input_name, output_name)):
+            raise Exception("Output file would overwrite the input file!")
+        temporary_name = output_name + ".tmp"
+        try:
+            with open(temporary_name, "w") as outfile:
+                writer = self.compile(input_name, outfile, output_name)
+            os.replace(temporary_name, output_name)
+        finally:
+            if(os.path.exists(temporary_name)):
+                os.remove(temporary_name)
+        return writer
+
+
+def main(argv = None):
+    """
+    Compile the models given on the command line.
+
+    :param argv: command line arguments, sys.argv[1:] by default.
+    :type argv: list of string
+
+    :return: exit status, 0 if all the models were compiled, 1 otherwise.
+    :rtype: integer
+    """
+    parser = argparse.ArgumentParser(prog = "python -m compilemodel", \
+                                     description = "Compile gprMax Designer models " \
+                                     "to gprMax input files without a display.")
+    parser.add_argument("inputs", nargs = "+", metavar = "INPUT", \
+                        help = "gprMax input file describing a model.")
+    parser.add_argument("-o", "--output", \
+                        help = "output file, or an existing directory if several " \
+                        "inputs are given; the standard output by default.")
+    parser.add_argument("-d", "--digits", type = int, default = None, \
+                        help = "significant digits of written numbers, 0 writes " \
+                        "them unrounded.")
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument("--boxes", dest = "mode", action = "store_const", const = "boxes", \
+                       default = "shapes", help = "write the geometry as boxes dividing " \
+                       "the model rasterised to its cells.")
+    modes.add_argument("--voxels", dest = "mode", action = "store_const", const = "voxels", \
+                       help = "write the geometry as a HDF5 voxel grid read with " \
+                       "#geometry_objects_read, next to the output file.")
+    parser.add_argument("--no-python", action = "store_true", \
+                        help = "don't write arrays of equal shapes as #python blocks, " \
+                        "for gprMax builds without Python support.")
+    parser.add_argument("--allow-python", action = "store_true", \
+                        help = "run #python blocks of the inputs to read the commands " \
+                        "they print; use only for trusted inputs.")
+    args = parser.parse_args(argv)
+    if(len(args.inputs) > 1 and (args.output is None or not os.path.isdir(args.output))):
+        parser.error("several inputs require an existing output directory.")
+    if(args.mode == "voxels" and args.output is None):
+        parser.error("voxelised geometry requires an output file.")
+    if(args.no_python):
+        TParserSettings.PYTHON_LATTICES = False
+    compiler = TModelCompiler(args.digits, args.mode, args.allow_python)
+    status = 0
+    for input_name in args.inputs:
+        try:
+            if(args.output is None):
+                writer = compiler.compile(input_name, sys.stdout)
+            elif(os.path.isdir(args.output)):
+                writer = compiler.compile_to_file(input_name, \
+                                                  os.path.join(args.output, \
+                                                  os.path.basename(input_name)))
+            else:
+                writer = compiler.compile_to_file(input_name, args.output)
+        except Exception as message:
+            print("{}: {}: {}".format(parser.prog, input_name, message), file = sys.stderr)
+            status = 1
+            continue
+        for warning in writer.warnings:
+            print("{}: {}: warning: {}".format(parser.prog, input_name, warning), \
+                  file = sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
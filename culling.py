@@ -0,0 +1,292 @@
+"""
+.. module:: culling module.
+:synopsis: Module contains functions used to find shapes entirely covered by
+           shapes following them in a model. gprMax builds shapes in the
+           input file order, so such shapes are overwritten completely and
+           don't need to be written at all.
+
+.. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
+"""
+
+from math import atan2, floor, hypot, pi
+
+
+RECTANGLES_MAX_CELLS = 1000000  #: maximal number of cells examined by rectangles_cover().
+
+
+class TBoxIndex(object):
+    """
+    Class is a spatial index of axis aligned boxes. Boxes are registered in
+    the buckets of a uniform grid they overlap, boxes overlapping too many
+    buckets are kept on a separate list returned by every query.
+
+    :param bucket_x: bucket width.
+    :type bucket_x: float
+    :param bucket_y: bucket height.
+    :type bucket_y: float
+    """
+
+    MAX_BUCKETS = 64    #: maximal number of buckets a box is registered in.
+
+    def __init__(self, bucket_x, bucket_y):
+        """
+        Initialise an empty index.
+        """
+        self.bucket_x = bucket_x
+        self.bucket_y = bucket_y
+        self.buckets = {}
+        self.boxes = {}
+        self.large = []
+
+    @staticmethod
+    def sized_for(boxes):
+        """
+        Create an empty index whose buckets are twice as large as a typical
+        box of a given list.
+
+        :param boxes: boxes to be indexed.
+        :type boxes: list of tuple
+
+        :rtype: TBoxIndex
+        """
+        widths = sorted(box[2] - box[0] for box in boxes)
+        heights = sorted(box[3] - box[1] for box in boxes)
+        bucket_x = 2*widths[len(widths)//2] or 2*widths[-1] or 1.0
+        bucket_y = 2*heights[len(heights)//2] or 2*heights[-1] or 1.0
+        return TBoxIndex(bucket_x, bucket_y)
+
+    def bucket_range(self, box):
+        """
+        Find the buckets overlapped by a box.
+
+        :param box: minimal x, minimal y, maximal x and maximal y coordinates.
+        :type box: tuple
+
+        :return: first and last bucket column, first and last bucket row.
+        :rtype: tuple
+        """
+        return (floor(box[0]/self.bucket_x), floor(box[2]/self.bucket_x), \
+                floor(box[1]/self.bucket_y), floor(box[3]/self.bucket_y))
+
+    def insert(self, key, box):
+        """
+        Add a box to the index.
+
+        :param key: box identifier.
+        :type key: hashable
+        :param box: minimal x, minimal y, maximal x and maximal y coordinates.
+        :type box: tuple
+        """
+        self.boxes[key] = box
+        i1, i2, j1, j2 = self.bucket_range(box)
+        if((i2 - i1 + 1)*(j2 - j1 + 1) > TBoxIndex.MAX_BUCKETS):
+            self.large.append(key)
+            return
+        for i in range(i1, i2 + 1):
+            for j in range(j1, j2 + 1):
+                self.buckets.setdefault((i, j), []).append(key)
+
+    def remove(self, key):
+        """
+        Remove a box from the index.
+
+        :param key: box identifier.
+        :type key: hashable
+        """
+        box = self.boxes.pop(key)
+        i1, i2, j1, j2 = self.bucket_range(box)
+        if((i2 - i1 + 1)*(j2 - j1 + 1) > TBoxIndex.MAX_BUCKETS):
+            self.large.remove(key)
+            return
+        for i in range(i1, i2 + 1):
+            for j in range(j1, j2 + 1):
+                self.buckets[(i, j)].remove(key)
+
+    def query(self, box):
+        """
+        Find the indexed boxes intersecting a box, touching ones included.
+
+        :param box: minimal x, minimal y, maximal x and maximal y coordinates.
+        :type box: tuple
+
+        :return: identifiers of the found boxes.
+        :rtype: set
+        """
+        i1, i2, j1, j2 = self.bucket_range(box)
+        if((i2 - i1 + 1)*(j2 - j1 + 1) > len(self.buckets)):
+            keys = set(self.boxes)
+        else:
+            keys = {key for i in range(i1, i2 + 1) for j in range(j1, j2 + 1) \
+                    for key in self.buckets.get((i, j), ())}
+            keys.update(self.large)
+        boxes = self.boxes
+        return {key for key in keys if boxes[key][0] <= box[2] and box[0] <= boxes[key][2] \
+                and boxes[key][1] <= box[3] and box[1] <= boxes[key][3]}
+
+
+def hidden_shapes(shapes):
+    """
+    Find shapes covered by the shapes following them. Shapes are examined
+    from the last one, against the later shapes whose bounding boxes
+    intersect theirs (see TBoxIndex). A shape is hidden only if the coverage
+    is proven (see covered()), so some hidden shapes may be kept.
+    Hidden shapes are not indexed, as later shapes cover them anyway.
+
+    :param shapes: list of shapes in the order they are built.
+    :type shapes: list of TShape
+
+    :return: indices of the hidden shapes, ascending.
+    :rtype: list of integer
+    """
+    if(len(shapes) < 2):
+        return []
+    boxes = [single_shape.bounding_box() for single_shape in shapes]
+    index = TBoxIndex.sized_for(boxes)
+    hidden = []
+    for i in range(len(shapes) - 1, -1, -1):
+        others = sorted(index.query(boxes[i]))
+        if(others and covered(shapes[i], boxes[i], [shapes[j] for j in others], \
+                              [boxes[j] for j in others])):
+            hidden.append(i)
+        else:
+            index.insert(i, boxes[i])
+    return hidden[::-1]
+
+
+def covered(shape, box, others, other_boxes):
+    """
+    Check whether a shape is covered by other shapes, either by one of them
+    (see contains()) or by the union of the rectangles among them, which
+    has to cover the bounding box of the shape (see rectangles_cover()).
+
+    :param shape: examined shape.
+    :type shape: TShape
+    :param box: bounding box of the examined shape.
+    :type box: tuple
+    :param others: covering shapes.
+    :type others: list of TShape
+    :param other_boxes: bounding boxes of the covering shapes.
+    :type other_boxes: list of tuple
+
+    :rtype: boolean
+    """
+    for other, other_box in zip(others, other_boxes):
+        if(contains(other, other_box, shape, box)):
+            return True
+    return rectangles_cover(box, [other_box for other, other_box in \
+                                  zip(others, other_boxes) if other.type == "Rectangle"])
+
+
+def contains(outer, outer_box, inner, inner_box):
+    """
+    Check whether a shape contains another one. Rectangles contain the
+    shapes whose bounding boxes they contain, cylinders contain cylinders
+    closer to their centre than the difference of the radii. Convex shapes
+    contain polygons and rectangles whose vertices they contain, other
+    shapes are checked by the corners of their bounding boxes.
+
+    :param outer: containing shape.
+    :type outer: TShape
+    :param outer_box: bounding box of the containing shape.
+    :type outer_box: tuple
+    :param inner: contained shape.
+    :type inner: TShape
+    :param inner_box: bounding box of the contained shape.
+    :type inner_box: tuple
+
+    :rtype: boolean
+    """
+    if(not (outer_box[0] <= inner_box[0] and outer_box[1] <= inner_box[1] and \
+            inner_box[2] <= outer_box[2] and inner_box[3] <= outer_box[3])):
+        return False
+    if(outer.type == "Rectangle"):
+        return True
+    if(outer.type == "Cylinder" and inner.type == "Cylinder"):
+        return hypot(inner.centre_mod.x - outer.centre_mod.x, \
+                     inner.centre_mod.y - outer.centre_mod.y) + inner.radius_mod <= \
+               outer.radius_mod
+    if(not convex(outer)):
+        return False
+    if(inner.type == "Polygon"):
+        points = [(pt.x, pt.y) for pt in inner.points_mod]
+    else:
+        points = [(inner_box[0], inner_box[1]), (inner_box[2], inner_box[1]), \
+                  (inner_box[2], inner_box[3]), (inner_box[0], inner_box[3])]
+    return bool(outer.contains_points(points).all())
+
+
+def convex(shape):
+    """
+    Check whether a shape is convex. Cylinder sectors are convex if their
+    extent doesn't exceed 180 degrees, polygons if they turn in a single
+    direction by a full angle.
+
+    :param shape: examined shape.
+    :type shape: TShape
+
+    :rtype: boolean
+    """
+    if(shape.type == "Rectangle" or shape.type == "Cylinder"):
+        return True
+    if(shape.type == "CylinSector"):
+        return shape.extent <= 180
+    if(shape.type != "Polygon"):
+        return False
+    points = shape.points_mod
+    n = len(points)
+    turn = 0.0
+    sign = 0
+    for i in range(n):
+        v1, v2, v3 = points[i - 2], points[i - 1], points[i]
+        cross = (v2.x - v1.x)*(v3.y - v2.y) - (v2.y - v1.y)*(v3.x - v2.x)
+        dot = (v2.x - v1.x)*(v3.x - v2.x) + (v2.y - v1.y)*(v3.y - v2.y)
+        if(cross != 0):
+            if(sign != 0 and (cross > 0) != (sign > 0)):
+                return False
+            sign = 1 if cross > 0 else -1
+        turn += atan2(cross, dot)
+    return abs(abs(turn) - 2*pi) < 1e-6
+
+
+def rectangles_cover(box, rectangles):
+    """
+    Check whether a union of rectangles covers a box. The box is divided
+    by the rectangle edges into cells, each of which has to be covered by
+    a rectangle.
+
+    :param box: minimal x, minimal y, maximal x and maximal y coordinates.
+    :type box: tuple
+    :param rectangles: rectangles as boxes.
+    :type rectangles: list of tuple
+
+    :rtype: boolean
+    """
+    min_x, min_y, max_x, max_y = box
+    if(max_x <= min_x or max_y <= min_y):
+        return False
+    clipped = []
+    area = 0.0
+    for rectangle in rectangles:
+        x1, y1 = max(rectangle[0], min_x), max(rectangle[1], min_y)
+        x2, y2 = min(rectangle[2], max_x), min(rectangle[3], max_y)
+        if(x1 < x2 and y1 < y2):
+            clipped.append((x1, y1, x2, y2))
+            area += (x2 - x1)*(y2 - y1)
+    # Rectangles of a smaller total area can't cover the box
+    if(area < (max_x - min_x)*(max_y - min_y)):
+        return False
+    import numpy as np
+    xs = np.unique([min_x, max_x] + [r[0] for r in clipped] + [r[2] for r in clipped])
+    ys = np.unique([min_y, max_y] + [r[1] for r in clipped] + [r[3] for r in clipped])
+    if((len(xs) - 1)*(len(ys) - 1) > RECTANGLES_MAX_CELLS):
+        return False
+    clipped = np.array(clipped)
+    i1 = np.searchsorted(xs, clipped[:, 0]).tolist()
+    i2 = np.searchsorted(xs, clipped[:, 2]).tolist()
+    j1 = np.searchsorted(ys, clipped[:, 1]).tolist()
+    j2 = np.searchsorted(ys, clipped[:, 3]).tolist()
+    cells = np.zeros((len(xs) - 1, len(ys) - 1), dtype = bool)
+    for k in range(len(i1)):
+        cells[i1[k]:i2[k], j1[k]:j2[k]] = True
+    return bool(cells.all())
+
@@ -0,0 +1,214 @@
+"""
+.. module:: inputreader module.
+:synopsis: Module contains a reader of gprMax input files, which rebuilds
+           the model (title, domain, survey settings, materials and shapes)
+           without any user interface, so it is shared by the designer and
+           the command line compiler.
+
+.. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
+"""
+
+import contextlib
+import io
+
+from materials import TMaterial
+from point import TPoint
+from settings import TModel_Size, TSurveySettings
+from shapes import TRect, TCylin, TCylinSector, TPolygon
+
+
+class TInputReader(object):
+    """
+    Class reads gprMax commands line by line. Model and survey settings are
+    stored in TModel_Size and TSurveySettings, materials and shapes are
+    appended to the given lists. Every command written by TParser is
+    recognised, so a parsed model can be read back. Python blocks run any
+    code, so they are run only if explicitly allowed, for trusted files;
+    the commands they print are read then, as gprMax does. Otherwise
+    a block is skipped and reported as an error.
+
+    :param materials: list the read materials are appended to.
+    :type materials: list of TMaterial
+    :param shapes: list the read shapes are appended to.
+    :type shapes: list of TShape
+    :param allow_python: Python blocks toggle.
+    :type allow_python: boolean
+    """
+
+    def __init__(self, materials = None, shapes = None, allow_python = False):
+        """
+        Initialise the reader.
+        """
+        self.materials = materials if materials is not None else []
+        self.shapes = shapes if shapes is not None else []
+        self.allow_python = allow_python
+        self.title = None       #: model title, None if not given.
+        self.domain = None      #: (x, y) size of the model, None if not given.
+        self.python = None      #: lines of the Python block being read.
+
+    def read(self, infile):
+        """
+        Read all lines of a gprMax input file.
+
+        :param infile: opened input file or a list of lines.
+        :type infile: file or list of string
+        """
+        for line_num, line in enumerate(infile, 1):
+            self.read_line(line, line_num)
+
+    def read_line(self, line, line_num):
+        """
+        Read a single line. Lines that don't begin with hash sign are
+        comments and are omitted.
+
+        :param line: line to be parsed.
+        :type line: string
+        :param line_num: parsed line number.
+        :type line_num: integer
+        """
+        if(self.python is not None):
+            if(line.startswith("#end_python:")):
+                self.run_python(line_num)
+            else:
+                self.python.append(line.rstrip("\n"))
+            return
+        if(not line.startswith("#")):
+            return
+        if(line.startswith("#python:")):
+            self.python = []
+            return
+        try:
+            recognised = self.handle_input_command(line)
+        except (IndexError, ValueError):
+            recognised = False
+        if(not recognised):
+            raise Exception("Invalid input {} in line {}.".format(line.strip(), line_num))
+
+    def run_python(self, line_num):
+        """
+        Run the Python block read so far and read the commands it prints.
+        Exiting the interpreter inside the block is reported as an error too.
+
+        :param line_num: number of the line ending the block.
+        :type line_num: integer
+        """
+        code = "\n".join(self.python)
+        self.python = None
+        if(not self.allow_python):
+            raise Exception("Python block ending in line {} not run, as running " \
+                            "Python blocks is not allowed.".format(line_num))
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                exec(code, {})
+        except (Exception, SystemExit) as message:
+            raise Exception("Error in Python block ending in line {}: {}".format(line_num, \
+                                                                                message))
+        for command in output.getvalue().splitlines():
+            self.read_line(command, line_num)
+
+    def handle_input_command(self, line):
+        """
+        Recognise and handle a command given in a line.
+
+        :param line: line to be parsed.
+        :type line: string
+
+        :return: False if the command is unknown.
+        :rtype: boolean
+        """
+        tokens = line.split()
+        command = (tokens[0])[1:-1]
+        if(command == "title"):
+            self.title = " ".join(tokens[1:])
+        elif(command == "domain"):
+            TModel_Size.DOM_X = float(tokens[1])
+            TModel_Size.DOM_Y = float(tokens[2])
+            TModel_Size.MIN_X = 0.0
+            TModel_Size.MIN_Y = 0.0
+            TModel_Size.MAX_X = TModel_Size.DOM_X
+            TModel_Size.MAX_Y = TModel_Size.DOM_Y
+            self.domain = (TModel_Size.DOM_X, TModel_Size.DOM_Y)
+        elif(command == "dx_dy_dz"):
+            TModel_Size.DX = float(tokens[1])
+            TModel_Size.DY = float(tokens[2])
+        elif(command == "time_window"):
+            TSurveySettings.TIME_WINDOW = float(tokens[1])
+        elif(command == "time_stability_factor"):
+            TSurveySettings.TSF = float(tokens[1])
+        elif(command == "waveform"):
+            TSurveySettings.WAVE_TYPE = tokens[1]
+            TSurveySettings.AMPLITUDE = float(tokens[2])
+            TSurveySettings.FREQUENCY = float(tokens[3])
+        elif(command == "hertzian_dipole" or command == "magnetic_dipole"):
+            TSurveySettings.SRC_TYPE = command
+            TSurveySettings.SRC_X = float(tokens[2])
+            TSurveySettings.SRC_Y = float(tokens[3])
+        elif(command == "rx"):
+            TSurveySettings.RX_X = float(tokens[1])
+            TSurveySettings.RX_Y = float(tokens[2])
+            TSurveySettings.TYPE = "ascan"
+        elif(command == "rx_array"):
+            TSurveySettings.RX_X = float(tokens[1])
+            TSurveySettings.RX_Y = float(tokens[2])
+            TSurveySettings.RX_MAX_X = float(tokens[4])
+            TSurveySettings.RX_MAX_Y = float(tokens[5])
+            TSurveySettings.RX_STEP_X = float(tokens[7])
+            TSurveySettings.RX_STEP_Y = float(tokens[8])
+            TSurveySettings.TYPE = "rx_array"
+        elif(command == "src_steps"):
+            TSurveySettings.SRC_STEP_X = float(tokens[1])
+            TSurveySettings.SRC_STEP_Y = float(tokens[2])
+            TSurveySettings.TYPE = "bscan"
+        elif(command == "rx_steps"):
+            TSurveySettings.RX_STEP_X = float(tokens[1])
+            TSurveySettings.RX_STEP_Y = float(tokens[2])
+            TSurveySettings.TYPE = "bscan"
+        elif(command == "material"):
+            epsilon_r = float(tokens[1])
+            sigma = float(tokens[2])
+            mu_r = float(tokens[3])
+            sigma_mag = float(tokens[4])
+            name = tokens[5]
+            self.materials.append(TMaterial(epsilon_r, sigma, mu_r, sigma_mag, \
+                                            name))
+        elif(command == "box"):
+            pt1 = TPoint(float(tokens[1]), float(tokens[2]))
+            pt2 = TPoint(float(tokens[4]), float(tokens[5]))
+            mat = tokens[7]
+            self.shapes.append(TRect(point1_mod = pt1, point2_mod = pt2, \
+                                     material = mat))
+        elif(command == "cylinder"):
+            cen = TPoint(float(tokens[1]), float(tokens[2]))
+            rad = float(tokens[7])
+            mat = tokens[8]
+            self.shapes.append(TCylin(centre_mod = cen, radius_mod = rad, \
+                                      material = mat))
+        elif(command == "cylindrical_sector"):
+            cen = TPoint(float(tokens[2]), float(tokens[3]))
+            rad = float(tokens[6])
+            sta = float(tokens[7])
+            ext = float(tokens[8])
+            mat = tokens[9]
+            self.shapes.append(TCylinSector(centre_mod = cen, radius_mod = rad, \
+                                            start = sta, extent = ext, \
+                                            material = mat))
+        elif(command == "triangle"):
+            pts = []
+            pts.append(TPoint(float(tokens[1]), float(tokens[2])))
+            pts.append(TPoint(float(tokens[4]), float(tokens[5])))
+            pts.append(TPoint(float(tokens[7]), float(tokens[8])))
+            mat = tokens[11]
+            self.shapes.append(TPolygon(points_mod = pts, material = mat))
+        elif(command == "messages"):
+            TSurveySettings.MESSAGES = "no" if tokens[1] in ("n", "no") else "yes"
+        elif(command == "geometry_view"):
+            TSurveySettings.GEOM_VIEW = "yes"
+            TSurveySettings.GEOM_FILE = tokens[10]
+        elif(command == "snapshot"):
+            TSurveySettings.SNAPSHOT = "yes"
+            TSurveySettings.SNAP_TIME = float(tokens[10])
+            TSurveySettings.SNAP_FILE = tokens[11]
+        else:
+            return False
+        return True
@@ -0,0 +1,213 @@
+"""
+.. module:: lattice module.
+:synopsis: Module contains functions used to find regular arrays of equal
+           shapes, such as rebar meshes, pipe arrays and tiles created by
+           copying and pasting a shape, which can be written as loops of a
+           gprMax Python block instead of one command per shape.
+
+.. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
+"""
+
+from collections import Counter
+
+
+COORDINATE_DIGITS = 9   #: decimal places of coordinates in metres compared in lattices.
+
+
+def signature(shape):
+    """
+    Describe a shape independently of its position. Shapes with equal
+    signatures differ by a translation only.
+
+    :param shape: examined shape.
+    :type shape: TShape
+
+    :return: shape type, material and dimensions, None for polygons, which
+             are not arranged into lattices.
+    :rtype: tuple
+    """
+    if(shape.type == "Rectangle"):
+        return (shape.type, shape.material, \
+                round(shape.point2_mod.x - shape.point1_mod.x, COORDINATE_DIGITS), \
+                round(shape.point2_mod.y - shape.point1_mod.y, COORDINATE_DIGITS))
+    elif(shape.type == "Cylinder"):
+        return (shape.type, shape.material, round(shape.radius_mod, COORDINATE_DIGITS))
+    elif(shape.type == "CylinSector"):
+        return (shape.type, shape.material, round(shape.radius_mod, COORDINATE_DIGITS), \
+                shape.start, shape.extent)
+    return None
+
+
+def reference(shape):
+    """
+    Find the point a shape is translated by, ie. the first corner of
+    a rectangle or the centre of a cylinder and a cylinder sector.
+
+    :param shape: examined shape.
+    :type shape: TShape
+
+    :rtype: TPoint
+    """
+    if(shape.type == "Rectangle"):
+        return shape.point1_mod
+    return shape.centre_mod
+
+
+def key(x, y):
+    """
+    Round point coordinates for comparisons.
+
+    :rtype: tuple
+    """
+    return (round(x, COORDINATE_DIGITS), round(y, COORDINATE_DIGITS))
+
+
+def find_lattice(points):
+    """
+    Check whether points form a lattice, ie. all the points origin + i*a +
+    j*b for i < n and j < m, each exactly once. Points are sorted by x and y,
+    so the first n points lie along the a vector and the next one is
+    the origin translated by the b vector.
+
+    :param points: examined points as (x, y) tuples.
+    :type points: list of tuple
+
+    :return: origin, a vector, n, b vector and m of the lattice, or None if
+             the points don't form one.
+    :rtype: tuple
+    """
+
+    points = sorted(key(x, y) for x, y in points)
+    count = len(points)
+    if(count < 2 or len(set(points)) != count):
+        return None
+    origin = points[0]
+    a = (points[1][0] - origin[0], points[1][1] - origin[1])
+    n = 2
+    while(n < count and points[n] == key(origin[0] + n*a[0], origin[1] + n*a[1])):
+        n += 1
+    if(count % n != 0):
+        return None
+    m = count//n
+    b = (points[n][0] - origin[0], points[n][1] - origin[1]) if m > 1 else (0.0, 0.0)
+    expected = {key(origin[0] + i*a[0] + j*b[0], origin[1] + i*a[1] + j*b[1]) \
+                for i in range(n) for j in range(m)}
+    if(expected != set(points)):
+        return None
+    return origin, a, n, b, m
+
+
+def chains(values):
+    """
+    Divide coordinates into chains of values following one another by the
+    step most common between consecutive values. Values not followed nor
+    preceded by another form chains of their own.
+
+    :param values: rounded coordinates, each given once.
+    :type values: list of float
+
+    :return: first value, step (0.0 for single values) and values of every
+             chain, ascending.
+    :rtype: list of tuple
+    """
+    values = sorted(values)
+    if(len(values) < 2):
+        return [(value, 0.0, [value]) for value in values]
+    step = Counter(round(second - first, COORDINATE_DIGITS) for first, second in \
+                   zip(values, values[1:])).most_common(1)[0][0]
+    present = set(values)
+    used = set()
+    result = []
+    for value in values:
+        if(value in used):
+            continue
+        members = [value]
+        following = round(value + step, COORDINATE_DIGITS)
+        while(following in present and following not in used):
+            members.append(following)
+            following = round(following + step, COORDINATE_DIGITS)
+        used.update(members)
+        result.append((value, step if len(members) > 1 else 0.0, members))
+    return result
+
+
+def find_sub_lattices(points, min_points):
+    """
+    Find rectangular lattices of points in a set which doesn't form one as
+    a whole, eg. an array with some points removed or added. Points are
+    grouped into rows of equal y, rows are divided into chains of points
+    spaced by a common step (see chains()), and equal chains of different
+    rows are stacked into lattices if their rows follow one another by
+    a common step too. Points left out, eg. the added ones, don't belong
+    to any lattice.
+
+    :param points: examined points as (x, y) tuples.
+    :type points: list of tuple
+    :param min_points: minimal number of points in a lattice.
+    :type min_points: integer
+
+    :return: indices of the points and lattice (see find_lattice()) of every
+             found lattice.
+    :rtype: list of tuple
+    """
+    positions = {}
+    for num, (x, y) in enumerate(points):
+        positions.setdefault(key(x, y), []).append(num)
+    rows = {}
+    for x, y in positions:
+        rows.setdefault(y, []).append(x)
+    segments = {}       # (first x, step, count) -> (x coordinates, y coordinates)
+    for y, xs in rows.items():
+        for first, step, members in chains(xs):
+            segments.setdefault((first, step, len(members)), (members, []))[1].append(y)
+    lattices = []
+    for (first, step, n), (xs, ys) in segments.items():
+        for first_y, step_y, members in chains(ys):
+            m = len(members)
+            if(n*m < max(min_points, 2)):
+                continue
+            indices = [positions[(x, y)].pop() for y in members for x in xs]
+            if(n == 1):
+                lattice = ((first, first_y), (0.0, step_y), m, (0.0, 0.0), 1)
+            else:
+                lattice = ((first, first_y), (step, 0.0), n, (0.0, step_y), m)
+            lattices.append((sorted(indices), lattice))
+    lattices.sort()
+    return lattices
+
+
+def lattice_runs(shapes, min_shapes):
+    """
+    Find runs of consecutive shapes with equal signatures (see signature())
+    and the lattices their reference points form, either all of them (see
+    find_lattice()) or some (see find_sub_lattices()). Shapes of a run have
+    the same material, so writing them in another order doesn't change
+    the model.
+
+    :param shapes: list of shapes in the order they are built.
+    :type shapes: list of TShape
+    :param min_shapes: minimal number of shapes in a lattice.
+    :type min_shapes: integer
+
+    :return: indices of the shapes and lattice (see find_lattice()) of every
+             found lattice, ordered by the first indices.
+    :rtype: list of tuple
+    """
+    runs = []
+    start = 0
+    while(start < len(shapes)):
+        current = signature(shapes[start])
+        end = start + 1
+        while(end < len(shapes) and current is not None and \
+              signature(shapes[end]) == current):
+            end += 1
+        if(current is not None and end - start >= max(min_shapes, 2)):
+            points = [(reference(s).x, reference(s).y) for s in shapes[start:end]]
+            lattice = find_lattice(points)
+            if(lattice is not None):
+                runs.append((list(range(start, end)), lattice))
+            else:
+                runs += [([start + num for num in indices], lattice) for indices, lattice \
+                         in find_sub_lattices(points, min_shapes)]
+        start = end
+    return runs
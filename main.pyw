@@ -7,10 +7,9 @@
 
 from copy import copy, deepcopy
 from decimal import Decimal
-import h5py
+import io
 from math import asin, acos, atan, degrees, sin, cos, radians, log10, log2, ceil
 import os
-from PIL import Image, ImageDraw
 from random import randrange
 import subprocess
 import sys
@@ -24,6 +23,7 @@ from tkinter import LEFT, TOP, X, Y, FLAT, RAISED, SUNKEN, ARC, PIESLICE, INSERT
 from displaysettingswindow import TDisplaySettingsWindow
 from echogramwindow import TEchogramWindow
 from geometry import TGeometry as TG
+from inputreader import TInputReader
 from materials import TMaterial
 from materialswindow import TMaterialsWindow
 from modelsettingswindow import TModelSettingsWindow
@@ -197,6 +197,10 @@ class TApp(object):
         self.file_menu.add_command(label = "Save materials")
         self.file_menu.add_command(label = "Parse to gprMax", \
                                    command = self.parse_to_gprmax)
+        self.file_menu.add_command(label = "Parse to gprMax as boxes", command = lambda: \
+                                   self.parse_to_gprmax(TParser.write_raster_boxes))
+        self.file_menu.add_command(label = "Parse to gprMax as voxels", \
+                                   command = self.parse_to_voxels)
         self.file_menu.add_command(label = "Run gprMax in terminal", \
                                    command = self.run_gprmax)
         self.file_menu.add_command(label = "Export hdf5 to ascii", \
@@ -338,6 +342,9 @@ class TApp(object):
         self.pos_y_label = Label(self.status_bar, text = "Y: -", width = fwidth, \
                                  anchor = W)
         self.pos_y_label.grid(row = 0, column = 1)
+        self.triangles_label = Label(self.status_bar, text = "Triangles: -", \
+                                     width = 2*fwidth, anchor = W)
+        self.triangles_label.grid(row = 0, column = 2)
         self.status_bar.grid(row = 3, column = 0, sticky = EW)
 
     def bind_canvas_events(self):
@@ -895,15 +902,45 @@ class TApp(object):
         """
         self.shapes[shape_num].material = str(material)
     
-    def parse_to_gprmax(self):
+    def parse_to_gprmax(self, write = TParser.write_shapes):
         """
         Parse model created in program to a gprMax compliant text file.
+
+        :param write: parser method streaming the model (TParser.write_shapes()
+                      or TParser.write_raster_boxes()).
+        :type write: function
         """
-        parser_string = TParser.parse_shapes(self.materials, self.shapes, self.title)
+        buffer = io.StringIO()
+        try:
+            writer = write(buffer, self.materials, self.shapes, self.title)
+        except Exception as message:
+            messagebox.showerror("Error while parsing model!", message)
+            return
+        for warning in writer.warnings:
+            messagebox.showwarning("Parser warning", warning)
+        parser_string = buffer.getvalue()
         preview_window = TOutputPreviewWindow(self.master, parser_string)
         output_file_name = preview_window.result
         if(output_file_name is not None):
             self.run_gprmax(filename = output_file_name)
+
+    def parse_to_voxels(self):
+        """
+        Parse model created in program to a gprMax compliant text file, whose
+        geometry is read from a HDF5 voxel grid saved next to it.
+        """
+        filename = filedialog.asksaveasfilename(initialdir = '.', title = "Select file", \
+                                                filetypes = [("gprMax input files", "*.in"), \
+                                                             ("All files", "*.*")])
+        if(not filename):
+            return
+        stem = os.path.splitext(filename)[0]
+        try:
+            with open(filename, "w") as outfile:
+                TParser.write_voxels(outfile, self.materials, self.shapes, self.title, \
+                                     stem + ".h5", stem + "_materials.txt")
+        except Exception as message:
+            messagebox.showerror("Error while parsing model!", message)
     
     def change_model_size(self):
         """
@@ -2154,6 +2191,7 @@ class TApp(object):
         self.shape_buffer.point3_mod.y += offset_y
         self.shape_buffer.point4_mod.x += offset_x
         self.shape_buffer.point4_mod.y += offset_y
+        self.shape_buffer.touch()
         self.shape_buffer.update_window_positions()
         self.shapes.insert(self.manipulated_shape_num, self.shape_buffer)
         self.shape_buffer = None
@@ -2181,6 +2219,7 @@ class TApp(object):
         offset_y = pt.y - self.move_const_point.y
         self.shape_buffer.centre_mod.x += offset_x
         self.shape_buffer.centre_mod.y += offset_y
+        self.shape_buffer.touch()
         self.shape_buffer.update_window_positions()
         self.shapes.insert(self.manipulated_shape_num, self.shape_buffer)
         self.shape_buffer = None
@@ -2217,6 +2256,7 @@ class TApp(object):
                                                                    self.shape_buffer.extent)
         self.shape_buffer.boundary_pt1_mod = self.winmod(bp1)
         self.shape_buffer.boundary_pt2_mod = self.winmod(bp2)
+        self.shape_buffer.touch()
         self.shape_buffer.update_window_positions()
         self.shapes.insert(self.manipulated_shape_num, self.shape_buffer)
         self.shape_buffer = None
@@ -2243,9 +2283,13 @@ class TApp(object):
         pt = self.winmod(pt)
         offset_x = pt.x - self.move_const_point.x
         offset_y = pt.y - self.move_const_point.y
+        # Translation leaves the triangulation valid
+        triangles = self.shape_buffer.take_triangulation()
         for pt in self.shape_buffer.points_mod:
             pt.x += offset_x
             pt.y += offset_y
+        self.shape_buffer.restore_triangulation(triangles)
+        self.shape_buffer.touch()
         self.shape_buffer.update_window_positions()
         self.shapes.insert(self.manipulated_shape_num, self.shape_buffer)
         self.shape_buffer = None
@@ -2503,6 +2547,7 @@ class TApp(object):
         self.shape_buffer.point3_mod.y = TG.round_to_multiple(self.shape_buffer.point3_mod.y, TModel_Size.DY)
         self.shape_buffer.point4_mod.x = TG.round_to_multiple(self.shape_buffer.point4_mod.x, TModel_Size.DX)
         self.shape_buffer.point4_mod.y = TG.round_to_multiple(self.shape_buffer.point4_mod.y, TModel_Size.DY)
+        self.shape_buffer.touch()
         self.shape_buffer.update_window_positions()
         self.shapes.insert(self.manipulated_shape_num, self.shape_buffer)
         self.shape_buffer = None
@@ -2532,6 +2577,7 @@ class TApp(object):
         radius = ((self.resized_point.x + offset_x - self.shape_buffer.centre_mod.x)**2 + \
                   (self.resized_point.y + offset_y - self.shape_buffer.centre_mod.y)**2)**0.5
         self.shape_buffer.radius_mod = radius
+        self.shape_buffer.touch()
         self.shape_buffer.update_window_positions()
         self.shapes.insert(self.manipulated_shape_num, self.shape_buffer)
         self.shape_buffer = None
@@ -2598,6 +2644,7 @@ class TApp(object):
                                                                        self.shape_buffer.extent)
             self.shape_buffer.boundary_pt1_mod = self.winmod(bp1)
             self.shape_buffer.boundary_pt2_mod = self.winmod(bp2)
+        self.shape_buffer.touch()
         self.shape_buffer.update_window_positions()
         self.shapes.insert(self.manipulated_shape_num, self.shape_buffer)
         self.shape_buffer = None
@@ -2627,10 +2674,9 @@ class TApp(object):
         for num, pt in enumerate(self.shape_buffer.points_mod):
             if(pt.x == self.resized_point.x and pt.y == self.resized_point.y):
                 break
-        self.shape_buffer.points_mod[num] = TPoint(self.resized_point.x + offset_x, \
-                                                   self.resized_point.y + offset_y)
-        # self.shape_buffer.update_model_positions()
-        self.shape_buffer.update_window_positions()
+        self.shape_buffer.edit_vertex(vertex_num = num, x = self.resized_point.x + offset_x, \
+                                      y = self.resized_point.y + offset_y)
+        self.triangles_label.config(text = "Triangles: -")
         self.shapes.insert(self.manipulated_shape_num, self.shape_buffer)
         self.shape_buffer = None
         self.resized_point = None
@@ -2805,10 +2851,15 @@ class TApp(object):
         offset_y = pt.y - self.resized_point.y
         pts_mod = deepcopy(self.shape_buffer.points_mod)
         pts_mon = []
-        for pt in pts_mod:
+        for num, pt in enumerate(pts_mod):
             if(pt.x == self.resized_point.x and pt.y == self.resized_point.y):
                 pt.x += offset_x
                 pt.y += offset_y
+                count = self.shape_buffer.preview_triangle_count(num, pt.x, pt.y)
+                if(count is None):
+                    self.triangles_label.config(text = "Triangles: -")
+                else:
+                    self.triangles_label.config(text = "Triangles: " + str(count))
             tmp = self.modwin(pt)
             pts_mon.append(tmp.x)
             pts_mon.append(tmp.y)
@@ -3381,112 +3432,29 @@ class TApp(object):
                     filetypes = [("gprMax input files", "*.in"), ("All files", "*.*")])
         
         with open(filename) as infile:
-            self.remove_all_shapes()
-            line_num = 1
-            for line in infile:
-                if(line[0] == "#"):
-                    # Omit lines that don't begin with hash sign (comments)
-                    self.handle_input_command(line, line_num)
-                line_num += 1
-            self.view_zoom_reset()
-
-    def handle_input_command(self, line, line_num):
-        """
-        Recognise and handle a command given in a line.
-        
-        :param line: line to be parsed.
-        :type line: string
-        :param line_num: parsed line number.
-        :type line_num: integer
-        """
-        tokens = line.split()
-        command = (tokens[0])[1:-1]
-        if(command == "title"):
-            self.title = " ".join(tokens[1:])
+            lines = infile.readlines()
+        # Python blocks run any code, so they are run only if confirmed
+        allow_python = False
+        if(any(line.startswith("#python:") for line in lines)):
+            allow_python = messagebox.askyesno("Python blocks", "The file contains Python " \
+                                               "blocks, which have to be run to read the " \
+                                               "commands they print. Run them only if you " \
+                                               "trust the file. Run Python blocks?")
+        self.remove_all_shapes()
+        reader = TInputReader(self.materials, self.shapes, allow_python)
+        line_num = 1
+        for line in lines:
+            try:
+                reader.read_line(line, line_num)
+            except Exception as message:
+                messagebox.showwarning("Input error", message)
+            line_num += 1
+        if(reader.title is not None):
+            self.title = reader.title
             self.master.title("gprMax Designer: " + self.title)
-        elif(command == "domain"):
-            TModel_Size.DOM_X = float(tokens[1])
-            TModel_Size.DOM_Y = float(tokens[2])
-            TModel_Size.MIN_X = 0.0
-            TModel_Size.MIN_Y = 0.0
-            TModel_Size.MAX_X = TModel_Size.DOM_X
-            TModel_Size.MAX_Y = TModel_Size.DOM_Y
-            self.len_tot_x = TModel_Size.DOM_X
-            self.len_tot_y = TModel_Size.DOM_Y
-        elif(command == "dx_dy_dz"):
-            TModel_Size.DX = float(tokens[1])
-            TModel_Size.DY = float(tokens[2])
-        elif(command == "time_window"):
-            TSurveySettings.TIME_WINDOW = float(tokens[1])
-        elif(command == "waveform"):
-            TSurveySettings.WAVE_TYPE = tokens[1]
-            TSurveySettings.AMPLITUDE = float(tokens[2])
-            TSurveySettings.FREQUENCY = float(tokens[3])
-        elif(command == "hertzian_dipole"):
-            TSurveySettings.SRC_TYPE = command
-        elif(command == "magnetic_dipole"):
-            TSurveySettings.SRC_TYPE = command
-        elif(command == "rx"):
-            TSurveySettings.RX_X = float(tokens[1])
-            TSurveySettings.RX_Y = float(tokens[2])
-            TSurveySettings.TYPE = "ascan"
-        elif(command == "rx_array"):
-            TSurveySettings.RX_X = float(tokens[1])
-            TSurveySettings.RX_Y = float(tokens[2])
-            TSurveySettings.RX_MAX_X = float(tokens[4])
-            TSurveySettings.RX_MAX_Y = float(tokens[5])
-            TSurveySettings.RX_STEP_X = float(tokens[7])
-            TSurveySettings.RX_STEP_Y = float(tokens[8])
-            TSurveySettings.TYPE = "rx_array"
-        elif(command == "src_steps"):
-            TSurveySettings.SRC_STEP_X = float(tokens[1])
-            TSurveySettings.SRC_STEP_Y = float(tokens[2])
-            TSurveySettings.TYPE = "bscan"
-        elif(command == "rx_steps"):
-            TSurveySettings.RX_STEP_X = float(tokens[1])
-            TSurveySettings.RX_STEP_Y = float(tokens[2])
-            TSurveySettings.TYPE = "bscan"
-        elif(command == "material"):
-            epsilon_r = float(tokens[1])
-            sigma = float(tokens[2])
-            mu_r = float(tokens[3])
-            sigma_mag = float(tokens[4])
-            name = tokens[5]
-            self.materials.append(TMaterial(epsilon_r, sigma, mu_r, sigma_mag, \
-                                            name))
-        elif(command == "box"):
-            pt1 = TPoint(float(tokens[1]), float(tokens[2]))
-            pt2 = TPoint(float(tokens[4]), float(tokens[5]))
-            mat = tokens[7]
-            self.shapes.append(TRect(point1_mod = pt1, point2_mod = pt2, \
-                                     material = mat))
-        elif(command == "cylinder"):
-            cen = TPoint(float(tokens[1]), float(tokens[2]))
-            rad = float(tokens[7])
-            mat = tokens[8]
-            self.shapes.append(TCylin(centre_mod = cen, radius_mod = rad, \
-                                      material = mat))
-        elif(command == "cylindrical_sector"):
-            cen = TPoint(float(tokens[2]), float(tokens[3]))
-            rad = float(tokens[6])
-            sta = float(tokens[7])
-            ext = float(tokens[8])
-            mat = tokens[9]
-            self.shapes.append(TCylinSector(centre_mod = cen, radius_mod = rad, \
-                                            start = sta, extent = ext, \
-                                            material = mat))
-        elif(command == "triangle"):
-            pts = []
-            pts.append(TPoint(float(tokens[1]), float(tokens[2])))
-            pts.append(TPoint(float(tokens[4]), float(tokens[5])))
-            pts.append(TPoint(float(tokens[7]), float(tokens[8])))
-            mat = tokens[11]
-            self.shapes.append(TPolygon(points_mod = pts, material = mat))
-        elif(command == "geometry_view"):
-            pass
-        else:
-            messagebox.showwarning("Input error", \
-                                   "Invalid input {} in line {}.".format(line, line_num))
+        if(reader.domain is not None):
+            self.len_tot_x, self.len_tot_y = reader.domain
+        self.view_zoom_reset()
 
     def export_hdf5_to_ascii(self):
         """
@@ -3495,6 +3463,7 @@ class TApp(object):
         filename = filedialog.askopenfilename(initialdir = '.', title = "Select file", \
                                               filetypes = [("gprMax output files", "*.out"), \
                                               ("All files", "*.*")])
+        import h5py
         h5file = h5py.File(filename)
         iterations = h5file.attrs["Iterations"]
         title = h5file.attrs["Title"]
@@ -3727,6 +3696,7 @@ class TApp(object):
         """
         Export the model to a PNG image.
         """
+        from PIL import Image
         white = (255, 255, 255)
         width = int(TModel_Size.DOM_X/TModel_Size.DX)
         height = int(TModel_Size.DOM_Y/TModel_Size.DY)
@@ -1,7 +1,157 @@
-from tkinter import messagebox
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import io
+from math import ceil, floor
+import os
+from weakref import WeakKeyDictionary
 
-from settings import TModel_Size, TSurveySettings
-from triangulate import make_monotone, split_polygons, triangulate_monotone_polygon, Polygon
+from coalesce import coalesce_rectangles
+from culling import hidden_shapes
+from lattice import lattice_runs
+from point import TPoint
+from settings import TModel_Size, TSurveySettings, TParserSettings
+from shapes import TRect
+from simplify import simplify_polygon
+from triangulate import convex_fan, partition_rectilinear, select_engine, \
+                        to_grid, TRIANGULATION_CACHE, Vertex
+
+
+class TInputWriter(object):
+    """
+    Class streams gprMax commands to a text sink, formatting the floating
+    point numbers they contain. The writer also holds the state of a single
+    parse, so parses writing to different sinks do not interfere.
+    """
+
+    TRIANGLES_PER_WRITE = 65536     #: number of triangle commands passed to the sink at once.
+
+    def __init__(self, sink, digits = None, front = 0.0, thickness = 0.0):
+        """
+        Initialise the writer.
+
+        :param sink: object with a write method (file, io.StringIO) or
+                     a callable accepting strings (list.append,
+                     generator.send).
+        :type sink: file or callable
+        :param digits: number of significant digits of the written floating
+                       point numbers, 0 writes them unrounded. Defaults to
+                       TParserSettings.FLOAT_DIGITS.
+        :type digits: integer
+        :param front: minimal z coordinate of the model.
+        :type front: float
+        :param thickness: maximal z coordinate of the model.
+        :type thickness: float
+        """
+        self.write = sink.write if hasattr(sink, "write") else sink
+        if(digits is None):
+            digits = TParserSettings.FLOAT_DIGITS
+        self.spec = ".{}g".format(digits) if digits > 0 else None
+        self.front = front
+        self.thickness = thickness
+        #: (polygon, number of vertices, number of removed vertices) tuples.
+        self.simplification_report = []
+        self.convex_polygons = 0    #: number of polygons triangulated as convex fans.
+        self.engine_polygons = 0    #: number of polygons triangulated by an engine.
+        self.memo_hits = 0          #: number of shapes whose commands were reused.
+        self.culled_shapes = 0      #: number of shapes covered by later ones, not written.
+        self.coalesced_shapes = 0   #: number of rectangles merged into other boxes.
+        self.lattice_shapes = 0     #: number of shapes written by loops of Python blocks.
+        #: messages of recovered errors, eg. a failed pool of worker processes.
+        self.warnings = []
+
+    def number(self, value):
+        """
+        Format a command argument. Floating point numbers are rounded to
+        the configured number of significant digits, so grid snapped values
+        such as 0.1 + 0.2 are written as 0.3, and always keep a decimal
+        point or an exponent.
+
+        :param value: command argument.
+        :type value: float, integer or string
+
+        :rtype: string
+        """
+        if(not isinstance(value, float) or self.spec is None):
+            return str(value)
+        text = format(value, self.spec)
+        if(text.lstrip("-").isdigit()):
+            text += ".0"
+        return text
+
+    def command(self, name, *values):
+        """
+        Write a single command line.
+
+        :param name: command name without the leading hash.
+        :type name: string
+        :param values: command arguments.
+        :type values: float, integer or string
+        """
+        self.write("#" + name + ": " + " ".join([self.number(v) for v in values]) + "\n")
+
+    def comment(self, text):
+        """
+        Write a comment line. Lines not beginning with a hash are ignored by
+        gprMax.
+
+        :param text: comment text.
+        :type text: string
+        """
+        self.write(text + "\n")
+
+    def blank(self):
+        """
+        Write an empty line.
+        """
+        self.write("\n")
+
+    def capture(self, function, *args):
+        """
+        Call a function writing commands with this writer and collect the
+        text it writes, which is passed to the sink as well.
+
+        :param function: function taking the writer as the first argument.
+        :type function: callable
+        :param args: remaining function arguments.
+
+        :return: function result and the written text.
+        :rtype: tuple
+        """
+        chunks = []
+        write = self.write
+        self.write = chunks.append
+        try:
+            result = function(self, *args)
+        finally:
+            self.write = write
+        text = "".join(chunks)
+        write(text)
+        return result, text
+
+    def triangles(self, points, triangles, material):
+        """
+        Write triangle commands for the triangulation of a polygon. Every
+        vertex is formatted once and the lines are assembled by indexing the
+        vertex strings, in batches of TRIANGLES_PER_WRITE.
+
+        :param points: polygon vertices.
+        :type points: list of TPoint
+        :param triangles: vertex indices of the triangles.
+        :type triangles: numpy.ndarray of shape (M, 3)
+        :param material: material name.
+        :type material: string
+        """
+        import numpy as np
+        front = " " + self.number(self.front)
+        vertices = np.array([self.number(pt.x) + " " + self.number(pt.y) + front \
+                             for pt in points], dtype = object)
+        tail = " " + self.number(self.thickness - self.front) + " " + \
+               str(material) + "\n"
+        for start in range(0, len(triangles), TInputWriter.TRIANGLES_PER_WRITE):
+            batch = triangles[start:start + TInputWriter.TRIANGLES_PER_WRITE]
+            lines = "#triangle: " + vertices[batch[:, 0]] + " " + \
+                    vertices[batch[:, 1]] + " " + vertices[batch[:, 2]] + tail
+            self.write("".join(lines))
 
 
 class TParser(object):
@@ -10,13 +160,14 @@ class TParser(object):
     gprMax commands.
     """
 
-    FRONT_2D = 0.0              #: minimal z coordinate.
-    THICKNESS_2D = 0.0          #: maximal z coordinate, set to lesser value from (dx, dy).
+    FRONT_2D = 0.0              #: minimal z coordinate, the maximal one is the lesser value from (dx, dy).
     SOURCE_NAME = "mysource"    #: name of the em wave source.
-    PARSE_STRING = ""           #: string containing lines of the output file.
+    #: shape -> (revision, context, commands, number of vertices removed by the
+    #: simplification) of the last parse of every shape.
+    COMMAND_MEMO = WeakKeyDictionary()
 
     @staticmethod
-    def parse_shapes (materials, shapes, title):
+    def parse_shapes (materials, shapes, title, digits = None):
         """
         Parses given model to a gprMax compliant file.
 
@@ -24,188 +175,806 @@ class TParser(object):
         :type materials: TMaterial
         :param shapes: list of shapes.
         :type shapes: TShape, TRect, TCylin, TCylinSector, TPolygon
+        :param title: model title.
+        :type title: string
+        :param digits: significant digits of written numbers (see TInputWriter).
+        :type digits: integer
 
         :rtype: string
         """
-        TParser.PARSE_STRING = ""
-        TParser.THICKNESS_2D = min(TModel_Size.DX, TModel_Size.DY)
+        buffer = io.StringIO()
+        TParser.write_shapes(buffer, materials, shapes, title, digits)
+        return buffer.getvalue()
+
+    @staticmethod
+    def write_shapes(sink, materials, shapes, title, digits = None):
+        """
+        Stream given model as a gprMax compliant file to a text sink, command
+        by command, without building the whole file in memory.
+
+        :param sink: file-like object or a callable accepting strings (see
+                     TInputWriter).
+        :type sink: file or callable
+        :param materials: list of materials.
+        :type materials: TMaterial
+        :param shapes: list of shapes.
+        :type shapes: TShape, TRect, TCylin, TCylinSector, TPolygon
+        :param title: model title.
+        :type title: string
+        :param digits: significant digits of written numbers (see TInputWriter).
+        :type digits: integer
+
+        :return: writer holding the parse statistics.
+        :rtype: TInputWriter
+        """
+        writer = TInputWriter(sink, digits, TParser.FRONT_2D, \
+                              min(TModel_Size.DX, TModel_Size.DY))
+        TParser.write_header(writer, title)
+        # Materials
+        for single_material in materials:
+            writer.command("material", single_material.epsilon_r, single_material.sigma, \
+                           single_material.mu_r, single_material.sigma_mag, \
+                           str(single_material.name))
+        writer.blank()
+        # Shapes overwritten by later ones are not written
+        if(TParserSettings.CULL_HIDDEN):
+            hidden = set(hidden_shapes(shapes))
+            if(hidden):
+                shapes = [s for i, s in enumerate(shapes) if i not in hidden]
+                writer.culled_shapes = len(hidden)
+                writer.comment("Shapes covered by later shapes removed: " + \
+                               str(len(hidden)))
+        # Rectangles of the same material are merged into larger boxes
+        if(TParserSettings.COALESCE_BOXES):
+            merged, absorbed = coalesce_rectangles(shapes)
+            if(absorbed):
+                shapes = [TParser.merged_rectangle(merged[i]) if i in merged else s \
+                          for i, s in enumerate(shapes) if i not in absorbed]
+                writer.coalesced_shapes = len(absorbed)
+                writer.comment("Rectangles merged into larger boxes: " + \
+                               str(len(absorbed)))
+        # Regular arrays of equal shapes are written as loops of Python blocks
+        lattices = {}       # first index -> (number of shapes, lattice)
+        in_lattices = set()
+        if(TParserSettings.PYTHON_LATTICES):
+            for indices, lattice in lattice_runs(shapes, TParserSettings.LATTICE_MIN_SHAPES):
+                lattices[indices[0]] = (len(indices), lattice)
+                in_lattices.update(indices)
+        # Commands of shapes unchanged since the last parse in the same context
+        # are reused
+        context = TParser.memo_context(writer)
+        memo = {}
+        if(TParserSettings.COMMAND_MEMO):
+            for single_shape in shapes:
+                entry = TParser.COMMAND_MEMO.get(single_shape)
+                if(entry is not None and entry[0] == single_shape.revision and \
+                   entry[1] == context):
+                    memo[id(single_shape)] = entry
+        # Decompose all the polygons up front, triangulating possibly in parallel
+        outlines = [TParser.simplify(s, writer) for s in shapes \
+                    if s.type == "Polygon" and id(s) not in memo]
+        boxes = [TParser.rectilinear_boxes(points) for points in outlines]
+        triangulations = iter(TParser.triangulate_all([points for points, polygon_boxes \
+                                                       in zip(outlines, boxes) \
+                                                       if polygon_boxes is None], \
+                                                      writer))
+        outlines = iter(outlines)
+        boxes = iter(boxes)
+
+        def parse_shape(writer, single_shape):
+            """
+            Introduce a shape into the input file.
+
+            :param writer: output writer.
+            :type writer: TInputWriter
+            :param single_shape: examined shape.
+            :type single_shape: TShape
+
+            :return: number of vertices removed by the simplification.
+            :rtype: integer
+            """
+            if(single_shape.type == "Rectangle"):
+                TParser.parse_rectangle(writer, single_shape)
+            elif(single_shape.type == "Cylinder"):
+                TParser.parse_cylinder(writer, single_shape)
+            elif(single_shape.type == "CylinSector"):
+                TParser.parse_cylinSector(writer, single_shape)
+            elif(single_shape.type == "Polygon"):
+                points = next(outlines)
+                polygon_boxes = next(boxes)
+                if(polygon_boxes is None):
+                    TParser.parse_polygon(writer, single_shape, points, \
+                                          triangles = next(triangulations))
+                else:
+                    TParser.parse_polygon(writer, single_shape, points, \
+                                          boxes = polygon_boxes)
+                return len(single_shape.points_mod) - len(points)
+            else:
+                raise Exception("Invalid shape in shapes' list!")
+            return 0
+
+        # Shapes
+        for num, single_shape in enumerate(shapes):
+            if(num in lattices):
+                count, lattice = lattices[num]
+                TParser.parse_lattice(writer, single_shape, lattice)
+                writer.lattice_shapes += count
+                continue
+            if(num in in_lattices):
+                continue
+            entry = memo.get(id(single_shape))
+            if(entry is not None):
+                writer.write(entry[2])
+                if(entry[3] > 0):
+                    writer.simplification_report.append((single_shape, \
+                                                         len(single_shape.points_mod), \
+                                                         entry[3]))
+                writer.memo_hits += 1
+            elif(TParserSettings.COMMAND_MEMO):
+                removed, commands = writer.capture(parse_shape, single_shape)
+                TParser.COMMAND_MEMO[single_shape] = (single_shape.revision, context, \
+                                                      commands, removed)
+            else:
+                parse_shape(writer, single_shape)
+        TParser.write_footer(writer)
+        return writer
+
+    @staticmethod
+    def write_voxels(sink, materials, shapes, title, geometry_name, materials_name, \
+                     digits = None):
+        """
+        Stream given model as a gprMax compliant file whose geometry is read
+        from a voxel grid (see TParser.material_grid()) with a single
+        #geometry_objects_read command. The grid is written to a HDF5 file
+        and the materials it indexes to a text file, both referenced by
+        their base names, so they have to be kept next to the input file.
+
+        :param sink: file-like object or a callable accepting strings (see
+                     TInputWriter).
+        :type sink: file or callable
+        :param materials: list of materials.
+        :type materials: TMaterial
+        :param shapes: list of shapes.
+        :type shapes: TShape, TRect, TCylin, TCylinSector, TPolygon
+        :param title: model title.
+        :type title: string
+        :param geometry_name: HDF5 geometry file name.
+        :type geometry_name: string
+        :param materials_name: materials file name.
+        :type materials_name: string
+        :param digits: significant digits of written numbers (see TInputWriter).
+        :type digits: integer
+
+        :return: writer holding the parse statistics.
+        :rtype: TInputWriter
+        """
+        import h5py
+        import numpy as np
+        writer = TInputWriter(sink, digits, TParser.FRONT_2D, \
+                              min(TModel_Size.DX, TModel_Size.DY))
+        TParser.write_header(writer, title)
+        grid, names = TParser.material_grid(materials, shapes)
+        with h5py.File(geometry_name, "w") as geometry_file:
+            geometry_file.attrs["dx_dy_dz"] = (TModel_Size.DX, TModel_Size.DY, \
+                                               writer.thickness)
+            geometry_file.create_dataset("data", data = grid[:, :, np.newaxis])
+        definitions = {}
+        for single_material in materials:
+            definitions.setdefault(single_material.name, single_material)
+        with open(materials_name, "w") as materials_file:
+            materials_writer = TInputWriter(materials_file, digits)
+            for name in names:
+                single_material = definitions.get(name)
+                if(single_material is None):
+                    # Perfect conductor, listed as by #geometry_objects_write
+                    materials_writer.command("material", 1.0, float("inf"), 1.0, 0.0, name)
+                else:
+                    materials_writer.command("material", single_material.epsilon_r, \
+                                             single_material.sigma, single_material.mu_r, \
+                                             single_material.sigma_mag, str(name))
+        writer.command("geometry_objects_read", 0.0, 0.0, writer.front, \
+                       os.path.basename(geometry_name), os.path.basename(materials_name))
+        writer.blank()
+        TParser.write_footer(writer)
+        return writer
+
+    @staticmethod
+    def material_grid(materials, shapes):
+        """
+        Rasterise the model to its grid of cells. A cell takes the material
+        of the last shape containing the cell centre, as gprMax builds shapes
+        in file order. Every shape fills only the cells of its bounding box:
+        rectangles as a whole, other shapes where their contains_points()
+        test holds, which fills polygons scanline by scanline (see
+        triangulate.points_in_polygon()).
+
+        :param materials: list of materials.
+        :type materials: TMaterial
+        :param shapes: list of shapes.
+        :type shapes: TShape, TRect, TCylin, TCylinSector, TPolygon
+
+        :return: grid of material indices of shape (number of cells in the
+                 x direction, number of cells in the y direction), -1 for
+                 free space, and the list of indexed material names, the
+                 given materials followed by pec if it is used.
+        :rtype: tuple
+        """
+        import numpy as np
+        dx = TModel_Size.DX
+        dy = TModel_Size.DY
+        nx = int(round(TModel_Size.DOM_X/dx))
+        ny = int(round(TModel_Size.DOM_Y/dy))
+        grid = np.full((nx, ny), -1, dtype = np.int16)
+        names = []
+        indices = {"free_space": -1}
+        for single_material in materials:
+            if(single_material.name not in indices):
+                indices[single_material.name] = len(names)
+                names.append(single_material.name)
+        eps = 1e-9
+        for single_shape in shapes:
+            index = indices.get(single_shape.material)
+            if(index is None):
+                if(single_shape.material != "pec"):
+                    raise Exception("Unknown material {}!".format(single_shape.material))
+                index = indices["pec"] = len(names)
+                names.append("pec")
+            # Range of the cells whose centres lie in the bounding box
+            min_x, min_y, max_x, max_y = single_shape.bounding_box()
+            i1 = max(0, ceil(min_x/dx - 0.5 - eps))
+            i2 = min(nx, floor(max_x/dx - 0.5 + eps) + 1)
+            j1 = max(0, ceil(min_y/dy - 0.5 - eps))
+            j2 = min(ny, floor(max_y/dy - 0.5 + eps) + 1)
+            if(i1 >= i2 or j1 >= j2):
+                continue
+            if(single_shape.type == "Rectangle"):
+                grid[i1:i2, j1:j2] = index
+                continue
+            x, y = np.meshgrid((np.arange(i1, i2) + 0.5)*dx, \
+                               (np.arange(j1, j2) + 0.5)*dy, indexing = "ij")
+            inside = single_shape.contains_points(np.column_stack((x.ravel(), y.ravel())))
+            grid[i1:i2, j1:j2][inside.reshape(x.shape)] = index
+        return grid, names
+
+    @staticmethod
+    def write_raster_boxes(sink, materials, shapes, title, digits = None):
+        """
+        Stream given model as a gprMax compliant file whose geometry consists
+        of #box commands only. The model is rasterised to its grid of cells
+        (see TParser.material_grid()) and every material region is divided
+        into boxes (see TParser.grid_boxes()), so the output is exact at the
+        cell resolution and its size depends on the material boundaries
+        rather than on the number of drawn shapes.
+
+        :param sink: file-like object or a callable accepting strings (see
+                     TInputWriter).
+        :type sink: file or callable
+        :param materials: list of materials.
+        :type materials: TMaterial
+        :param shapes: list of shapes.
+        :type shapes: TShape, TRect, TCylin, TCylinSector, TPolygon
+        :param title: model title.
+        :type title: string
+        :param digits: significant digits of written numbers (see TInputWriter).
+        :type digits: integer
+
+        :return: writer holding the parse statistics.
+        :rtype: TInputWriter
+        """
+        writer = TInputWriter(sink, digits, TParser.FRONT_2D, \
+                              min(TModel_Size.DX, TModel_Size.DY))
+        TParser.write_header(writer, title)
+        for single_material in materials:
+            writer.command("material", single_material.epsilon_r, single_material.sigma, \
+                           single_material.mu_r, single_material.sigma_mag, \
+                           str(single_material.name))
+        writer.blank()
+        grid, names = TParser.material_grid(materials, shapes)
+        i1, i2, j1, j2, indices = TParser.grid_boxes(grid)
+        dx = TModel_Size.DX
+        dy = TModel_Size.DY
+        for k in range(len(indices)):
+            writer.command("box", i1[k]*dx, j1[k]*dy, writer.front, i2[k]*dx, j2[k]*dy, \
+                           writer.thickness, str(names[indices[k]]))
+        writer.blank()
+        TParser.write_footer(writer)
+        return writer
+
+    @staticmethod
+    def grid_boxes(grid):
+        """
+        Divide the regions of equal material indices of a grid into boxes.
+        Every row of cells is split into runs of equal indices, then runs
+        spanning the same columns with the same index in consecutive rows are
+        joined into boxes. Free space cells (index -1) are left out.
+
+        :param grid: grid of material indices (see TParser.material_grid()).
+        :type grid: numpy.ndarray of shape (number of cells in the x
+                    direction, number of cells in the y direction)
+
+        :return: first and past the last cell column, first and past the
+                 last cell row and the material index of every box.
+        :rtype: tuple of list of integer
+        """
+        import numpy as np
+        nx, ny = grid.shape
+        if(nx == 0 or ny == 0):
+            return [], [], [], [], []
+        # Runs along the x direction, row by row
+        rows = grid.T
+        change = np.ones((ny, nx + 1), dtype = bool)
+        change[:, 1:nx] = rows[:, 1:] != rows[:, :-1]
+        row, start = np.nonzero(change[:, :nx])
+        end = np.nonzero(change[:, 1:])[1] + 1
+        index = rows[row, start]
+        kept = index >= 0
+        row, start, end, index = row[kept], start[kept], end[kept], index[kept]
+        # Runs continuing a run of the previous row are joined with it
+        order = np.lexsort((row, index, end, start))
+        row, start, end, index = row[order], start[order], end[order], index[order]
+        new_box = np.ones(len(row), dtype = bool)
+        new_box[1:] = (start[1:] != start[:-1]) | (end[1:] != end[:-1]) | \
+                      (index[1:] != index[:-1]) | (row[1:] != row[:-1] + 1)
+        first = np.nonzero(new_box)[0]
+        last = np.append(first[1:], len(row)) - 1
+        return start[first].tolist(), end[first].tolist(), row[first].tolist(), \
+               (row[last] + 1).tolist(), index[first].tolist()
+
+    @staticmethod
+    def write_header(writer, title):
+        """
+        Write the model and survey settings preceding the geometry.
+
+        :param writer: output writer.
+        :type writer: TInputWriter
+        :param title: model title.
+        :type title: string
+        """
         # Title
         if (title):
-            TParser.PARSE_STRING += "#title: " + title + "\n"
+            writer.command("title", title)
         # Domain
-        TParser.PARSE_STRING += "#domain: " + str(TModel_Size.DOM_X) + " " + \
-                                str(TModel_Size.DOM_Y) + " " + \
-                                str(TParser.THICKNESS_2D) + "\n"
+        writer.command("domain", TModel_Size.DOM_X, TModel_Size.DOM_Y, writer.thickness)
         # dx_dy_dz
-        TParser.PARSE_STRING += "#dx_dy_dz: " + str(TModel_Size.DX) + " " + \
-                                str(TModel_Size.DY) + " " + \
-                                str(TParser.THICKNESS_2D) + "\n"
+        writer.command("dx_dy_dz", TModel_Size.DX, TModel_Size.DY, writer.thickness)
         # Time window
-        TParser.PARSE_STRING += "#time_window: " + str(TSurveySettings.TIME_WINDOW) + "\n"
+        writer.command("time_window", TSurveySettings.TIME_WINDOW)
         # Time stability factor
         if(TSurveySettings.TSF != 1.0):
-            TParser.PARSE_STRING += "#time_stability_factor: " + str(TSurveySettings.TSF) + "\n"
-        TParser.PARSE_STRING += "\n"
+            writer.command("time_stability_factor", TSurveySettings.TSF)
+        writer.blank()
         # Wavefrom
-        TParser.PARSE_STRING += "#waveform: " + TSurveySettings.WAVE_TYPE + " " + \
-                                str(TSurveySettings.AMPLITUDE) + " " + \
-                                str(TSurveySettings.FREQUENCY) + " mysource\n"
+        writer.command("waveform", TSurveySettings.WAVE_TYPE, TSurveySettings.AMPLITUDE, \
+                       TSurveySettings.FREQUENCY, TParser.SOURCE_NAME)
         # Transmitter
-        TParser.PARSE_STRING += "#" + TSurveySettings.SRC_TYPE + ": z " + \
-                                str(TSurveySettings.SRC_X) + " " + \
-                                str(TSurveySettings.SRC_Y) + " " + \
-                                str(TParser.FRONT_2D) + " mysource\n"
+        writer.command(TSurveySettings.SRC_TYPE, "z", TSurveySettings.SRC_X, \
+                       TSurveySettings.SRC_Y, writer.front, TParser.SOURCE_NAME)
         # Receiver
-        TParser.PARSE_STRING += "#rx: " + str(TSurveySettings.RX_X) + " " + \
-                                str(TSurveySettings.RX_Y) + " " + \
-                                str(TParser.FRONT_2D) + "\n"
+        writer.command("rx", TSurveySettings.RX_X, TSurveySettings.RX_Y, writer.front)
         # rx array
         if(TSurveySettings.TYPE == "rx_array"):
-            TParser.PARSE_STRING += "#rx_array: " + str(TSurveySettings.RX_X) + \
-                                    " " + str(TSurveySettings.RX_Y) + " " + \
-                                    str(TParser.FRONT_2D) + " " + \
-                                    str(TSurveySettings.RX_MAX_X) + " " + \
-                                    str(TSurveySettings.RX_MAX_Y) + " " + \
-                                    str(TParser.FRONT_2D) + " " + \
-                                    str(TSurveySettings.RX_STEP_X) + " " + \
-                                    str(TSurveySettings.RX_STEP_Y) + " " + \
-                                    str(TParser.FRONT_2D) + "\n"
+            writer.command("rx_array", TSurveySettings.RX_X, TSurveySettings.RX_Y, \
+                           writer.front, TSurveySettings.RX_MAX_X, \
+                           TSurveySettings.RX_MAX_Y, writer.front, \
+                           TSurveySettings.RX_STEP_X, TSurveySettings.RX_STEP_Y, \
+                           writer.front)
         # bscan
         if(TSurveySettings.TYPE == "bscan"):
-            TParser.PARSE_STRING += "#src_steps: " + str(TSurveySettings.SRC_STEP_X) + \
-                                    " " + str(TSurveySettings.SRC_STEP_Y) + " " + \
-                                    str(TParser.FRONT_2D) + "\n"
-            TParser.PARSE_STRING += "#rx_steps: " + str(TSurveySettings.RX_STEP_X) + \
-                                    " " + str(TSurveySettings.RX_STEP_Y) + " " + \
-                                    str(TParser.FRONT_2D) + "\n"
-        TParser.PARSE_STRING += "\n"
-        # Materials
-        for single_material in materials:
-            TParser.PARSE_STRING += "#material: " + str(single_material.epsilon_r) + " " + \
-                str(single_material.sigma) + " " + str(single_material.mu_r) + " " + \
-                str(single_material.sigma_mag) + " " + str(single_material.name) + "\n"
-        TParser.PARSE_STRING += "\n"
-        # Shapes
-        for single_shape in shapes:
-            if(single_shape.type == "Rectangle"):
-                TParser.parse_rectangle(single_shape)
-            elif(single_shape.type == "Cylinder"):
-                TParser.parse_cylinder(single_shape)
-            elif(single_shape.type == "CylinSector"):
-                TParser.parse_cylinSector(single_shape)
-            elif(single_shape.type == "Polygon"):
-                TParser.parse_polygon(single_shape)
-            else:
-                raise Exception("Invalid shape in shapes' list!")
+            writer.command("src_steps", TSurveySettings.SRC_STEP_X, \
+                           TSurveySettings.SRC_STEP_Y, writer.front)
+            writer.command("rx_steps", TSurveySettings.RX_STEP_X, \
+                           TSurveySettings.RX_STEP_Y, writer.front)
+        writer.blank()
+
+    @staticmethod
+    def write_footer(writer):
+        """
+        Write the output settings following the geometry.
+
+        :param writer: output writer.
+        :type writer: TInputWriter
+        """
         # Messages:
         if(TSurveySettings.MESSAGES == "no"):
-            TParser.PARSE_STRING += "#messages: n\n"
+            writer.command("messages", "n")
         # Geometry view
         if(TSurveySettings.GEOM_VIEW == "yes"):
-            TParser.PARSE_STRING += "#geometry_view: 0.0 0.0 0.0 " + str(TModel_Size.DOM_X) + \
-                                    " " + str(TModel_Size.DOM_Y) + " " + \
-                                    str(TParser.THICKNESS_2D) + " " + \
-                                    str(TModel_Size.DX) + " " + str(TModel_Size.DY) + \
-                                    " " + str(TParser.THICKNESS_2D) + " " + \
-                                    TSurveySettings.GEOM_FILE + " n\n"
+            writer.command("geometry_view", 0.0, 0.0, 0.0, TModel_Size.DOM_X, \
+                           TModel_Size.DOM_Y, writer.thickness, TModel_Size.DX, \
+                           TModel_Size.DY, writer.thickness, \
+                           TSurveySettings.GEOM_FILE, "n")
         # Snapshot
         if(TSurveySettings.SNAPSHOT == "yes"):
-            TParser.PARSE_STRING += "#snapshot: 0.0 0.0 0.0 " + str(TModel_Size.DOM_X) + \
-                                    " " + str(TModel_Size.DOM_Y) + " " + \
-                                    str(TParser.THICKNESS_2D) + " " + \
-                                    str(TModel_Size.DX) + " " + str(TModel_Size.DY) + \
-                                    " " + str(TParser.THICKNESS_2D) + " " + \
-                                    str(TSurveySettings.SNAP_TIME) + " " + \
-                                    TSurveySettings.SNAP_FILE + " n\n"
-        return TParser.PARSE_STRING
+            writer.command("snapshot", 0.0, 0.0, 0.0, TModel_Size.DOM_X, \
+                           TModel_Size.DOM_Y, writer.thickness, TModel_Size.DX, \
+                           TModel_Size.DY, writer.thickness, \
+                           TSurveySettings.SNAP_TIME, TSurveySettings.SNAP_FILE, "n")
+
+    @staticmethod
+    def memo_context(writer):
+        """
+        Collect the global values shape commands depend on besides the shape
+        itself. Commands memoised under another context are not reused.
+
+        :param writer: output writer.
+        :type writer: TInputWriter
+
+        :rtype: tuple
+        """
+        return (writer.spec, writer.front, writer.thickness, TModel_Size.DX, \
+                TModel_Size.DY, TParserSettings.SIMPLIFY, \
+                TParserSettings.SIMPLIFY_TOLERANCE, TParserSettings.RECTILINEAR_BOXES, \
+                TParserSettings.RECTILINEAR_MAX_CELLS, TParserSettings.TRIANGULATION_ENGINE, \
+                TParserSettings.EAR_CLIPPING_MAX_VERTICES)
+
+    @staticmethod
+    def merged_rectangle(box):
+        """
+        Create a rectangle from a box merged of several rectangles (see
+        coalesce.coalesce_rectangles()).
+
+        :param box: x1, y1, x2, y2 coordinates and material of the box.
+        :type box: tuple
+
+        :rtype: TRect
+        """
+        return TRect(point1_mod = TPoint(box[0], box[1]), point2_mod = TPoint(box[2], box[3]), \
+                     material = box[4])
 
     @staticmethod
-    def parse_rectangle(rectangle):
+    def parse_rectangle(writer, rectangle):
         """
         Introduce a rectangle into the input file.
 
+        :param writer: output writer.
+        :type writer: TInputWriter
         :param rectangle: examined rectangle object.
         :type rectangle: TRect
         """
-        TParser.PARSE_STRING += "#box: " + str(rectangle.point1_mod.x) + " " + \
-                                str(rectangle.point1_mod.y) + " " + str(TParser.FRONT_2D) + \
-                                " " + str(rectangle.point2_mod.x) + " " + str(rectangle.point2_mod.y) + \
-                                " " + str(TParser.THICKNESS_2D) + " " + rectangle.material + "\n"
+        writer.command("box", rectangle.point1_mod.x, rectangle.point1_mod.y, \
+                       writer.front, rectangle.point2_mod.x, rectangle.point2_mod.y, \
+                       writer.thickness, rectangle.material)
 
     @staticmethod
-    def parse_cylinder(cylinder):
+    def parse_cylinder(writer, cylinder):
         """
         Introduce a cylinder into the input file.
 
+        :param writer: output writer.
+        :type writer: TInputWriter
         :param cylinder: examined cylinder object.
         :type cylinder: TCylin
         """
-        TParser.PARSE_STRING += "#cylinder: " + str(cylinder.centre_mod.x) + " " + \
-                                str(cylinder.centre_mod.y) + " " + str(TParser.FRONT_2D) + \
-                                " " + str(cylinder.centre_mod.x) + " " + str(cylinder.centre_mod.y) + \
-                                " " + str(TParser.THICKNESS_2D) + " " + str(cylinder.radius_mod) + \
-                                " " + str(cylinder.material) + "\n"
+        writer.command("cylinder", cylinder.centre_mod.x, cylinder.centre_mod.y, \
+                       writer.front, cylinder.centre_mod.x, cylinder.centre_mod.y, \
+                       writer.thickness, cylinder.radius_mod, str(cylinder.material))
     
     @staticmethod
-    def parse_cylinSector(cylinSector):
+    def parse_cylinSector(writer, cylinSector):
         """
         Introduce a cylinder sector into the input file.
 
+        :param writer: output writer.
+        :type writer: TInputWriter
         :param cylinsector: examined cylinder sector object.
         :type cylinsector: TCylinSector
         """
-        TParser.PARSE_STRING += "#cylindrical_sector: z " + str(cylinSector.centre_mod.x) + \
-                                " " + str(cylinSector.centre_mod.y) + " " + str(TParser.FRONT_2D) + \
-                                " " + str(TParser.THICKNESS_2D) + " " + str(cylinSector.radius_mod) + " " + \
-                                str(cylinSector.start) + " " + str(cylinSector.extent) + \
-                                " " + str(cylinSector.material) + "\n"
+        writer.command("cylindrical_sector", "z", cylinSector.centre_mod.x, \
+                       cylinSector.centre_mod.y, writer.front, writer.thickness, \
+                       cylinSector.radius_mod, cylinSector.start, cylinSector.extent, \
+                       str(cylinSector.material))
     
     @staticmethod
-    def parse_polygon(polygon):
+    def parse_lattice(writer, shape, lattice):
+        """
+        Introduce a lattice of shapes equal to a given one into the input
+        file as a Python block, which loops over the lattice and prints
+        a command for every shape.
+
+        :param writer: output writer.
+        :type writer: TInputWriter
+        :param shape: first shape of the lattice.
+        :type shape: TRect, TCylin or TCylinSector
+        :param lattice: origin, a vector, n, b vector and m of the lattice (see
+                        lattice.find_lattice()).
+        :type lattice: tuple
+        """
+        origin, a, n, b, m = lattice
+        number = writer.number
+        lines = ["for i in range({}):".format(n)]
+        x = number(origin[0])
+        y = number(origin[1])
+        steps = [("i", a)]
+        if(m > 1):
+            lines.append("    for j in range({}):".format(m))
+            steps.append(("j", b))
+        # Translations along a single axis are written without zero terms
+        for counter, step in steps:
+            if(step[0] != 0):
+                x += " + {}*{}".format(counter, number(step[0]))
+            if(step[1] != 0):
+                y += " + {}*{}".format(counter, number(step[1]))
+        indent = " "*4*len(lines)
+        lines.append(indent + "x = round({}, 12)".format(x))
+        lines.append(indent + "y = round({}, 12)".format(y))
+        front = number(writer.front)
+        thickness = number(writer.thickness)
+        material = repr(str(shape.material))
+        if(shape.type == "Rectangle"):
+            arguments = ["x", "y", front, \
+                         "round(x + {}, 12)".format(number(shape.point2_mod.x - \
+                                                           shape.point1_mod.x)), \
+                         "round(y + {}, 12)".format(number(shape.point2_mod.y - \
+                                                           shape.point1_mod.y)), \
+                         thickness, material]
+            name = "box"
+        elif(shape.type == "Cylinder"):
+            arguments = ["x", "y", front, "x", "y", thickness, number(shape.radius_mod), \
+                         material]
+            name = "cylinder"
+        else:
+            arguments = ["'z'", "x", "y", front, thickness, number(shape.radius_mod), \
+                         number(shape.start), number(shape.extent), material]
+            name = "cylindrical_sector"
+        lines.append(indent + "print('#{}:', {})".format(name, ", ".join(arguments)))
+        writer.write("#python:\n" + "\n".join(lines) + "\n#end_python:\n")
+
+    @staticmethod
+    def parse_polygon(writer, polygon, points = None, triangles = None, boxes = None):
         """
-        Introduce a polygon into the input file as a series of triangles.
+        Introduce a polygon into the input file as a series of boxes if it is
+        rectilinear, or triangles otherwise. Number of vertices removed by
+        the simplification is noted in a comment line.
 
+        :param writer: output writer.
+        :type writer: TInputWriter
         :param polygon: examined polygon object.
         :type polygon: TPolygon
+        :param points: simplified polygon outline (see TParser.simplify()).
+        :type points: list of TPoint
+        :param triangles: precomputed triangulation of the polygon (see
+                          TParser.triangulate_all()).
+        :type triangles: numpy.ndarray of shape (M, 3)
+        :param boxes: precomputed rectangles the polygon is made of (see
+                      TParser.rectilinear_boxes()).
+        :type boxes: list of tuple
         """
+        if(points is None):
+            points = TParser.simplify(polygon, writer)
+        removed = len(polygon.points_mod) - len(points)
+        if(removed > 0):
+            writer.comment("Polygon simplified: " + str(removed) + " of " + \
+                           str(len(polygon.points_mod)) + " vertices removed")
+        if(boxes is None and triangles is None):
+            boxes = TParser.rectilinear_boxes(points)
+        if(boxes):
+            for x_min, y_min, x_max, y_max in boxes:
+                writer.command("box", x_min, y_min, writer.front, x_max, y_max, \
+                               writer.thickness, str(polygon.material))
+            return
         # Triangulate the polygon
-        tt = TParser.triangulate(polygon)
-        for tr in tt:
-            TParser.PARSE_STRING += "#triangle: " + str(tr[0].x) + " " + \
-                                    str(tr[0].y) + " " + str(TParser.FRONT_2D) + \
-                                    " " + str (tr[1].x) + " " + str(tr[1].y) + " " +\
-                                    str(TParser.FRONT_2D) + " " + str(tr[2].x) + " " + \
-                                    str(tr[2].y) + " " + str(TParser.FRONT_2D) + " " +\
-                                    str(TParser.THICKNESS_2D - TParser.FRONT_2D) + " " + \
-                                    str(polygon.material) + "\n"
+        if(triangles is None):
+            triangles = TParser.triangulate(points, writer)
+        if(len(triangles) == 0):
+            return
+        writer.triangles(points, triangles, polygon.material)
     
     @staticmethod
-    def triangulate(polygon):
+    def simplify(polygon, writer = None):
         """
-        Divide an input polygon into triangles using triangulate module.
+        Remove polygon vertices the model grid cannot resolve using simplify
+        module, if enabled in the settings. The tolerance is a fraction of the
+        smaller grid step.
 
         :param polygon: examined polygon object.
         :type polygon: TPolygon
+        :param writer: writer whose simplification report is extended.
+        :type writer: TInputWriter
+
+        :return: simplified polygon outline.
+        :rtype: list of TPoint
+        """
+        points = polygon.points_mod
+        if(not TParserSettings.SIMPLIFY):
+            return points
+        tolerance = TParserSettings.SIMPLIFY_TOLERANCE*min(TModel_Size.DX, TModel_Size.DY)
+        kept = simplify_polygon(points, TModel_Size.DX, TModel_Size.DY, tolerance)
+        if(writer is not None and len(kept) < len(points)):
+            writer.simplification_report.append((polygon, len(points), \
+                                                 len(points) - len(kept)))
+        return [points[i] for i in kept]
+
+    @staticmethod
+    def rectilinear_boxes(points):
+        """
+        Divide a rectilinear polygon into a minimal number of rectangles using
+        triangulate module.
+
+        :param points: polygon vertices.
+        :type points: list of TPoint
+
+        :return: rectangles as (x_min, y_min, x_max, y_max) tuples, None if
+                 the polygon has to be triangulated.
+        :rtype: list of tuple
+        """
+        if(not TParserSettings.RECTILINEAR_BOXES):
+            return None
+        return partition_rectilinear(points, \
+                                     TParserSettings.RECTILINEAR_MAX_CELLS)
+
+    @staticmethod
+    def grid_points(points):
+        """
+        Convert polygon vertices to integer grid cell coordinates, on which
+        the triangulation predicates are exact. Vertices lying off the grid
+        are left in metres.
+
+        :param points: polygon vertices.
+        :type points: list of TPoint
 
         :rtype: list
         """
-        debug = False
-        if(debug):
-            from timeit import default_timer as timer
-            start = timer()
+        grid_points = to_grid(points, TModel_Size.DX, TModel_Size.DY)
+        if(grid_points is None):
+            return points
+        return grid_points
+
+    @staticmethod
+    def triangulate_indices(points, writer = None):
+        """
+        Divide an input polygon into triangles referring to its vertices by
+        indices. Convex polygons are divided into fans in linear time, other
+        ones are passed to an engine working on integer grid coordinates.
+        Triangulations are reused from the cache as long as the polygon
+        vertices remain unchanged.
+
+        :param points: polygon vertices.
+        :type points: list of TPoint
+        :param writer: writer whose triangulation counters are updated.
+        :type writer: TInputWriter
+
+        :return: triangles as triples of vertex indices.
+        :rtype: list of tuple
+        """
+        key = TRIANGULATION_CACHE.key(points)
+        triangles = TRIANGULATION_CACHE.get(key)
+        if(triangles is None):
+            triangles = convex_fan(points)
+            if(triangles is None):
+                engine = select_engine(len(points), \
+                                       TParserSettings.TRIANGULATION_ENGINE, \
+                                       TParserSettings.EAR_CLIPPING_MAX_VERTICES)
+                triangles = engine.triangulate(TParser.grid_points(points))
+                if(writer is not None):
+                    writer.engine_polygons += 1
+            elif(writer is not None):
+                writer.convex_polygons += 1
+            TRIANGULATION_CACHE.put(key, triangles)
+        return triangles
+
+    @staticmethod
+    def triangulate(points, writer = None):
+        """
+        Divide an input polygon into triangles using triangulate module (see
+        TParser.triangulate_indices()).
+
+        :param points: polygon vertices.
+        :type points: list of TPoint
+        :param writer: writer whose triangulation counters are updated.
+        :type writer: TInputWriter
+
+        :return: triangles as rows of vertex indices.
+        :rtype: numpy.ndarray of shape (M, 3)
+
+        :raises Exception: if the polygon can't be triangulated.
+        """
         try:
-            polygon_obj = Polygon(polygon.points_mod)
-            edges_monotone = make_monotone(polygon_obj)
-            monotone_polygons = split_polygons(polygon_obj, edges_monotone)
-            edges_triangles = []
-            triangles = []
-            for poly in monotone_polygons:
-                edges_triangles = triangulate_monotone_polygon(poly)
-                triangles += split_polygons(poly, edges_triangles)
+            triangles = TParser.triangulate_indices(points, writer)
         except Exception as message:
-            messagebox.showerror("Error while triangulating polygon!", message)
-        if(debug):
-            end = timer()
-            print("n vertices:", len(polygon.points_mod))
-            print("elapsed time:", end-start)
-        return triangles
\ No newline at end of file
+            raise Exception("Error while triangulating polygon! {}".format(message)) \
+                  from message
+        import numpy as np
+        return np.array(triangles, dtype = np.intp).reshape(-1, 3)
+
+    @staticmethod
+    def triangulate_all(outlines, writer = None):
+        """
+        Triangulate a list of polygons. Convex polygons missing from the
+        cache are divided into fans up front, the other ones are sent to
+        a pool of worker processes as flat grid coordinate arrays if their
+        total number of vertices is large enough, otherwise they are
+        triangulated one by one. If the pool fails the polygons are
+        triangulated one by one as well, and the error is added to the
+        writer's warnings.
+
+        :param outlines: vertices lists of the examined polygons.
+        :type outlines: list of list of TPoint
+        :param writer: writer whose triangulation counters and warnings are
+                       updated.
+        :type writer: TInputWriter
+
+        :return: triangulations in the order of the given polygons (see
+                 TParser.triangulate()).
+        :rtype: list of numpy.ndarray
+        """
+        workers = TParserSettings.PARALLEL_WORKERS or os.cpu_count() or 1
+        pending = {}
+        for points in outlines:
+            key = TRIANGULATION_CACHE.key(points)
+            if(key in pending or key in TRIANGULATION_CACHE):
+                continue
+            # Convex fans are cached here, so they are not checked again
+            triangles = convex_fan(points)
+            if(triangles is None):
+                pending[key] = points
+            else:
+                TRIANGULATION_CACHE.put(key, triangles)
+                if(writer is not None):
+                    writer.convex_polygons += 1
+        num_of_vertices = sum(len(points) for points in pending.values())
+        if(workers > 1 and len(pending) > 1 and \
+           num_of_vertices >= TParserSettings.PARALLEL_MIN_VERTICES):
+            jobs = []
+            for points in pending.values():
+                coordinates = array("d")
+                for pt in TParser.grid_points(points):
+                    coordinates.append(pt.x)
+                    coordinates.append(pt.y)
+                jobs.append((coordinates, TParserSettings.TRIANGULATION_ENGINE, \
+                             TParserSettings.EAR_CLIPPING_MAX_VERTICES))
+            workers = min(workers, len(jobs))
+            chunksize = max(1, len(jobs)//(4*workers))
+            try:
+                with ProcessPoolExecutor(max_workers = workers) as executor:
+                    results = list(executor.map(_triangulate_coordinates, jobs, \
+                                                chunksize = chunksize))
+            except Exception as message:
+                # The polygons are triangulated one by one instead
+                if(writer is not None):
+                    writer.warnings.append("Error while triangulating polygons in " \
+                                           "parallel! {}".format(message))
+                results = []
+            # Polygons whose triangulation failed are left to TParser.triangulate()
+            import numpy as np
+            done = {}
+            for key, (indices, error) in zip(pending, results):
+                if(error is None):
+                    done[key] = np.frombuffer(indices, dtype = indices.typecode).reshape(-1, 3)
+                    TRIANGULATION_CACHE.put(key, list(zip(indices[0::3], indices[1::3], \
+                                                          indices[2::3])))
+                    if(writer is not None):
+                        writer.engine_polygons += 1
+            triangulations = []
+            for points in outlines:
+                triangles = done.get(TRIANGULATION_CACHE.key(points))
+                if(triangles is None):
+                    triangles = TParser.triangulate(points, writer)
+                triangulations.append(triangles)
+            return triangulations
+        return [TParser.triangulate(points, writer) for points in outlines]
+
+
+def _triangulate_coordinates(job):
+    """
+    Triangulate a polygon in a worker process.
+
+    :param job: flat array of alternating vertices x and y coordinates, name
+                of the engine and the ear clipping vertices limit (see
+                triangulate.select_engine()).
+    :type job: tuple
+
+    :return: flat array of triangles vertices indices and None, or None and
+             an error message if the triangulation failed.
+    :rtype: tuple
+    """
+    coordinates, engine_name, ear_clipping_max_vertices = job
+    points = [Vertex(x, y) for x, y in zip(coordinates[0::2], coordinates[1::2])]
+    try:
+        engine = select_engine(len(points), engine_name, ear_clipping_max_vertices)
+        triangles = engine.triangulate(points)
+    except Exception as message:
+        return None, str(message)
+    indices = array("l")
+    for triangle in triangles:
+        indices.extend(triangle)
+    return indices, None
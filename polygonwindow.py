@@ -107,9 +107,8 @@ class TPolygonWindow(simpledialog.Dialog):
         except ValueError as e:
             messagebox.showerror("Wrong input!", e)
         else:
-            edited_point = self._polygon.points_mod[vertex_num]
-            edited_point.x, edited_point.y = float(new_x), float(new_y)
-            self._polygon.update_window_positions()
+            self._polygon.edit_vertex(vertex_num = vertex_num, x = float(new_x), \
+                                      y = float(new_y))
             self._app.main_canvas.delete("all")
             self._app.canvas_refresh()
         finally:
@@ -3,7 +3,8 @@
 :synopsis: Module contains a few classes that encapsulate various application
            settings, eg. window and model size, label ticks settings etc...
            The settings are organised into following classes: TWindow_Size,
-           TModel_Size, TTicksSettings, TSurveySettings, and TColours.
+           TModel_Size, TTicksSettings, TSurveySettings, TColours and
+           TParserSettings.
 
 .. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
 """
@@ -85,4 +86,24 @@ class TColours():
     """
     Class contains colours diplay settings.
     """
-    FILL = False    #: toggle filling shapes with an uniform colour.
\ No newline at end of file
+    FILL = False    #: toggle filling shapes with an uniform colour.
+
+
+class TParserSettings():
+    """
+    Class contains gprMax input file parser settings.
+    """
+    TRIANGULATION_ENGINE        = "auto"    #: polygon triangulation engine (auto, earclipping, monotone).
+    EAR_CLIPPING_MAX_VERTICES   = 256       #: maximal number of polygon vertices for which the auto mode picks ear clipping.
+    PARALLEL_WORKERS            = 0         #: number of triangulation processes, 0 for the CPU count, 1 disables parallel triangulation.
+    PARALLEL_MIN_VERTICES       = 20000     #: minimal total number of vertices of uncached polygons triangulated in parallel.
+    RECTILINEAR_BOXES           = True      #: toggle emitting rectilinear polygons as boxes instead of triangles.
+    RECTILINEAR_MAX_CELLS       = 250000    #: maximal size of the grid used to divide a rectilinear polygon into boxes.
+    SIMPLIFY                    = False     #: toggle removing polygon vertices the grid cannot resolve.
+    SIMPLIFY_TOLERANCE          = 1.0       #: maximal deviation of a simplified outline as a fraction of the smaller grid step.
+    FLOAT_DIGITS                = 12        #: significant digits of numbers written to the input file, 0 writes them unrounded.
+    COMMAND_MEMO                = True      #: toggle reusing commands of shapes unchanged since the previous parse.
+    CULL_HIDDEN                 = True      #: toggle dropping shapes entirely covered by shapes following them.
+    COALESCE_BOXES              = True      #: toggle merging rectangles of the same material into larger boxes.
+    PYTHON_LATTICES             = True      #: toggle writing regular arrays of equal shapes as loops of #python blocks.
+    LATTICE_MIN_SHAPES          = 8         #: minimal number of shapes written as a #python block.
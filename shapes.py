@@ -13,16 +13,15 @@
 
 from copy import copy, deepcopy
 from math import asin, acos, atan, degrees, sin, cos, radians, ceil, floor, pi
-from PIL import Image, ImageDraw
 from random import randrange
-from tkinter import Tk, Canvas, Menu, messagebox, BooleanVar, Frame, Button
-from tkinter import LEFT, TOP, X, FLAT, RAISED, SUNKEN, ARC, PIESLICE, CHORD, W, S
 
 from abc import ABC, abstractmethod
 from geometry import TGeometry as TG
 from point import TPoint
 from random import randrange
-from settings import TWindow_Size, TModel_Size, TTicksSettings, TColours
+from settings import TWindow_Size, TModel_Size, TTicksSettings, TColours, \
+                     TParserSettings
+from triangulate import points_in_polygon, repair_triangulation, TRIANGULATION_CACHE
 
 
 class TShape(ABC):
@@ -41,6 +40,8 @@ class TShape(ABC):
     :param shape_type: shape type (ie. rectangle, cylinder etc.).
     :type shape_type: string
     """
+    revision = 0    #: number of changes of the shape model coordinates or material.
+
     def __init__(self, width = None, colour = None, fill = "", material = "pec", \
                  shape_type = "None"):
         """
@@ -57,6 +58,28 @@ class TShape(ABC):
         self.fill = self.COLOURS[random_index]
         # Adjust shape position on screen according to new model coordinates
         self.update_window_positions()
+
+    @property
+    def material(self):
+        """
+        Shape material name.
+
+        :rtype: string
+        """
+        return self._material
+
+    @material.setter
+    def material(self, material):
+        self._material = material
+        self.touch()
+
+    def touch(self):
+        """
+        Bump the revision counter of the shape. Has to be called whenever its
+        model coordinates change, so commands generated for the previous
+        revision are not reused (see parsetofile.TParser.COMMAND_MEMO).
+        """
+        self.revision += 1
     
     @abstractmethod
     def draw(self):
@@ -101,6 +124,30 @@ class TShape(ABC):
         :rtype: float
         """
         pass
+
+    @abstractmethod
+    def bounding_box(self):
+        """
+        Calculate the smallest axis aligned box enclosing the shape.
+
+        :return: minimal x, minimal y, maximal x and maximal y coordinates
+                 in metres.
+        :rtype: tuple
+        """
+        pass
+
+    @abstractmethod
+    def contains_points(self, points):
+        """
+        Classify a batch of points as lying inside or outside the shape.
+
+        :param points: examined points in metres, one per row.
+        :type points: numpy.ndarray of shape (N, 2)
+
+        :return: True for the points lying inside the shape.
+        :rtype: numpy.ndarray of boolean
+        """
+        pass
     
     @abstractmethod
     def draw_to_image(self, image, colour):
@@ -242,6 +289,7 @@ class TRect(TShape):
                                              min_window, max_window, dx, dy)
         self.point4_mod = TG.window_to_model(self.point4, min_model, max_model, \
                                              min_window, max_window, dx, dy)
+        self.touch()
     
     def visible(self, min_model, max_model):
         """
@@ -279,6 +327,39 @@ class TRect(TShape):
         len_y = abs(self.point2_mod.y - self.point1_mod.y)
         return len_x*len_y
 
+    def bounding_box(self):
+        """
+        Calculate the smallest axis aligned box enclosing the rectangle.
+
+        :return: minimal x, minimal y, maximal x and maximal y coordinates
+                 in metres.
+        :rtype: tuple
+        """
+        return (min(self.point1_mod.x, self.point2_mod.x), \
+                min(self.point1_mod.y, self.point2_mod.y), \
+                max(self.point1_mod.x, self.point2_mod.x), \
+                max(self.point1_mod.y, self.point2_mod.y))
+
+    def contains_points(self, points):
+        """
+        Classify a batch of points as lying inside or outside the rectangle,
+        boundary included.
+
+        :param points: examined points in metres, one per row.
+        :type points: numpy.ndarray of shape (N, 2)
+
+        :return: True for the points lying inside the rectangle.
+        :rtype: numpy.ndarray of boolean
+        """
+        import numpy as np
+        points = np.asarray(points, dtype = float).reshape(-1, 2)
+        x, y = points[:, 0], points[:, 1]
+        min_x = min(self.point1_mod.x, self.point2_mod.x)
+        max_x = max(self.point1_mod.x, self.point2_mod.x)
+        min_y = min(self.point1_mod.y, self.point2_mod.y)
+        max_y = max(self.point1_mod.y, self.point2_mod.y)
+        return (x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y)
+
     def draw_to_image(self, image, colour):
         """
         Draw the rectangle to a png image file.
@@ -288,6 +369,7 @@ class TRect(TShape):
         :param colour: shape colour.
         :type colour: tuple
         """
+        from PIL import ImageDraw
         draw = ImageDraw.Draw(image)
         point1_im_x = (self.point1_mod.x/TModel_Size.DOM_X)*image.width
         point1_im_y = (1-(self.point1_mod.y/TModel_Size.DOM_Y))*image.height
@@ -432,6 +514,34 @@ class TCylin(TShape):
         :rtype: float
         """
         return self.radius_mod**2*pi
+
+    def bounding_box(self):
+        """
+        Calculate the smallest axis aligned box enclosing the cylinder.
+
+        :return: minimal x, minimal y, maximal x and maximal y coordinates
+                 in metres.
+        :rtype: tuple
+        """
+        return (self.centre_mod.x - self.radius_mod, self.centre_mod.y - self.radius_mod, \
+                self.centre_mod.x + self.radius_mod, self.centre_mod.y + self.radius_mod)
+
+    def contains_points(self, points):
+        """
+        Classify a batch of points as lying inside or outside the cylinder,
+        boundary included.
+
+        :param points: examined points in metres, one per row.
+        :type points: numpy.ndarray of shape (N, 2)
+
+        :return: True for the points lying inside the cylinder.
+        :rtype: numpy.ndarray of boolean
+        """
+        import numpy as np
+        points = np.asarray(points, dtype = float).reshape(-1, 2)
+        dx = points[:, 0] - self.centre_mod.x
+        dy = points[:, 1] - self.centre_mod.y
+        return dx*dx + dy*dy <= self.radius_mod**2
     
     def update_window_positions(self):
         """
@@ -460,6 +570,7 @@ class TCylin(TShape):
                                              min_window, max_window, dx, dy)
         self.radius_mod = TG.dist_window_to_model(self.radius, min_model, max_model, \
                                                   min_window, max_window, dx, dy)
+        self.touch()
 
     def visible(self, min_model, max_model):
         """
@@ -500,6 +611,7 @@ class TCylin(TShape):
         :param colour: shape colour.
         :type colour: tuple
         """
+        from PIL import ImageDraw
         draw = ImageDraw.Draw(image)
         centre_im_x = (self.centre_mod.x/TModel_Size.DOM_X)*image.width
         centre_im_y = (1-(self.centre_mod.y/TModel_Size.DOM_Y))*image.height
@@ -620,6 +732,8 @@ class TCylinSector(TShape):
         :param canvas: canvas on which to draw the cylinder sector.
         :type canvas: tkinter.Canvas
         """
+        from tkinter import PIESLICE
+
         if(TColours.FILL):
             fill = self.fill
         else:
@@ -673,6 +787,7 @@ class TCylinSector(TShape):
                                                    min_window, max_window, dx, dy)
         self.radius_mod = TG.dist_window_to_model(self.radius,  min_model, max_model, \
                                                   min_window, max_window, dx, dy)
+        self.touch()
     
     def visible(self, min_model, max_model):
         """
@@ -711,6 +826,48 @@ class TCylinSector(TShape):
         :rtype: float
         """
         return (self.extent/360.0)*self.radius_mod**2*pi
+
+    def bounding_box(self):
+        """
+        Calculate the smallest axis aligned box enclosing the cylinder sector,
+        spanned by its centre, the ends of its arc and the arc points lying
+        on the axes directions.
+
+        :return: minimal x, minimal y, maximal x and maximal y coordinates
+                 in metres.
+        :rtype: tuple
+        """
+        end = self.start + min(self.extent, 360)
+        angles = [self.start, end] + [90*k for k in range(floor(self.start/90) + 1, \
+                                                          ceil(end/90))]
+        xs = [self.centre_mod.x] + [self.centre_mod.x + self.radius_mod*cos(radians(a)) \
+                                    for a in angles]
+        ys = [self.centre_mod.y] + [self.centre_mod.y + self.radius_mod*sin(radians(a)) \
+                                    for a in angles]
+        return (min(xs), min(ys), max(xs), max(ys))
+
+    def contains_points(self, points):
+        """
+        Classify a batch of points as lying inside or outside the cylinder
+        sector, boundary included. The sector spans counterclockwise from the
+        start angle by the extent angle.
+
+        :param points: examined points in metres, one per row.
+        :type points: numpy.ndarray of shape (N, 2)
+
+        :return: True for the points lying inside the cylinder sector.
+        :rtype: numpy.ndarray of boolean
+        """
+        import numpy as np
+        points = np.asarray(points, dtype = float).reshape(-1, 2)
+        dx = points[:, 0] - self.centre_mod.x
+        dy = points[:, 1] - self.centre_mod.y
+        in_circle = dx*dx + dy*dy <= self.radius_mod**2
+        if(self.extent >= 360):
+            return in_circle
+        alpha = np.mod(np.degrees(np.arctan2(dy, dx)) - self.start, 360.0)
+        at_centre = (dx == 0) & (dy == 0)
+        return in_circle & ((alpha <= self.extent) | at_centre)
     
     def draw_to_image(self, image, colour):
         """
@@ -721,6 +878,7 @@ class TCylinSector(TShape):
         :param colour: shape colour.
         :type colour: tuple
         """
+        from PIL import ImageDraw
         draw = ImageDraw.Draw(image)
         centre_im_x = (self.centre_mod.x/TModel_Size.DOM_X)*image.width
         centre_im_y = (1-(self.centre_mod.y/TModel_Size.DOM_Y))*image.height
@@ -765,6 +923,7 @@ class TPolygon(TShape):
             self.unwrap_points()
             # Coordinates in model's system
             self.update_model_positions()
+        self._triangles = None
         super().__init__(colour = colour, width = width, shape_type = "Polygon", \
                          material = material)
 
@@ -809,15 +968,20 @@ class TPolygon(TShape):
         :param vertex_num: index of a vertex to be removed.
         :type vertex_num: integer
         """
+        from tkinter import messagebox
+
         if(len (self.points) <= 3):
             messagebox.showerror ("Cannot remove vertex!", "Polygon must have at least 3 vertices")
         else:
+            triangles = self.take_triangulation()
             try:
-                del(self.points[vertex_num])
+                del(self.points_mod[vertex_num])
             except Exception as message:
                 messagebox.showerror("Error while manipulating polygon!", message)
-            self.unwrap_points()
-            self.update_model_positions()
+                triangles = None
+            self.touch()
+            self.update_window_positions()
+            self.restore_triangulation(triangles, vertex_num, "remove")
     
     def _remove_duplicates(self, points_list):
         """
@@ -843,11 +1007,17 @@ class TPolygon(TShape):
         :param y: new vertex y coordinate.
         :type y: float
         """
+        from tkinter import messagebox
+
+        triangles = self.take_triangulation()
         try:
             self.points_mod[vertex_num].x = x
             self.points_mod[vertex_num].y = y
         except Exception as message:
             messagebox.showerror("Error while manipulating polygon!", message)
+            triangles = None
+        self.touch()
+        self.restore_triangulation(triangles, vertex_num, "move")
         self.update_window_positions()
         self.unwrap_points()
 
@@ -899,19 +1069,105 @@ class TPolygon(TShape):
                 """
                 return (v1.x - v2.x)**2 + (v1.y - v2.y)**2
             l2 = dist2(v1, v2)
+            if(l2 == 0):
+                return dist2(v1, v3)**(0.5)
             t = ((v3.x - v1.x) * (v2.x - v1.x) + (v3.y - v1.y) * (v2.y - v1.y)) / l2
             t = max(0, min(1, t))
             squared = dist2(v3, TPoint(v1.x + t*(v2.x - v1.x), v1.y + t*(v2.y - v1.y)))
             return squared**(0.5)
         dist = [dist_to_segment(pt1, pt2, TPoint(x, y)) for pt1, pt2 in zip(self.points, self.points[1:] + self.points[:1])]
         pos = dist.index(min(dist))
-        new_point = TPoint(x, y)
-        if (pos + 1 == len(dist)):
-            self.points.append(new_point)
+        if(x_mod is not None and y_mod is not None):
+            new_point = TPoint(x_mod, y_mod)
         else:
-            self.points.insert(pos + 1, new_point)
-        self.update_model_positions()
+            new_point = TG.window_to_model(TPoint(x, y), min_model, max_model, \
+                                           min_window, max_window, \
+                                           TModel_Size.DX, TModel_Size.DY)
+        # Other vertices keep their model positions
+        triangles = self.take_triangulation()
+        self.points_mod.insert(pos + 1, new_point)
+        self.touch()
         self.update_window_positions()
+        self.restore_triangulation(triangles, pos + 1, "insert")
+
+    def take_triangulation(self):
+        """
+        Detach the triangulation from the polygon and the cache. Has to be
+        called before the polygon vertices are modified, the triangulation
+        is then handed back with restore_triangulation().
+
+        :return: triangles as triples of indices into points_mod, None if the
+                 triangulation is not known.
+        :rtype: list of tuple
+        """
+        key = TRIANGULATION_CACHE.key(self.points_mod)
+        triangles = self._triangles
+        if(triangles is None and key in TRIANGULATION_CACHE):
+            triangles = TRIANGULATION_CACHE.get(key)
+        TRIANGULATION_CACHE.invalidate(key)
+        self._triangles = None
+        return triangles
+
+    def restore_triangulation(self, triangles, vertex_num = None, edit = None):
+        """
+        Attach the triangulation taken before the polygon vertices were
+        modified. Triangles incident to an edited vertex are triangulated
+        again; if the edit changed the polygon topology the triangulation is
+        dropped and rebuilt from scratch when next needed.
+
+        :param triangles: triangulation returned by take_triangulation().
+        :type triangles: list of tuple
+        :param vertex_num: index of the moved or inserted vertex or the index
+                           the removed vertex had, None if the polygon has
+                           been moved as a whole.
+        :type vertex_num: integer
+        :param edit: 'move', 'insert' or 'remove' (see
+                     triangulate.repair_triangulation()).
+        :type edit: string
+        """
+        if(triangles is not None and vertex_num is not None):
+            triangles = repair_triangulation(self.points_mod, triangles, vertex_num, edit, \
+                                             TParserSettings.TRIANGULATION_ENGINE, \
+                                             TParserSettings.EAR_CLIPPING_MAX_VERTICES)
+        self._triangles = triangles
+        if(triangles is not None):
+            TRIANGULATION_CACHE.put(TRIANGULATION_CACHE.key(self.points_mod), triangles)
+
+    def preview_triangle_count(self, vertex_num, x, y):
+        """
+        Count triangles the polygon would be divided into after moving
+        a vertex, repairing a copy of its triangulation. Called on every
+        mouse motion, so a triangulation which is not known yet is not
+        built.
+
+        :param vertex_num: index of the moved vertex.
+        :type vertex_num: integer
+        :param x: new vertex x coordinate in metres.
+        :type x: float
+        :param y: new vertex y coordinate in metres.
+        :type y: float
+
+        :return: number of triangles, None if the triangulation is not known
+                 or the moved vertex changes the polygon topology.
+        :rtype: integer
+        """
+        triangles = self._triangles
+        if(triangles is None):
+            key = TRIANGULATION_CACHE.key(self.points_mod)
+            if(key not in TRIANGULATION_CACHE):
+                return None
+            triangles = TRIANGULATION_CACHE.get(key)
+        points = list(self.points_mod)
+        points[vertex_num] = TPoint(x, y)
+        try:
+            triangles = repair_triangulation(points, triangles, vertex_num, \
+                                             "move", TParserSettings.TRIANGULATION_ENGINE, \
+                                             TParserSettings.EAR_CLIPPING_MAX_VERTICES)
+        except Exception:
+            return None
+        if(triangles is None):
+            return None
+        return len(triangles)
 
     def unwrap_points(self):
         """
@@ -937,6 +1193,7 @@ class TPolygon(TShape):
             self.points_mod.append(TG.window_to_model(pt, min_model, max_model, \
                                                       min_window, max_window, \
                                                       dx, dy))
+        self.touch()
     
     def visible(self, min_model, max_model):
         """
@@ -977,6 +1234,32 @@ class TPolygon(TShape):
                           self.points_mod[:1]):
                 darea += (v2.x - v1.x)*(v2.y + v1.y)
         return darea/2.0
+
+    def bounding_box(self):
+        """
+        Calculate the smallest axis aligned box enclosing the polygon.
+
+        :return: minimal x, minimal y, maximal x and maximal y coordinates
+                 in metres.
+        :rtype: tuple
+        """
+        xs = [pt.x for pt in self.points_mod]
+        ys = [pt.y for pt in self.points_mod]
+        return (min(xs), min(ys), max(xs), max(ys))
+
+    def contains_points(self, points):
+        """
+        Classify a batch of points as lying inside or outside the polygon
+        (see triangulate.points_in_polygon()).
+
+        :param points: examined points in metres, one per row.
+        :type points: numpy.ndarray of shape (N, 2)
+
+        :return: True for the points lying inside the polygon.
+        :rtype: numpy.ndarray of boolean
+        """
+        return points_in_polygon([pt.x for pt in self.points_mod], \
+                                 [pt.y for pt in self.points_mod], points)
     
     def draw_to_image(self, image, colour):
         """
@@ -987,6 +1270,7 @@ class TPolygon(TShape):
         :param colour: shape colour.
         :type colour: tuple
         """
+        from PIL import ImageDraw
         draw = ImageDraw.Draw(image)
         coords = []
         for pt_mod in self.points_mod:
@@ -1092,6 +1376,8 @@ class TCoordSys(TRect):
         :param grid: grid diplay toggle.
         :type grid: boolean
         """
+        from tkinter import S, W
+
         fsize = 7
         fname = "Arial"
         text_offset = 20
@@ -1204,6 +1490,8 @@ class TCoordSys(TRect):
         :param canvas: canvas on which to draw the grid.
         :type canvas: tkinter.Canvas
         """
+        from tkinter import messagebox
+
         debug = True
         if(debug):
             marg = 5
@@ -1273,6 +1561,8 @@ class TCoordSys(TRect):
         """
         Update window size.
         """
+        from tkinter import messagebox
+
         self.minx = TWindow_Size.MIN_X
         self.miny = TWindow_Size.MIN_Y
         self.maxx = TWindow_Size.MAX_X
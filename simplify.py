@@ -0,0 +1,195 @@
+"""
+.. module:: simplify module.
+:synopsis: Module contains functions used to simplify polygon outlines which
+           carry more vertices than the model grid can resolve.
+
+.. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
+"""
+
+from array import array
+import heapq
+from math import ceil, floor, hypot, sqrt
+
+
+def simplify_polygon(points, dx, dy, tolerance):
+    """
+    Remove polygon vertices lying closer than a tolerance to the segment
+    joining their neighbours, least significant ones first (Visvalingam's
+    scheme with the Douglas-Peucker distance measure).
+    A vertex is removed only if the triangle it forms with its neighbours
+    contains no other vertex, so the outline stays simple, and no grid node
+    (multiple of dx and dy) other than the neighbours lies in the closed
+    triangle, so no grid node moves between the inside, the boundary and the
+    outside of the polygon. A vertex lying on a grid node is therefore kept
+    unless it is collinear with its neighbours.
+    Collinear vertices are always removed.
+
+    :param points: polygon vertices.
+    :type points: list of TPoint
+    :param dx: grid step in the x direction.
+    :type dx: float
+    :param dy: grid step in the y direction.
+    :type dy: float
+    :param tolerance: maximal distance from a removed vertex to the new edge.
+    :type tolerance: float
+
+    :return: indices of the vertices kept, in ascending order.
+    :rtype: list of integer
+    """
+    n = len(points)
+    if(n <= 3):
+        return list(range(n))
+    xs = array("d", [pt.x for pt in points])
+    ys = array("d", [pt.y for pt in points])
+    prev = array("l", range(-1, n - 1))
+    prev[0] = n - 1
+    nxt = array("l", range(1, n + 1))
+    nxt[n - 1] = 0
+    alive = bytearray(b"\x01")*n
+    version = array("l", [0])*n
+    eps = 1e-9*dx*dy
+    # Spatial hash of the vertices used to find the ones inside a triangle
+    x_min, x_max = min(xs), max(xs)
+    y_min, y_max = min(ys), max(ys)
+    bucket = max(sqrt((x_max - x_min)*(y_max - y_min)/n), dx, dy)
+    buckets = {}
+    for i in range(n):
+        key = (int((xs[i] - x_min)//bucket), int((ys[i] - y_min)//bucket))
+        buckets.setdefault(key, []).append(i)
+
+    def orient(ax, ay, bx, by, cx, cy):
+        """
+        Calculate the orientation of an ordered triple of points.
+
+        :rtype: float
+        """
+        return (bx - ax)*(cy - ay) - (by - ay)*(cx - ax)
+
+    def vertex_inside(p, v, q, sign):
+        """
+        Check whether any other vertex lies within the closed triangle p, v, q.
+
+        :param p: previous vertex index.
+        :type p: integer
+        :param v: examined vertex index.
+        :type v: integer
+        :param q: next vertex index.
+        :type q: integer
+        :param sign: orientation of the triangle, 1 or -1.
+        :type sign: integer
+
+        :rtype: boolean
+        """
+        i_min = int((min(xs[p], xs[v], xs[q]) - x_min)//bucket)
+        i_max = int((max(xs[p], xs[v], xs[q]) - x_min)//bucket)
+        j_min = int((min(ys[p], ys[v], ys[q]) - y_min)//bucket)
+        j_max = int((max(ys[p], ys[v], ys[q]) - y_min)//bucket)
+        for i in range(i_min, i_max + 1):
+            for j in range(j_min, j_max + 1):
+                for k in buckets.get((i, j), ()):
+                    if(not alive[k] or k == p or k == v or k == q):
+                        continue
+                    x, y = xs[k], ys[k]
+                    if(sign*orient(xs[p], ys[p], xs[v], ys[v], x, y) >= -eps and \
+                       sign*orient(xs[v], ys[v], xs[q], ys[q], x, y) >= -eps and \
+                       sign*orient(xs[q], ys[q], xs[p], ys[p], x, y) >= -eps):
+                        return True
+        return False
+
+    def node_affected(p, v, q, sign):
+        """
+        Check whether any grid node other than p and q lies in the closed
+        triangle p, v, q. The triangle is scanned column by column.
+
+        :param p: previous vertex index.
+        :type p: integer
+        :param v: examined vertex index.
+        :type v: integer
+        :param q: next vertex index.
+        :type q: integer
+        :param sign: orientation of the triangle, 1 or -1.
+        :type sign: integer
+
+        :rtype: boolean
+        """
+        corners = ((xs[p], ys[p]), (xs[v], ys[v]), (xs[q], ys[q]))
+        for i in range(ceil(min(c[0] for c in corners)/dx - 1e-9), \
+                       floor(max(c[0] for c in corners)/dx + 1e-9) + 1):
+            x = i*dx
+            crossings = []
+            for (x1, y1), (x2, y2) in zip(corners, corners[1:] + corners[:1]):
+                if(min(x1, x2) - eps <= x <= max(x1, x2) + eps):
+                    if(x1 == x2):
+                        crossings.extend((y1, y2))
+                    else:
+                        crossings.append(y1 + (x - x1)*(y2 - y1)/(x2 - x1))
+            if(not crossings):
+                continue
+            for j in range(ceil(min(crossings)/dy - 1e-9), \
+                           floor(max(crossings)/dy + 1e-9) + 1):
+                y = j*dy
+                o1 = sign*orient(xs[p], ys[p], xs[v], ys[v], x, y)
+                o2 = sign*orient(xs[v], ys[v], xs[q], ys[q], x, y)
+                o3 = sign*orient(xs[q], ys[q], xs[p], ys[p], x, y)
+                if(o1 < -eps or o2 < -eps or o3 < -eps):
+                    continue
+                if(o3 > eps or (o1 > eps and o2 > eps)):
+                    # Node inside, on the removed edges or on the new edge
+                    # away from its end points p and q
+                    return True
+        return False
+
+    def deviation(v):
+        """
+        Calculate the distance from a vertex to the segment joining its
+        neighbours.
+
+        :param v: examined vertex index.
+        :type v: integer
+
+        :rtype: float
+        """
+        p, q = prev[v], nxt[v]
+        length = hypot(xs[q] - xs[p], ys[q] - ys[p])
+        if(length == 0.0):
+            return hypot(xs[v] - xs[p], ys[v] - ys[p])
+        return abs(orient(xs[p], ys[p], xs[q], ys[q], xs[v], ys[v]))/length
+
+    def removable(v):
+        """
+        Check whether a vertex can be removed.
+
+        :param v: examined vertex index.
+        :type v: integer
+
+        :rtype: boolean
+        """
+        p, q = prev[v], nxt[v]
+        turn = orient(xs[p], ys[p], xs[v], ys[v], xs[q], ys[q])
+        if(abs(turn) <= eps):
+            # Collinear vertex between its neighbours leaves the outline intact
+            return (xs[v] - xs[p])*(xs[q] - xs[v]) + \
+                   (ys[v] - ys[p])*(ys[q] - ys[v]) > 0
+        sign = 1 if turn > 0 else -1
+        return not vertex_inside(p, v, q, sign) and not node_affected(p, v, q, sign)
+
+    heap = [(deviation(v), 0, v) for v in range(n)]
+    heapq.heapify(heap)
+    remaining = n
+    while(heap and remaining > 3):
+        dist, ver, v = heapq.heappop(heap)
+        if(not alive[v] or ver != version[v]):
+            continue
+        if(dist > tolerance):
+            break
+        if(not removable(v)):
+            continue
+        alive[v] = 0
+        remaining -= 1
+        p, q = prev[v], nxt[v]
+        nxt[p] = q
+        prev[q] = p
+        for u in (p, q):
+            version[u] += 1
+            heapq.heappush(heap, (deviation(u), version[u], u))
+    return [v for v in range(n) if alive[v]]
@@ -0,0 +1,52 @@
+"""
+.. module:: test helpers.
+:synopsis: Module contains fixtures shared by the tests. Importing it puts
+           the repository root on the module search path, so it has to be
+           imported before the tested modules.
+
+.. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))     #: repository root.
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")                      #: directory of fixture files.
+
+if(ROOT not in sys.path):
+    sys.path.insert(0, ROOT)
+
+from materials import TMaterial
+from point import TPoint
+from settings import TModel_Size, TSurveySettings
+from shapes import TRect
+
+
+def rectangle(x1, y1, x2, y2, material = "sand"):
+    """
+    Create a rectangle of given corners in metres.
+
+    :rtype: TRect
+    """
+    return TRect(point1_mod = TPoint(x1, y1), point2_mod = TPoint(x2, y2), \
+                 material = material)
+
+
+class TParserTestCase(unittest.TestCase):
+    """
+    Class sets up a 1 m by 0.5 m model with 0.01 m cells, restoring the model
+    and survey settings afterwards.
+    """
+
+    def setUp(self):
+        for settings in (TModel_Size, TSurveySettings):
+            saved = {name: value for name, value in vars(settings).items() \
+                     if not name.startswith("__")}
+            self.addCleanup(lambda settings = settings, saved = saved: \
+                            [setattr(settings, name, value) for name, value in saved.items()])
+        TModel_Size.DOM_X, TModel_Size.DOM_Y = 1.0, 0.5
+        TModel_Size.MAX_X, TModel_Size.MAX_Y = 1.0, 0.5
+        TModel_Size.DX, TModel_Size.DY = 0.01, 0.01
+        self.materials = [TMaterial(6.0, 0.001, 1.0, 0.0, "sand"), \
+                          TMaterial(81.0, 0.05, 1.0, 0.0, "water")]
@@ -0,0 +1,46 @@
+"""
+.. module:: coalesce tests.
+:synopsis: Tests of the coalesce module, run with
+           'python -m unittest discover tests' from the repository root.
+
+.. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
+"""
+
+import unittest
+
+from helpers import rectangle, TParserTestCase
+
+from coalesce import coalesce_rectangles
+from point import TPoint
+from shapes import TCylin
+
+
+class TCoalesceRectanglesTest(TParserTestCase):
+    """
+    Class checks merging rectangles of the same material into boxes.
+    """
+
+    def test_brick_wall(self):
+        shapes = [rectangle(0.05*column, 0.02*row, 0.05*(column + 1), 0.02*(row + 1)) \
+                  for row in range(10) for column in range(20)]
+        merged, absorbed = coalesce_rectangles(shapes)
+        self.assertEqual(len(absorbed), 199)
+        self.assertEqual(list(merged), [199])
+        self.assertEqual(merged[199][:4], (0.0, 0.0, 1.0, 0.2))
+        self.assertEqual(merged[199][4], "sand")
+
+    def test_intervening_shapes(self):
+        shapes = [rectangle(0.0, 0.0, 0.5, 0.1), \
+                  rectangle(0.4, 0.0, 0.6, 0.1, "water"), \
+                  rectangle(0.5, 0.0, 1.0, 0.1)]
+        self.assertEqual(len(coalesce_rectangles(shapes)[1]), 0)
+        # A rectangle only touching the first one doesn't block the merge
+        shapes[1] = rectangle(0.5, 0.0, 0.6, 0.1, "water")
+        self.assertEqual(len(coalesce_rectangles(shapes)[1]), 1)
+        shapes[1] = TCylin(centre_mod = TPoint(0.45, 0.05), radius_mod = 0.01, \
+                           material = "water")
+        self.assertEqual(len(coalesce_rectangles(shapes)[1]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+.. module:: compilemodel tests.
+:synopsis: Tests of the command line compiler of models, run with
+           'python -m unittest discover tests' from the repository root.
+
+.. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
+"""
+
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from helpers import ROOT
+
+from compilemodel import main
+
+
+MODEL = """#title: compiler test
+#domain: 2.0 1.0 0.01
+#dx_dy_dz: 0.01 0.01 0.01
+#time_window: 3e-08
+#waveform: ricker 1.0 900000000.0 mysource
+#hertzian_dipole: z 0.5 0.9 0.0 mysource
+#rx: 0.6 0.9 0.0
+#material: 6.0 0.001 1.0 0.0 sand
+#box: 0.0 0.0 0.0 2.0 0.5 0.01 sand
+#cylinder: 1.0 0.3 0.0 1.0 0.3 0.01 0.1 pec
+#triangle: 0.1 0.6 0.0 0.5 0.6 0.0 0.3 0.8 0.0 0.01 sand
+"""
+
+
+class TModelCompilerTest(unittest.TestCase):
+    """
+    Class checks that models are compiled without a display and that
+    invalid inputs make the compiler exit with a non-zero status.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name, text = None):
+        """
+        Return a path in the temporary directory, creating the file if its
+        text is given.
+
+        :param name: file name.
+        :type name: string
+        :param text: file contents.
+        :type text: string
+
+        :rtype: string
+        """
+        path = os.path.join(self.directory.name, name)
+        if(text is not None):
+            with open(path, "w") as outfile:
+                outfile.write(text)
+        return path
+
+    def test_round_trip(self):
+        model = self.path("model.in", MODEL)
+        first = self.path("first.in")
+        second = self.path("second.in")
+        self.assertEqual(main([model, "-o", first]), 0)
+        self.assertEqual(main([first, "-o", second]), 0)
+        with open(first) as infile:
+            compiled = infile.read()
+        with open(second) as infile:
+            self.assertEqual(infile.read(), compiled)
+        self.assertIn("#hertzian_dipole: z 0.5 0.9 0.0 mysource", compiled)
+        self.assertIn("#triangle: 0.1 0.6 0.0 0.5 0.6 0.0 0.3 0.8 0.0 0.01 sand", \
+                      compiled)
+
+    def test_invalid_input(self):
+        model = self.path("model.in", MODEL + "#unknown_command: 1\n")
+        output = self.path("output.in")
+        errors = io.StringIO()
+        with contextlib.redirect_stderr(errors):
+            self.assertEqual(main([model, "-o", output]), 1)
+        self.assertIn("line 12", errors.getvalue())
+        self.assertFalse(os.path.exists(output))
+
+    def test_python_blocks(self):
+        model = self.path("model.in", MODEL + "#python:\n" \
+                          "for i in range(3):\n" \
+                          "    print('#cylinder:', 0.2 + 0.1*i, 0.7, 0.0, 0.2 + 0.1*i, 0.7, " \
+                          "0.01, 0.02, 'pec')\n" \
+                          "#end_python:\n")
+        output = self.path("output.in")
+        errors = io.StringIO()
+        with contextlib.redirect_stderr(errors):
+            self.assertEqual(main([model, "-o", output]), 1)
+        self.assertIn("not run", errors.getvalue())
+        self.assertEqual(main([model, "-o", output, "--allow-python"]), 0)
+        with open(output) as infile:
+            self.assertEqual(infile.read().count("#cylinder:"), 4)
+
+    def test_without_tkinter(self):
+        model = self.path("model.in", MODEL)
+        output = self.path("output.in")
+        script = "import sys; sys.modules['tkinter'] = None; " \
+                 "from compilemodel import main; sys.exit(main(sys.argv[1:]))"
+        result = subprocess.run([sys.executable, "-c", script, model, "-o", output], \
+                                cwd = ROOT, \
+                                stderr = subprocess.PIPE, universal_newlines = True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertTrue(os.path.exists(output))
+
+
+if __name__ == "__main__":
+    unittest.main()
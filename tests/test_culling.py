@@ -0,0 +1,49 @@
+"""
+.. module:: culling tests.
+:synopsis: Tests of the culling module, run with
+           'python -m unittest discover tests' from the repository root.
+
+.. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
+"""
+
+import unittest
+
+from helpers import rectangle, TParserTestCase
+
+from culling import hidden_shapes
+from point import TPoint
+from shapes import TCylin, TPolygon
+
+
+class THiddenShapesTest(TParserTestCase):
+    """
+    Class checks which shapes are found to be covered by later ones.
+    """
+
+    def test_single_cover(self):
+        shapes = [TCylin(centre_mod = TPoint(0.3, 0.2), radius_mod = 0.05), \
+                  rectangle(0.2, 0.1, 0.4, 0.3), \
+                  rectangle(0.25, 0.15, 0.35, 0.25), \
+                  TCylin(centre_mod = TPoint(0.3, 0.2), radius_mod = 0.1)]
+        self.assertEqual(hidden_shapes(shapes), [0, 2])
+
+    def test_union_of_rectangles(self):
+        shapes = [rectangle(0.0, 0.0, 1.0, 0.2, "water"), \
+                  rectangle(0.0, 0.0, 0.5, 0.2), \
+                  rectangle(0.5, 0.0, 1.0, 0.1), \
+                  rectangle(0.4, 0.1, 1.0, 0.2)]
+        self.assertEqual(hidden_shapes(shapes), [0])
+        # A gap between the rectangles keeps the first one
+        shapes[2] = rectangle(0.51, 0.0, 1.0, 0.1)
+        self.assertEqual(hidden_shapes(shapes), [])
+
+    def test_nonconvex_polygon(self):
+        notch = TPolygon(points_mod = [TPoint(0.0, 0.0), TPoint(0.4, 0.0), \
+                                       TPoint(0.2, 0.1), TPoint(0.4, 0.2), \
+                                       TPoint(0.0, 0.2)])
+        shapes = [rectangle(0.25, 0.05, 0.35, 0.15), notch]
+        self.assertEqual(hidden_shapes(shapes), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
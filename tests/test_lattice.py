@@ -0,0 +1,153 @@
+"""
+.. module:: lattice tests.
+:synopsis: Tests of the lattice module, run with
+           'python -m unittest discover tests' from the repository root.
+
+.. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
+"""
+
+import io
+import random
+import unittest
+
+from helpers import rectangle, TParserTestCase
+
+from inputreader import TInputReader
+from lattice import chains, find_lattice, find_sub_lattices, lattice_runs
+from parsetofile import TParser
+from point import TPoint
+from shapes import TCylin
+
+
+class TFindLatticeTest(unittest.TestCase):
+    """
+    Class checks recognising lattices of points.
+    """
+
+    def test_lattices(self):
+        points = [(0.1 + 0.3*i + 0.1*j, 0.2 + 0.05*j) for i in range(7) for j in range(3)]
+        random.Random(1).shuffle(points)
+        origin, a, n, b, m = find_lattice(points)
+        self.assertEqual(n*m, 21)
+        self.assertEqual(origin, (0.1, 0.2))
+        self.assertEqual(find_lattice([(0.0, 0.0), (0.5, 0.5), (1.0, 1.0)])[2], 3)
+
+    def test_not_lattices(self):
+        self.assertIsNone(find_lattice([(0.0, 0.0), (1.0, 0.0), (3.0, 0.0)]))
+        self.assertIsNone(find_lattice([(0.0, 0.0), (1.0, 0.0), (0.0, 1.0)]))
+        self.assertIsNone(find_lattice([(0.0, 0.0), (1.0, 0.0), (1.0, 0.0)]))
+
+    def test_chains(self):
+        self.assertEqual(chains([0.3, 0.0, 0.1, 0.2, 0.25, 0.5, 0.6]), \
+                         [(0.0, 0.1, [0.0, 0.1, 0.2, 0.3]), (0.25, 0.0, [0.25]), \
+                          (0.5, 0.1, [0.5, 0.6])])
+
+
+class TFindSubLatticesTest(unittest.TestCase):
+    """
+    Class checks recognising lattices in arrays of points with some points
+    removed or added.
+    """
+
+    def setUp(self):
+        self.points = [(0.05 + 0.1*i, 0.05 + 0.1*j) for i in range(100) for j in range(100)]
+
+    def covered(self, lattices):
+        """
+        Count the points belonging to the found lattices.
+
+        :rtype: integer
+        """
+        return sum(len(indices) for indices, lattice in lattices)
+
+    def test_hole(self):
+        del self.points[5050]
+        self.assertIsNone(find_lattice(self.points))
+        lattices = find_sub_lattices(self.points, 8)
+        self.assertLessEqual(len(lattices), 4)
+        self.assertEqual(self.covered(lattices), 9999)
+        indices = [num for found, lattice in lattices for num in found]
+        self.assertEqual(sorted(indices), list(range(9999)))
+        for found, (origin, a, n, b, m) in lattices:
+            self.assertEqual(len(found), n*m)
+
+    def test_extra_point(self):
+        self.points.insert(300, (0.333, 0.05))
+        self.points.insert(700, self.points[0])
+        self.assertIsNone(find_lattice(self.points))
+        lattices = find_sub_lattices(self.points, 8)
+        self.assertEqual(len(lattices), 1)
+        found, (origin, a, n, b, m) = lattices[0]
+        self.assertEqual((n, m), (100, 100))
+        self.assertEqual(origin, (0.05, 0.05))
+        self.assertNotIn(300, found)
+        self.assertEqual(len(found), 10000)
+
+    def test_small_remainders(self):
+        points = self.points[:20] + [(5.0, 5.0), (5.0, 7.0)]
+        lattices = find_sub_lattices(points, 8)
+        self.assertEqual([len(found) for found, lattice in lattices], [20])
+
+
+class TPythonBlockTest(TParserTestCase):
+    """
+    Class checks writing lattices of shapes as Python blocks.
+    """
+
+    def test_read_back(self):
+        shapes = [rectangle(0.0, 0.0, 1.0, 0.2)]
+        shapes += [TCylin(centre_mod = TPoint(0.05 + 0.1*i, 0.05 + 0.05*j), \
+                          radius_mod = 0.01, material = "pec") \
+                   for j in range(3) for i in range(10)]
+        shapes += [rectangle(0.1*i, 0.3, 0.1*i + 0.05, 0.35, "water") for i in range(10)]
+        self.assertEqual([(run[0][0], run[0][-1]) for run in lattice_runs(shapes, 8)], \
+                         [(1, 30), (31, 40)])
+        buffer = io.StringIO()
+        writer = TParser.write_shapes(buffer, self.materials, shapes, "lattice")
+        self.assertEqual(writer.lattice_shapes, 40)
+        self.assertEqual(buffer.getvalue().count("#python:"), 2)
+        reader = TInputReader(allow_python = True)
+        reader.read(buffer.getvalue().splitlines())
+        self.assertEqual(len(reader.shapes), len(shapes))
+        grid, _ = TParser.material_grid(self.materials, shapes)
+        read_grid, _ = TParser.material_grid(reader.materials, reader.shapes)
+        self.assertTrue((grid == read_grid).all())
+
+    def test_partial_lattices(self):
+        shapes = [TCylin(centre_mod = TPoint(0.05 + 0.1*i, 0.05 + 0.05*j), \
+                         radius_mod = 0.01, material = "pec") \
+                  for j in range(8) for i in range(10)]
+        del shapes[33]
+        shapes.insert(50, TCylin(centre_mod = TPoint(0.52, 0.13), radius_mod = 0.01, \
+                                 material = "pec"))
+        buffer = io.StringIO()
+        writer = TParser.write_shapes(buffer, self.materials, shapes, "lattice")
+        # The row with the hole is split into chains shorter than a lattice
+        self.assertEqual(writer.lattice_shapes, 70)
+        self.assertEqual(buffer.getvalue().count("\n#cylinder:"), 10)
+        reader = TInputReader(allow_python = True)
+        reader.read(buffer.getvalue().splitlines())
+        self.assertEqual(len(reader.shapes), len(shapes))
+        grid, _ = TParser.material_grid(self.materials, shapes)
+        read_grid, _ = TParser.material_grid(reader.materials, reader.shapes)
+        self.assertTrue((grid == read_grid).all())
+
+
+    def test_python_not_allowed(self):
+        lines = ["#python:", "print('#box: 0 0 0 1 1 1 sand')", "#end_python:"]
+        reader = TInputReader()
+        with self.assertRaisesRegex(Exception, "line 3 not run"):
+            reader.read(lines)
+        self.assertEqual(reader.shapes, [])
+        # Lines following the block are read
+        reader.read_line("#box: 0 0 0 1 1 1 sand", 4)
+        self.assertEqual(len(reader.shapes), 1)
+
+    def test_exit_in_block(self):
+        reader = TInputReader(allow_python = True)
+        with self.assertRaisesRegex(Exception, "line 3"):
+            reader.read(["#python:", "exit()", "#end_python:"])
+
+
+if __name__ == "__main__":
+    unittest.main()
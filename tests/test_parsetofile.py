@@ -0,0 +1,323 @@
+"""
+.. module:: parsetofile tests.
+:synopsis: Tests of the parsetofile module, run with
+           'python -m unittest discover tests' from the repository root.
+
+.. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
+"""
+
+import io
+import random
+import subprocess
+import sys
+import unittest
+
+from helpers import rectangle, ROOT, TParserTestCase
+
+from coalesce import coalesce_rectangles
+from culling import hidden_shapes
+from inputreader import TInputReader
+from parsetofile import TInputWriter, TParser
+from point import TPoint
+from settings import TModel_Size, TParserSettings
+from shapes import TRect, TCylin, TCylinSector, TPolygon
+
+
+class TInputWriterTest(unittest.TestCase):
+    """
+    Class checks the formatting of command arguments.
+    """
+
+    NUMBERS = [(12, 0.1 + 0.2, "0.3"),
+               (12, 1.0, "1.0"),
+               (12, -3.0, "-3.0"),
+               (12, -0.0, "-0.0"),
+               (12, 0.01, "0.01"),
+               (12, 1e-12, "1e-12"),
+               (12, 1.5e20, "1.5e+20"),
+               (12, 123456789012345.0, "1.23456789012e+14"),
+               (12, 2.0/3.0, "0.666666666667"),
+               (12, float("inf"), "inf"),
+               (3, 3.14159, "3.14"),
+               (3, 1234.0, "1.23e+03"),
+               (3, 100.0, "100.0"),
+               (0, 0.1 + 0.2, "0.30000000000000004"),
+               (0, 1.0, "1.0"),
+               (12, 5, "5"),
+               (12, "sand", "sand")]    #: significant digits, value and its expected text.
+
+    def test_number(self):
+        for digits, value, text in self.NUMBERS:
+            with self.subTest(digits = digits, value = value):
+                self.assertEqual(TInputWriter([].append, digits).number(value), text)
+
+    def test_default_digits(self):
+        self.assertEqual(TInputWriter([].append).number(1/3), "0.333333333333")
+
+    def test_command(self):
+        lines = []
+        TInputWriter(lines.append).command("box", 0.1 + 0.2, 0, 1.0, "sand")
+        self.assertEqual(lines, ["#box: 0.3 0 1.0 sand\n"])
+
+
+class TCommandMemoTest(TParserTestCase):
+    """
+    Class checks reusing the commands of shapes unchanged since the previous
+    parse.
+    """
+
+    def setUp(self):
+        super().setUp()
+        TParser.COMMAND_MEMO.clear()
+        self.addCleanup(TParser.COMMAND_MEMO.clear)
+        self.shapes = [TRect(point1_mod = TPoint(0.0, 0.0), point2_mod = TPoint(1.0, 0.2), \
+                             material = "sand"), \
+                       TPolygon(points_mod = [TPoint(0.1, 0.3), TPoint(0.5, 0.45), \
+                                              TPoint(0.2, 0.48), TPoint(0.15, 0.4)], \
+                                material = "water")]
+
+    def parse(self):
+        """
+        Parse the shapes.
+
+        :return: writer and the written text.
+        :rtype: tuple
+        """
+        buffer = io.StringIO()
+        writer = TParser.write_shapes(buffer, self.materials, self.shapes, "memo")
+        return writer, buffer.getvalue()
+
+    def test_reused(self):
+        writer, text = self.parse()
+        self.assertEqual(writer.memo_hits, 0)
+        writer, reused = self.parse()
+        self.assertEqual(writer.memo_hits, 2)
+        self.assertEqual(reused, text)
+
+    def test_touch(self):
+        self.parse()
+        self.shapes[1].points_mod[2].y = 0.49
+        writer, text = self.parse()
+        # Modifying coordinates without touching the shape reuses stale commands
+        self.assertEqual(writer.memo_hits, 2)
+        self.assertNotIn("0.49", text)
+        self.shapes[1].touch()
+        writer, text = self.parse()
+        self.assertEqual(writer.memo_hits, 1)
+        self.assertIn("0.49", text)
+
+    def test_material(self):
+        self.parse()
+        self.shapes[0].material = "water"
+        writer, text = self.parse()
+        self.assertEqual(writer.memo_hits, 1)
+        self.assertIn("#box: 0.0 0.0 0.0 1.0 0.2 0.01 water", text)
+
+    def test_context(self):
+        changes = [(TModel_Size, "DX", 0.005), (TModel_Size, "DY", 0.005), \
+                   (TParserSettings, "SIMPLIFY", not TParserSettings.SIMPLIFY), \
+                   (TParserSettings, "SIMPLIFY_TOLERANCE", \
+                    2*TParserSettings.SIMPLIFY_TOLERANCE + 0.1), \
+                   (TParserSettings, "RECTILINEAR_BOXES", not TParserSettings.RECTILINEAR_BOXES), \
+                   (TParserSettings, "RECTILINEAR_MAX_CELLS", \
+                    TParserSettings.RECTILINEAR_MAX_CELLS + 1), \
+                   (TParserSettings, "TRIANGULATION_ENGINE", "monotone"), \
+                   (TParserSettings, "EAR_CLIPPING_MAX_VERTICES", \
+                    TParserSettings.EAR_CLIPPING_MAX_VERTICES + 1)]
+        for settings, name, value in changes:
+            with self.subTest(setting = name):
+                saved = getattr(settings, name)
+                self.addCleanup(setattr, settings, name, saved)
+                self.parse()
+                setattr(settings, name, value)
+                self.assertEqual(self.parse()[0].memo_hits, 0)
+                setattr(settings, name, saved)
+        # Number of significant digits
+        self.parse()
+        buffer = io.StringIO()
+        writer = TParser.write_shapes(buffer, self.materials, self.shapes, "memo", 5)
+        self.assertEqual(writer.memo_hits, 0)
+
+
+class TMaterialGridTest(TParserTestCase):
+    """
+    Class checks the rasterisation of models to material indices.
+    """
+
+    def test_later_shapes_overwrite(self):
+        shapes = [TRect(point1_mod = TPoint(0.0, 0.0), point2_mod = TPoint(1.0, 0.2), \
+                        material = "sand"), \
+                  TRect(point1_mod = TPoint(0.5, 0.1), point2_mod = TPoint(0.7, 0.3), \
+                        material = "water"), \
+                  TCylin(centre_mod = TPoint(0.2, 0.1), radius_mod = 0.05, \
+                         material = "pec"), \
+                  TRect(point1_mod = TPoint(0.0, 0.0), point2_mod = TPoint(0.1, 0.1), \
+                        material = "free_space")]
+        grid, names = TParser.material_grid(self.materials, shapes)
+        self.assertEqual(grid.shape, (100, 50))
+        self.assertEqual(names, ["sand", "water", "pec"])
+        self.assertEqual(grid[95, 5], 0)
+        self.assertEqual(grid[60, 15], 1)
+        self.assertEqual(grid[60, 25], 1)
+        self.assertEqual(grid[20, 10], 2)
+        self.assertEqual(grid[5, 5], -1)
+        self.assertEqual(grid[50, 40], -1)
+        # Cells whose centres lie in the rectangles
+        self.assertEqual((grid == 1).sum(), 20*20)
+
+    def test_polygon(self):
+        triangle = TPolygon(points_mod = [TPoint(0.0, 0.0), TPoint(1.0, 0.0), \
+                                          TPoint(0.0, 0.5)], material = "water")
+        grid, _ = TParser.material_grid(self.materials, [triangle])
+        self.assertEqual(grid[0, 0], 1)
+        self.assertEqual(grid[99, 49], -1)
+        self.assertAlmostEqual((grid == 1).sum(), 100*50/2, delta = 50)
+
+    def test_unknown_material(self):
+        shapes = [TRect(point1_mod = TPoint(0.0, 0.0), point2_mod = TPoint(1.0, 0.2), \
+                        material = "clay")]
+        with self.assertRaises(Exception):
+            TParser.material_grid(self.materials, shapes)
+
+
+class TRasterBoxesTest(TParserTestCase):
+    """
+    Class checks the output of the rasterised model as boxes.
+    """
+
+    def test_lossless(self):
+        shapes = [TRect(point1_mod = TPoint(0.0, 0.0), point2_mod = TPoint(1.0, 0.2), \
+                        material = "sand"), \
+                  TCylin(centre_mod = TPoint(0.3, 0.2), radius_mod = 0.12, \
+                         material = "water"), \
+                  TCylinSector(centre_mod = TPoint(0.7, 0.3), radius_mod = 0.15, \
+                               start = 30, extent = 200, material = "pec"), \
+                  TPolygon(points_mod = [TPoint(0.1, 0.3), TPoint(0.5, 0.45), \
+                                         TPoint(0.2, 0.48)], material = "sand")]
+        buffer = io.StringIO()
+        TParser.write_raster_boxes(buffer, self.materials, shapes, "boxes")
+        lines = buffer.getvalue().splitlines()
+        reader = TInputReader()
+        reader.read(lines)
+        self.assertTrue(all(s.type == "Rectangle" for s in reader.shapes))
+        grid, names = TParser.material_grid(self.materials, shapes)
+        read_grid, read_names = TParser.material_grid(reader.materials, reader.shapes)
+        self.assertEqual(names, read_names)
+        self.assertTrue((grid == read_grid).all())
+        self.assertLess(len(reader.shapes), 150)
+
+
+class TReductionInvarianceTest(TParserTestCase):
+    """
+    Class checks that dropping hidden shapes and merging rectangles, alone
+    and one after the other as TParser.write_shapes() does, don't change
+    the model rasterised to its cells.
+    """
+
+    @staticmethod
+    def random_model(rnd):
+        """
+        Create a random model snapped to the grid, made of rectangles of
+        a coarser grid, which often can be merged, and shapes of all types.
+
+        :rtype: list of TShape
+        """
+        shapes = []
+        for _ in range(rnd.randrange(5, 60)):
+            x = round(rnd.uniform(0.0, 1.0), 2)
+            y = round(rnd.uniform(0.0, 0.5), 2)
+            size = round(rnd.uniform(0.02, 0.3), 2)
+            material = rnd.choice(["sand", "water", "pec"])
+            kind = rnd.randrange(6)
+            if(kind < 2):
+                x = round(rnd.randrange(9)*0.1, 1)
+                y = round(rnd.randrange(4)*0.1, 1)
+                shapes.append(rectangle(x, y, round(x + rnd.choice([0.1, 0.2]), 1), \
+                                        round(y + 0.1, 1), material))
+            elif(kind == 2):
+                shapes.append(rectangle(x, y, x + size, \
+                                        y + round(rnd.uniform(0.02, 0.3), 2), material))
+            elif(kind == 3):
+                shapes.append(TCylin(centre_mod = TPoint(x, y), radius_mod = size, \
+                                     material = material))
+            elif(kind == 4):
+                shapes.append(TCylinSector(centre_mod = TPoint(x, y), radius_mod = size, \
+                                           start = rnd.choice([0, 45, 200]), \
+                                           extent = rnd.choice([90, 180, 270]), \
+                                           material = material))
+            else:
+                shapes.append(TPolygon(points_mod = [TPoint(x, y), TPoint(x + size, y), \
+                                                     TPoint(x, y + size)], material = material))
+        return shapes
+
+    @staticmethod
+    def culled(shapes):
+        """
+        Drop the shapes covered by later ones.
+
+        :return: remaining shapes and the number of dropped ones.
+        :rtype: tuple
+        """
+        hidden = set(hidden_shapes(shapes))
+        return [s for i, s in enumerate(shapes) if i not in hidden], len(hidden)
+
+    @staticmethod
+    def coalesced(shapes):
+        """
+        Merge rectangles of the same material.
+
+        :return: shapes with the merged rectangles and the number of absorbed
+                 ones.
+        :rtype: tuple
+        """
+        merged, absorbed = coalesce_rectangles(shapes)
+        return [TParser.merged_rectangle(merged[i]) if i in merged else s \
+                for i, s in enumerate(shapes) if i not in absorbed], len(absorbed)
+
+    @staticmethod
+    def culled_and_coalesced(shapes):
+        """
+        Drop the hidden shapes, then merge the remaining rectangles.
+
+        :return: remaining shapes and the number of dropped and absorbed ones.
+        :rtype: tuple
+        """
+        shapes, hidden = TReductionInvarianceTest.culled(shapes)
+        shapes, absorbed = TReductionInvarianceTest.coalesced(shapes)
+        return shapes, hidden + absorbed
+
+    #: names and functions of the reductions.
+    REDUCTIONS = (("culling", culled.__func__), \
+                  ("coalescing", coalesced.__func__), \
+                  ("both", culled_and_coalesced.__func__))
+
+    def test_material_grid_unchanged(self):
+        for name, reduce in self.REDUCTIONS:
+            with self.subTest(reduction = name):
+                rnd = random.Random(5)
+                removed = 0
+                for _ in range(40):
+                    shapes = self.random_model(rnd)
+                    reduced, count = reduce(shapes)
+                    removed += count
+                    grid, _ = TParser.material_grid(self.materials, shapes)
+                    reduced_grid, _ = TParser.material_grid(self.materials, reduced)
+                    self.assertTrue((grid == reduced_grid).all())
+                self.assertGreater(removed, 0)
+
+
+class TImportTest(unittest.TestCase):
+    """
+    Class checks that the parser doesn't depend on the user interface.
+    """
+
+    def test_without_tkinter(self):
+        script = "import sys; sys.modules['tkinter'] = None; import parsetofile"
+        result = subprocess.run([sys.executable, "-c", script], \
+                                cwd = ROOT, \
+                                stderr = subprocess.PIPE, universal_newlines = True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
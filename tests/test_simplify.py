@@ -0,0 +1,162 @@
+"""
+.. module:: simplify tests.
+:synopsis: Tests of the simplify module, run with
+           'python -m unittest discover tests' from the repository root.
+
+.. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
+"""
+
+from math import ceil, cos, floor, pi, sin
+import random
+import unittest
+
+import helpers   # puts the repository root on the module search path
+
+from benchmark import TPolygonCorpus
+from point import TPoint
+from simplify import simplify_polygon
+
+
+DX = 0.01       #: grid step in the x direction.
+DY = 0.01       #: grid step in the y direction.
+EPS = 1e-9      #: distance below which points are considered to lie on edges.
+
+
+def noisy_polygons():
+    """
+    Generate polygons with many more vertices than the grid resolves: noisy
+    circles, thin noisy bands and random simple polygons, in metres.
+
+    :return: names and vertices of the polygons.
+    :rtype: list of tuple
+    """
+    rnd = random.Random(7)
+    polygons = []
+    for num in range(6):
+        n = rnd.randint(50, 250)
+        radius = rnd.uniform(0.05, 0.2)
+        radii = [radius + rnd.uniform(-0.004, 0.004) for k in range(n)]
+        polygons.append(("circle {}".format(num), \
+                         [TPoint(0.5 + r*cos(2*pi*k/n), 0.5 + r*sin(2*pi*k/n)) \
+                          for k, r in enumerate(radii)]))
+    for num in range(3):
+        n = rnd.randint(50, 200)
+        lower = [TPoint(0.1 + 0.8*k/n, 0.3 + 0.05*sin(6*k/n) + rnd.uniform(0, 0.003)) \
+                 for k in range(n)]
+        upper = [TPoint(pt.x, pt.y + 0.012 + rnd.uniform(0, 0.003)) for pt in lower]
+        polygons.append(("band {}".format(num), lower + upper[::-1]))
+    for seed in range(4):
+        points = TPolygonCorpus.random_polygon(60, seed)
+        polygons.append(("random {}".format(seed), \
+                         [TPoint(pt.x*1e-4 + 0.1, pt.y*1e-4 + 0.1) for pt in points]))
+    return polygons
+
+
+def orient(a, b, c):
+    """
+    Calculate the orientation of an ordered triple of points.
+
+    :rtype: float
+    """
+    return (b.x - a.x)*(c.y - a.y) - (b.y - a.y)*(c.x - a.x)
+
+
+def on_segment(p, a, b):
+    """
+    Check whether a point lies on a segment.
+
+    :rtype: boolean
+    """
+    if(abs(orient(a, b, p)) > EPS*max(abs(b.x - a.x) + abs(b.y - a.y), EPS)):
+        return False
+    return min(a.x, b.x) - EPS <= p.x <= max(a.x, b.x) + EPS and \
+           min(a.y, b.y) - EPS <= p.y <= max(a.y, b.y) + EPS
+
+
+def location(p, points):
+    """
+    Locate a point relative to a polygon.
+
+    :return: 0 outside, 1 on the boundary, 2 inside.
+    :rtype: integer
+    """
+    inside = False
+    for k in range(len(points)):
+        a, b = points[k - 1], points[k]
+        if(on_segment(p, a, b)):
+            return 1
+        if((a.y > p.y) != (b.y > p.y) and \
+           p.x < a.x + (p.y - a.y)*(b.x - a.x)/(b.y - a.y)):
+            inside = not inside
+    return 2 if inside else 0
+
+
+def simple(points):
+    """
+    Check whether no two non-adjacent edges of a polygon touch and no two
+    adjacent ones overlap.
+
+    :rtype: boolean
+    """
+    n = len(points)
+    for i in range(n):
+        a, b = points[i - 1], points[i]
+        for j in range(i + 1, n):
+            c, d = points[j - 1], points[j]
+            # Adjacent edges share a vertex and may only meet there
+            if(j == i + 1):
+                if(on_segment(d, a, b) or on_segment(a, c, d)):
+                    return False
+                continue
+            if(i == 0 and j == n - 1):
+                if(on_segment(c, a, b) or on_segment(b, c, d)):
+                    return False
+                continue
+            o1, o2 = orient(a, b, c), orient(a, b, d)
+            o3, o4 = orient(c, d, a), orient(c, d, b)
+            if(((o1 > 0) != (o2 > 0)) and o1 != 0 and o2 != 0 and \
+               ((o3 > 0) != (o4 > 0)) and o3 != 0 and o4 != 0):
+                return False
+            if(on_segment(c, a, b) or on_segment(d, a, b) or \
+               on_segment(a, c, d) or on_segment(b, c, d)):
+                return False
+    return True
+
+
+class TSimplifyPolygonTest(unittest.TestCase):
+    """
+    Class checks the guarantees of the outline simplification.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.polygons = [(name, points, [points[k] for k in \
+                                        simplify_polygon(points, DX, DY, 0.5*DX)]) \
+                        for name, points in noisy_polygons()]
+
+    def test_vertices_removed(self):
+        removed = sum(len(points) - len(kept) for name, points, kept in self.polygons)
+        self.assertGreater(removed, sum(len(points) for name, points, kept in \
+                                        self.polygons)//2)
+
+    def test_outline_simple(self):
+        for name, points, kept in self.polygons:
+            with self.subTest(polygon = name):
+                self.assertTrue(simple(points))
+                self.assertGreaterEqual(len(kept), 3)
+                self.assertTrue(simple(kept))
+
+    def test_grid_nodes_unchanged(self):
+        for name, points, kept in self.polygons:
+            with self.subTest(polygon = name):
+                for i in range(floor(min(pt.x for pt in points)/DX) - 1, \
+                               ceil(max(pt.x for pt in points)/DX) + 2):
+                    for j in range(floor(min(pt.y for pt in points)/DY) - 1, \
+                                   ceil(max(pt.y for pt in points)/DY) + 2):
+                        node = TPoint(i*DX, j*DY)
+                        self.assertEqual(location(node, points), location(node, kept), \
+                                         (i, j))
+
+
+if __name__ == "__main__":
+    unittest.main()
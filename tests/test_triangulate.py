@@ -0,0 +1,426 @@
+"""
+.. module:: triangulate tests.
+:synopsis: Regression tests of the triangulate module, run with
+           'python -m unittest discover tests' from the repository root.
+
+.. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
+"""
+
+import json
+from math import cos, pi, sin
+import os
+import random
+import unittest
+
+from helpers import FIXTURES
+
+from benchmark import TPolygonCorpus, TTriangulationBenchmark
+from parsetofile import TParser
+from point import TPoint
+from settings import TModel_Size
+from shapes import TPolygon
+from triangulate import convex_fan, EarClippingEngine, ENGINES, is_convex, MonotoneEngine, \
+                        partition_rectilinear, repair_triangulation, to_grid, TriangulationCache, \
+                        TriangulationEngine, TRIANGULATION_CACHE, Vertex
+
+
+GRID_STEP = 0.01    #: grid step the fixture polygons are snapped to.
+
+
+class TMonotoneRegressionTest(unittest.TestCase):
+    """
+    Class compares the monotone engine with triangles recorded from the
+    implementation preceding the linear time monotone piece triangulation,
+    on hand-drawn shapes, random star polygons, a comb and a zig-zag.
+    Polygons marked as not identical are the ones for which the recorded
+    output was not a valid triangulation or the chain labelling picks
+    another valid diagonal; for them only the exact coverage is required.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join(FIXTURES, "monotone_regression.json")) as fixture:
+            cls.polygons = json.load(fixture)
+
+    @staticmethod
+    def counterclockwise(points, triangles):
+        """
+        Reverse a clockwise polygon together with its triangles, as
+        TTriangulationBenchmark.covers() expects a counterclockwise one.
+
+        :param points: polygon vertices with integer coordinates.
+        :type points: list of Vertex
+        :param triangles: triangles as triples of vertex indices.
+        :type triangles: list of tuple
+
+        :rtype: tuple
+        """
+        n = len(points)
+        area = sum(points[i - 1].x*points[i].y - points[i].x*points[i - 1].y \
+                   for i in range(n))
+        if(area > 0):
+            return points, triangles
+        return points[::-1], [tuple(n - 1 - i for i in t) for t in triangles]
+
+    def test_identical_triangles(self):
+        for polygon in self.polygons:
+            if(not polygon["identical"]):
+                continue
+            with self.subTest(polygon = polygon["name"]):
+                points = to_grid([Vertex(x, y) for x, y in polygon["points"]], \
+                                 GRID_STEP, GRID_STEP)
+                triangles = ENGINES["monotone"].triangulate(points)
+                self.assertEqual(sorted(tuple(sorted(t)) for t in triangles), \
+                                 sorted(tuple(sorted(t)) for t in polygon["triangles"]))
+
+    def test_exact_coverage(self):
+        for polygon in self.polygons:
+            with self.subTest(polygon = polygon["name"]):
+                points = to_grid([Vertex(x, y) for x, y in polygon["points"]], \
+                                 GRID_STEP, GRID_STEP)
+                triangles = ENGINES["monotone"].triangulate(points)
+                self.assertTrue(TTriangulationBenchmark.covers( \
+                    *self.counterclockwise(points, triangles)))
+
+
+class TEarClippingTest(unittest.TestCase):
+    """
+    Class compares the ear clipping engine, with and without the z-order
+    hashing, with the monotone engine on the benchmark corpus polygons.
+    """
+
+    def test_corpus(self):
+        engines = [EarClippingEngine(), EarClippingEngine(hash_threshold = 10**9), \
+                   MonotoneEngine()]
+        for name, generate in TPolygonCorpus.SHAPES.items():
+            for size in (8, 50, 300):
+                points = generate(size)
+                n = len(points)
+                for engine in engines:
+                    with self.subTest(polygon = name, size = size, engine = engine.name, \
+                                      hashed = getattr(engine, "hash_threshold", 0) < n):
+                        self.assertTrue(TTriangulationBenchmark.covers( \
+                            points, engine.triangulate(points)))
+                        # Clockwise polygons give the same counterclockwise triangles
+                        triangles = engine.triangulate(points[::-1])
+                        self.assertTrue(TTriangulationBenchmark.covers( \
+                            points, [tuple(n - 1 - i for i in t) for t in triangles]))
+
+    def test_abstract_engine(self):
+        with self.assertRaises(TypeError):
+            TriangulationEngine()
+
+
+class TConvexFanTest(unittest.TestCase):
+    """
+    Class checks recognising strictly convex polygons and dividing them into
+    fans.
+    """
+
+    @staticmethod
+    def regular(n, step = 1):
+        """
+        Create a counterclockwise regular polygon, or a star polygon visiting
+        every step-th vertex.
+
+        :rtype: list of Vertex
+        """
+        return [Vertex(round(1000*cos(2*pi*k*step/n)), round(1000*sin(2*pi*k*step/n))) \
+                for k in range(n)]
+
+    def test_convex(self):
+        for n in (3, 4, 7, 50):
+            points = self.regular(n)
+            for orientation in (points, points[::-1]):
+                with self.subTest(n = n, clockwise = orientation is not points):
+                    self.assertTrue(is_convex(orientation))
+                    triangles = convex_fan(orientation)
+                    if(orientation is not points):
+                        triangles = [tuple(n - 1 - i for i in t) for t in triangles]
+                    self.assertTrue(TTriangulationBenchmark.covers(points, triangles))
+
+    def test_collinear_vertices(self):
+        points = [Vertex(0, 0), Vertex(5, 0), Vertex(10, 0), Vertex(10, 10), Vertex(0, 10)]
+        self.assertFalse(is_convex(points))
+        self.assertIsNone(convex_fan(points))
+        self.assertFalse(is_convex([Vertex(0, 0), Vertex(5, 5), Vertex(10, 10)]))
+        # Duplicated vertices
+        self.assertFalse(is_convex([Vertex(0, 0), Vertex(10, 0), Vertex(10, 0), \
+                                    Vertex(0, 10)]))
+
+    def test_not_convex(self):
+        # Pentagram turns the same way at every vertex, but winds twice
+        pentagram = self.regular(5, 2)
+        self.assertFalse(is_convex(pentagram))
+        self.assertIsNone(convex_fan(pentagram))
+        self.assertFalse(is_convex(pentagram[::-1]))
+        self.assertFalse(is_convex(TPolygonCorpus.star(20)))
+        self.assertFalse(is_convex([Vertex(0, 0), Vertex(10, 0)]))
+
+
+class TPartitionRectilinearTest(unittest.TestCase):
+    """
+    Class checks dividing rectilinear polygons into minimal numbers of
+    rectangles.
+    """
+
+    POLYGONS = {"L": ([(0, 0), (4, 0), (4, 1), (1, 1), (1, 3), (0, 3)], 2),
+                "U": ([(0, 0), (5, 0), (5, 4), (4, 4), (4, 1), (1, 1), (1, 4), (0, 4)], 3),
+                "H": ([(0, 0), (6, 0), (6, 2), (4, 2), (4, 3), (6, 3), (6, 5), (0, 5), \
+                       (0, 3), (2, 3), (2, 2), (0, 2)], 3),
+                "plus": ([(1, 0), (2, 0), (2, 1), (3, 1), (3, 2), (2, 2), (2, 3), (1, 3), \
+                          (1, 2), (0, 2), (0, 1), (1, 1)], 3)}     #: polygons and minimal numbers of rectangles.
+
+    def assertTiles(self, points, rectangles):
+        """
+        Check that rectangles cover the polygon exactly: every cell of the
+        grid built from the vertex coordinates is covered once if its centre
+        lies inside the polygon and not at all otherwise.
+
+        :param points: polygon vertices.
+        :type points: list of Vertex
+        :param rectangles: rectangles as (x_min, y_min, x_max, y_max) tuples.
+        :type rectangles: list of tuple
+        """
+        xs = sorted(set(pt.x for pt in points))
+        ys = sorted(set(pt.y for pt in points))
+        n = len(points)
+        for x1, x2 in zip(xs, xs[1:]):
+            for y1, y2 in zip(ys, ys[1:]):
+                # Centre doubled, so the crossings are counted in integers
+                cx, cy = x1 + x2, y1 + y2
+                crossings = 0
+                for k in range(n):
+                    p, q = points[k - 1], points[k]
+                    if(p.x == q.x and 2*p.x > cx and min(p.y, q.y)*2 < cy < max(p.y, q.y)*2):
+                        crossings += 1
+                count = sum(1 for r in rectangles if 2*r[0] < cx < 2*r[2] and 2*r[1] < cy < 2*r[3])
+                self.assertEqual(count, crossings%2, (x1, y1))
+
+    def test_minimal(self):
+        for name, (coordinates, minimum) in self.POLYGONS.items():
+            points = [Vertex(x, y) for x, y in coordinates]
+            for orientation in (points, points[::-1]):
+                with self.subTest(polygon = name, clockwise = orientation is not points):
+                    rectangles = partition_rectilinear(orientation)
+                    self.assertEqual(len(rectangles), minimum)
+                    self.assertTiles(orientation, rectangles)
+
+    def test_staircase(self):
+        for steps in (1, 5, 30):
+            with self.subTest(steps = steps):
+                points = TPolygonCorpus.staircase(2*steps + 2)
+                rectangles = partition_rectilinear(points)
+                self.assertEqual(len(rectangles), steps)
+                self.assertTiles(points, rectangles)
+
+    def test_random_rectilinear(self):
+        rnd = random.Random(5)
+        for num in range(30):
+            # Union of rectangles stacked on a common base, traced along
+            # its upper outline
+            widths = [rnd.randint(1, 4) for _ in range(rnd.randint(2, 12))]
+            heights = [rnd.randint(1, 6) for _ in widths]
+            points = [Vertex(0, 0), Vertex(sum(widths), 0)]
+            x = sum(widths)
+            for width, height in reversed(list(zip(widths, heights))):
+                points.append(Vertex(x, height))
+                x -= width
+                points.append(Vertex(x, height))
+            # Drop the collinear vertices between equal heights
+            points = [pt for k, pt in enumerate(points) \
+                      if not (points[k - 1].y == pt.y == points[(k + 1)%len(points)].y or \
+                              points[k - 1].x == pt.x == points[(k + 1)%len(points)].x)]
+            with self.subTest(polygon = num):
+                self.assertTiles(points, partition_rectilinear(points))
+
+    def test_refused(self):
+        self.assertIsNone(partition_rectilinear([Vertex(0, 0), Vertex(2, 0), Vertex(1, 2)]))
+        self.assertIsNone(partition_rectilinear([Vertex(0, 0), Vertex(2, 0), Vertex(2, 1), \
+                                                 Vertex(1, 2), Vertex(0, 1)]))
+        points = [Vertex(x, y) for x, y in self.POLYGONS["U"][0]]
+        # The U shape lies over a 3 by 2 grid of cells
+        self.assertIsNone(partition_rectilinear(points, max_cells = 5))
+        self.assertEqual(len(partition_rectilinear(points, max_cells = 6)), 3)
+
+
+class TRepairTriangulationTest(unittest.TestCase):
+    """
+    Class checks repairing triangulations after single vertex edits: a
+    repaired triangulation has to tile the edited polygon with n - 2
+    triangles, and edits changing the polygon topology have to be refused.
+    """
+
+    SQUARE = [Vertex(0, 0), Vertex(10, 0), Vertex(10, 10), Vertex(0, 10)]
+
+    @staticmethod
+    def edited(points, vertex, edit, rnd):
+        """
+        Edit a random polygon vertex.
+
+        :rtype: list of Vertex
+        """
+        points = list(points)
+        if(edit == "move"):
+            pt = points[vertex]
+            points[vertex] = Vertex(pt.x + rnd.randint(-30, 30), pt.y + rnd.randint(-30, 30))
+        elif(edit == "insert"):
+            a, b = points[vertex - 1], points[vertex]
+            points.insert(vertex, Vertex((a.x + b.x)//2 + rnd.randint(-3, 3), \
+                                         (a.y + b.y)//2 + rnd.randint(-3, 3)))
+        else:
+            del points[vertex]
+        return points
+
+    def test_edits(self):
+        rnd = random.Random(2)
+        for edit in ("move", "insert", "remove"):
+            repaired = 0
+            for name, generate in TPolygonCorpus.SHAPES.items():
+                for num in range(20):
+                    points = generate(40, num) if name in ("star", "random") else generate(40)
+                    triangles = ENGINES["monotone"].triangulate(points)
+                    vertex = rnd.randrange(len(points))
+                    edited = self.edited(points, vertex, edit, rnd)
+                    result = repair_triangulation(edited, triangles, vertex, edit)
+                    if(result is None):
+                        continue
+                    repaired += 1
+                    with self.subTest(edit = edit, polygon = name, num = num):
+                        self.assertTrue(TTriangulationBenchmark.covers(edited, result))
+                        if(edit == "move"):
+                            # Triangles away from the vertex are kept
+                            self.assertTrue({t for t in triangles if vertex not in t} <= \
+                                            set(result))
+            self.assertGreater(repaired, 50, edit)
+
+    def test_topology_changes(self):
+        triangles = ENGINES["monotone"].triangulate(self.SQUARE)
+        # Moved across the opposite edge
+        points = list(self.SQUARE)
+        points[2] = Vertex(-5, 5)
+        self.assertIsNone(repair_triangulation(points, triangles, 2, "move"))
+        # Inserted beyond the opposite edge
+        points = self.SQUARE[:1] + [Vertex(5, 15)] + self.SQUARE[1:]
+        self.assertIsNone(repair_triangulation(points, triangles, 1, "insert"))
+        # Removed, the new edge crossing the notch of a U shape
+        u_shape = [Vertex(0, 0), Vertex(6, 0), Vertex(6, 6), Vertex(5, 6), Vertex(5, 2), \
+                   Vertex(1, 2), Vertex(1, 6), Vertex(0, 6)]
+        triangles = ENGINES["monotone"].triangulate(u_shape)
+        self.assertIsNone(repair_triangulation(u_shape[:1] + u_shape[2:], triangles, 1, \
+                                               "remove"))
+        # A triangulation of another polygon
+        self.assertIsNone(repair_triangulation(u_shape, triangles[1:], 0, "move"))
+
+    def test_polygon_edits(self):
+        self.addCleanup(TRIANGULATION_CACHE.clear)
+        polygon = TPolygon(points_mod = [TPoint(0.1, 0.1), TPoint(0.5, 0.1), TPoint(0.5, 0.2), \
+                                         TPoint(0.2, 0.2), TPoint(0.2, 0.4), TPoint(0.1, 0.4)])
+        TParser.triangulate_indices(polygon.points_mod)
+
+        def check():
+            """
+            Check that the triangulation attached to the polygon tiles it.
+            """
+            key = TRIANGULATION_CACHE.key(polygon.points_mod)
+            self.assertIn(key, TRIANGULATION_CACHE)
+            points = to_grid(polygon.points_mod, TModel_Size.DX, TModel_Size.DY)
+            self.assertTrue(TTriangulationBenchmark.covers(points, \
+                                                           TRIANGULATION_CACHE.get(key)))
+
+        polygon.edit_vertex(vertex_num = 2, x = 0.45, y = 0.25)
+        check()
+        polygon.add_vertex(x_mod = 0.15, y_mod = 0.05)
+        self.assertEqual(len(polygon.points_mod), 7)
+        check()
+        polygon.remove_vertex(3)
+        check()
+        # Moving a vertex across the polygon drops the triangulation
+        polygon.edit_vertex(vertex_num = 0, x = 0.3, y = 0.5)
+        self.assertNotIn(TRIANGULATION_CACHE.key(polygon.points_mod), TRIANGULATION_CACHE)
+        self.assertIsNone(polygon.take_triangulation())
+
+
+class TTriangulationCacheTest(unittest.TestCase):
+    """
+    Class checks the least recently used cache of triangulations.
+    """
+
+    @staticmethod
+    def square(k):
+        """
+        Create the key and triangles of a unit square translated by k.
+
+        :rtype: tuple
+        """
+        key = TriangulationCache.key([Vertex(k, 0), Vertex(k + 1, 0), Vertex(k + 1, 1), \
+                                      Vertex(k, 1)])
+        return key, [(0, 1, 2), (0, 2, 3)]
+
+    def filled(self, entries):
+        """
+        Create a cache just large enough for a given number of squares and
+        store them in order.
+
+        :rtype: TriangulationCache
+        """
+        probe = TriangulationCache()
+        probe.put(*self.square(0))
+        cache = TriangulationCache(max_bytes = entries*probe.size())
+        for k in range(entries):
+            cache.put(*self.square(k))
+        return cache
+
+    def test_counters(self):
+        cache = TriangulationCache()
+        key, triangles = self.square(0)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, triangles)
+        self.assertEqual(cache.get(key), tuple(triangles))
+        self.assertEqual(cache.get(key), tuple(triangles))
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        # Membership tests don't count
+        self.assertIn(key, cache)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        cache.clear()
+        self.assertEqual((len(cache), cache.size(), cache.hits, cache.misses), (0, 0, 0, 0))
+
+    def test_eviction(self):
+        cache = self.filled(3)
+        self.assertEqual(len(cache), 3)
+        cache.put(*self.square(3))
+        self.assertEqual(len(cache), 3)
+        self.assertNotIn(self.square(0)[0], cache)
+        self.assertLessEqual(cache.size(), cache.max_bytes)
+
+    def test_least_recently_used(self):
+        cache = self.filled(3)
+        # Reading the oldest entry makes the next one the least recently used
+        cache.get(self.square(0)[0])
+        cache.put(*self.square(3))
+        self.assertIn(self.square(0)[0], cache)
+        self.assertNotIn(self.square(1)[0], cache)
+        # Storing an entry again refreshes it too
+        cache.put(*self.square(2))
+        cache.put(*self.square(4))
+        self.assertIn(self.square(2)[0], cache)
+        self.assertNotIn(self.square(0)[0], cache)
+
+    def test_oversized_entry(self):
+        cache = TriangulationCache(max_bytes = 10)
+        cache.put(*self.square(0))
+        self.assertEqual((len(cache), cache.size()), (0, 0))
+
+    def test_invalidate(self):
+        cache = self.filled(2)
+        size = cache.size()
+        cache.invalidate(self.square(0)[0])
+        self.assertNotIn(self.square(0)[0], cache)
+        self.assertEqual(cache.size(), size//2)
+        # Unknown keys are ignored
+        cache.invalidate(self.square(7)[0])
+        self.assertEqual(len(cache), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
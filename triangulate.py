@@ -2,18 +2,18 @@
 .. module:: triangulate module.
 :synopsis: Module contains functions and classes used to triangulate a
            discretionary polygon which employ the algorithm described in de Berg's
-           'Computational Geometry', chapter 3.
+           'Computational Geometry', chapter 3, or ear clipping. The engines
+           share the TriangulationEngine interface. Rectilinear polygons can
+           be divided into rectangles instead.
 
 .. moduleauthor:: Tomasz Siwek <tsiwek@g.pl>
 """
 
-from bisect import bisect_left
-from copy import copy, deepcopy
-import cProfile
+from abc import ABC, abstractmethod
+from array import array
 #from itertools import islice
-from math import asin, atan2, pi
-import matplotlib.pyplot as plt
-from sortedcontainers import SortedDict
+from collections import OrderedDict
+from functools import cmp_to_key
 import sys
 
 
@@ -29,6 +29,8 @@ class Vertex(object):
     :type v_type: string
     """
 
+    __slots__ = ("x", "y", "v_type")
+
     def __init__(self, x, y, v_type = None):
         """
         Initialise object variables.
@@ -48,11 +50,8 @@ class Vertex(object):
                   False otherwise.
         :rtype: boolean
         """
-        if(self.x == other.x and self.y == other.y):
-            return True
-        else:
-            return False
-    
+        return self.x == other.x and self.y == other.y
+
     def __lt__(self, other):
         """
         "<" operator overload.
@@ -64,13 +63,8 @@ class Vertex(object):
                   and self.x is lesser than other.x, False otherwise.
         :rtype: boolean
         """
-        if(self.y > other.y):
-            return True
-        elif(self.y == other.y and self.x < other.x):
-            return True
-        else:
-            return False
-    
+        return self.y > other.y or (self.y == other.y and self.x < other.x)
+
     def __le__(self, other):
         """
         "<=" operator overload.
@@ -82,11 +76,8 @@ class Vertex(object):
                   False otherwise.
         :rtype: boolean
         """
-        if(self.__eq__(other) or self.__lt__(other)):
-            return True
-        else:
-            return False
-    
+        return self.y > other.y or (self.y == other.y and self.x <= other.x)
+
     def __str__(self):
         """
         Return string representation of a vertex.
@@ -109,6 +100,8 @@ class Edge(object):
     :type helper: Vertex
     """
 
+    __slots__ = ("start", "end", "helper")
+
     def __init__(self, start = None, end = None, helper = None):
         """
         Initialise object variables.
@@ -132,11 +125,8 @@ class Edge(object):
         :returns: True if edges begin and end in the same points, False otherwise.
         :rtype: boolean
         """
-        if(self.start == other.start and self.end == other.end):
-            return True
-        else:
-            return False
-    
+        return self.start == other.start and self.end == other.end
+
     def __lt__(self, other):
         """
         "<" operator overload.
@@ -148,11 +138,8 @@ class Edge(object):
                   (see Vertex.__le__()), False otherwise.
         :rtype: boolean
         """
-        if(self.start < other.start):
-            return True
-        else:
-            return False
-    
+        return self.start < other.start
+
     def __le__(self, other):
         """
         "<=" operator overload.
@@ -164,11 +151,8 @@ class Edge(object):
                   (see Vertex.__le__() and Vertex.__eq__()), False otherwise.
         :rtype: boolean
         """
-        if(self.__eq__(other) or self.__lt__(other)):
-            return True
-        else:
-            return False
-    
+        return self.__eq__(other) or self.__lt__(other)
+
     def __str__(self):
         """
         Return string representation of an edge.
@@ -182,6 +166,9 @@ class Edge(object):
 class Polygon(object):
     """
     Class represents a polygon with its vertices and edges.
+    Vertex coordinates are kept in two parallel arrays in counterclockwise
+    order; vertex i is identified by its index and edge i joins vertex i with
+    vertex i + 1. Vertex and Edge objects are created only on demand.
 
     :param vertices: list of polygon vertices.
     :type vertices: list of Vertex
@@ -190,22 +177,20 @@ class Polygon(object):
     def __init__(self, vertices):
         """
         Initialise object variables.
-        Vertices must be stored in clockwise order.
-        """
-        if(not self._counterclockwise(vertices)):
-            vertices.reverse()
-        self._vertices = vertices[:]
-        self._num_of_vertices = len(vertices)
-        self._edges = []
-        self._vertex_indices_dict = {}
-        self._edge_indices_dict = {}
-        for i, v in enumerate(vertices):
-            v_nex = self._vertices[(i+1)%len(self._vertices)]
-            e = Edge(v, v_nex)
-            self._edges.append(e)
-            self._vertex_indices_dict[(v.x, v.y)] = i
-            self._edge_indices_dict[(e.start.x, e.start.y, e.end.x, e.end.y)] = i
-    
+        Vertices are stored in counterclockwise order.
+        """
+        self.xs = array("d", [v.x for v in vertices])
+        self.ys = array("d", [v.y for v in vertices])
+        self._num_of_vertices = len(self.xs)
+        self._reversed = self.signed_area() >= 0
+        if(self._reversed):
+            self.xs.reverse()
+            self.ys.reverse()
+        self._vertices = None
+        self._edges = None
+        self._vertex_indices_dict = None
+        self._edge_indices_dict = None
+
     def __getitem__(self, index):
         """
         "[]" operator overload.
@@ -216,7 +201,7 @@ class Polygon(object):
         :returns: vertex designated by the given index.
         :rtype: Vertex
         """
-        return self._vertices[index]
+        return self.get_vertices()[index]
 
     def vertex_index(self, v):
         """
@@ -228,20 +213,41 @@ class Polygon(object):
         :returns: index of a given vertex.
         :rtype: integer
         """
-        i = self._vertex_indices_dict[(v.x, v.y)]
-        return i
-    
+        if(self._vertex_indices_dict is None):
+            self._vertex_indices_dict = {(x, y): i for i, (x, y) in \
+                                         enumerate(zip(self.xs, self.ys))}
+        return self._vertex_indices_dict[(v.x, v.y)]
+
     def edge_index(self, e):
         """
-        Get an index of a given vertex.
+        Get an index of a given edge.
 
-        :param v: examined vertex.
-        :type v: Vertex
+        :param e: examined edge.
+        :type e: Edge
 
-        :returns: index of a given vertex.
+        :returns: index of a given edge.
+        :rtype: integer
+        """
+        if(self._edge_indices_dict is None):
+            self._edge_indices_dict = {}
+            for i, e_i in enumerate(self.get_edges()):
+                self._edge_indices_dict[(e_i.start.x, e_i.start.y, e_i.end.x, \
+                                         e_i.end.y)] = i
+        return self._edge_indices_dict[(e.start.x, e.start.y, e.end.x, e.end.y)]
+
+    def original_index(self, i):
+        """
+        Get an index a vertex had in the list passed to the constructor, which
+        might have been reversed.
+
+        :param i: index of the vertex in the polygon.
+        :type i: integer
+
+        :returns: index of the vertex in the original list.
         :rtype: integer
         """
-        i = self._edge_indices_dict[(e.start.x, e.start.y, e.end.x, e.end.y)]
+        if(self._reversed):
+            return self._num_of_vertices - 1 - i
         return i
 
     def previous_vertex(self, v):
@@ -255,8 +261,8 @@ class Polygon(object):
         :rtype: Vertex
         """
         i_prev = self.vertex_index(v) - 1
-        return self._vertices[i_prev]
-    
+        return self.get_vertices()[i_prev]
+
     def next_vertex(self, v):
         """
         Get a vertex following the given one in the vertices list.
@@ -268,7 +274,7 @@ class Polygon(object):
         :rtype: Vertex
         """
         i_nex = (self.vertex_index(v)  + 1)%self._num_of_vertices
-        return self._vertices[i_nex]
+        return self.get_vertices()[i_nex]
 
     def get_vertices(self):
         """
@@ -277,8 +283,23 @@ class Polygon(object):
         :returns: list of polygon vertices.
         :rtype: list of Vertex
         """
+        if(self._vertices is None):
+            self._vertices = [Vertex(x, y) for x, y in zip(self.xs, self.ys)]
         return self._vertices
-    
+
+    def get_edges(self):
+        """
+        Get a list of polygon edges, edge i begining in vertex i.
+
+        :returns: list of polygon edges.
+        :rtype: list of Edge
+        """
+        if(self._edges is None):
+            vertices = self.get_vertices()
+            self._edges = [Edge(v, v_nex) for v, v_nex in \
+                           zip(vertices, vertices[1:] + vertices[:1])]
+        return self._edges
+
     def get_edge(self, v):
         """
         Get a polygon edge begining in a given vertex.
@@ -290,8 +311,8 @@ class Polygon(object):
         :rtype: Edge
         """
         i = self.vertex_index(v)
-        return self._edges[i]
-    
+        return self.get_edges()[i]
+
     def previous_edge(self, v = None, edge = None):
         """
         Get an edge preceding the given one, or a given vertex, in the edges list.
@@ -308,8 +329,8 @@ class Polygon(object):
             i_pre = self.vertex_index(self.previous_vertex(v))
         else:
             i_pre = self.edge_index(edge) - 1
-        return self._edges[i_pre]
-    
+        return self.get_edges()[i_pre]
+
     def next_edge(self, v = None, edge = None):
         """
         Get an edge following the given one, or a given vertex, in the edges list.
@@ -326,7 +347,7 @@ class Polygon(object):
             i_nex = self.vertex_index(self.next_vertex(v))
         else:
             i_nex = (self.edge_index(edge) + 1)%(self._num_of_vertices)
-        return self._edges[i_nex]
+        return self.get_edges()[i_nex]
 
     def signed_area(self, vertices = None):
         """
@@ -344,9 +365,9 @@ class Polygon(object):
             for v1, v2 in zip(vertices, vertices[1:] + vertices[:1]):
                 darea += (v2.x - v1.x)*(v2.y + v1.y)
         else:
-            for v1, v2 in zip(self._vertices, self._vertices[1:] + \
-                              self._vertices[:1]):
-                darea += (v2.x - v1.x)*(v2.y + v1.y)
+            xs, ys = self.xs, self.ys
+            for i in range(self._num_of_vertices):
+                darea += (xs[i] - xs[i - 1])*(ys[i] + ys[i - 1])
         return darea/2
 
     def _counterclockwise(self, vertices):
@@ -359,12 +380,8 @@ class Polygon(object):
         :returns: True if vertices are in counterclockwise order, False otherwise.
         :rtype: boolean
         """
-        area = self.signed_area(vertices)
-        if(area >= 0):
-            return False
-        else:
-            return True
-    
+        return self.signed_area(vertices) < 0
+
     def centroid(self):
         """
         Calculate polygons centeroid (geometric centre).
@@ -375,12 +392,12 @@ class Polygon(object):
         area = self.signed_area()
         sum_x = 0.0
         sum_y = 0.0
-        for vj, vj_more_1 in zip(self._vertices, self._vertices[1:] + \
-                                 self._vertices[0:1]):
+        vertices = self.get_vertices()
+        for vj, vj_more_1 in zip(vertices, vertices[1:] + vertices[0:1]):
             sum_x += (vj.x*vj_more_1.x)*(vj.x*vj_more_1.y - vj_more_1.x*vj.y)
             sum_y += (vj.y*vj_more_1.y)*(vj.x*vj_more_1.y - vj_more_1.x*vj.y)
         return Vertex(sum_x/(6*area), sum_y/(6*area))
-    
+
     def num_of_vertices(self):
         """
         Get number of polygon vertices.
@@ -397,8 +414,8 @@ class Polygon(object):
         :return: first vertex of the polygon.
         :rtype: Vertex
         """
-        return self._vertices[0]
-    
+        return self.get_vertices()[0]
+
     def get_first_edge(self):
         """
         Get first edge of the polygon.
@@ -406,8 +423,8 @@ class Polygon(object):
         :return: first edge of the polygon.
         :rtype: Edge
         """
-        return self._edges[0]
-    
+        return self.get_edges()[0]
+
     def point_in_polygon(self, v):
         """
         Check whether given point lies within the polygon.
@@ -420,188 +437,80 @@ class Polygon(object):
         :return: True of v lies within the polygon area, False otherwise.
         :rtype: boolean  
         """
-        intersetion_count = 0
-        x_min = min([vertex.x for vertex in self._vertices]) - 0.1
-        x_max = max([vertex.x for vertex in self._vertices]) + 0.1
-        for v1, v2 in zip(self._vertices[:], self._vertices[1:] + \
-                          self._vertices[0:1]):
-            if(v1.y < v.y and v2.y < v.y):
-                continue
-            elif(v1.y >= v.y and v2.y >= v.y):
-                continue
-            else:
-                s = intersect(Vertex(x_min, v.y), Vertex(x_max, v.y), v1, v2)
-                if(s.x >= v.x):
-                    intersetion_count += 1
-        if(intersetion_count % 2 == 1):
-            return True
-        else:
-            return False
-   
-
-def angle(v1, v2, v3):
-    """
-    Calculate an angle between points v1, v2 and v3.
-    Source:
-    https://stackoverflow.com/questions/1211212/how-to-calculate-an-angle-from-three-points
-    
-    :param v1: angle first point.
-    :type v1: Vertex
-    :param v2: angle second point.
-    :type v2: Vertex
-    :param v3: angle third point.
-    :type v3: Vertex
-    
-    :return: Angle between v1, v2 and v3 in radians.
-    :rtype: float
-    """
-    x = (v3.x - v2.x)*(v1.x - v2.x) + (v3.y - v2.y)*(v1.y - v2.y)
-    y = (v3.x - v2.x)*(v1.y - v2.y) - (v3.y - v2.y)*(v1.x - v2.x)
-    if(x == 0.0 and y == 0.0):
-        return 0.0
-    alpha = atan2(y, x)
-    if(alpha < 0):
-        alpha = 2*pi + alpha
-    return alpha
+        inside = False
+        xs, ys = self.xs, self.ys
+        n = self._num_of_vertices
+        for i in range(n):
+            x1, y1 = xs[i], ys[i]
+            x2, y2 = xs[(i + 1)%n], ys[(i + 1)%n]
+            if((y1 < v.y) != (y2 < v.y)):
+                if(x1 + (v.y - y1)*(x2 - x1)/(y2 - y1) >= v.x):
+                    inside = not inside
+        return inside
 
 
-def vector_between_two_other(v1, v2, v3):
+def points_in_polygon(xs, ys, points):
     """
-    Check whether a vector lies between two other.
-    Source:
-    https://stackoverflow.com/questions/693806/how-to-determine-whether-v3-is-between-v1-and-v2-when-we-go-from-v1-to-v2-counter/693969#693969
-
-    :param v1: first vector limiting the area.
-    :type v1: Vertex
-    :param v2: second vector limiting the area.
-    :type v2: Vertex
-    :param v3: vector to be examined.
-    :type v3: Vertex
+    Classify a batch of points as lying inside or outside a polygon, using
+    the crossing number test. Points are sorted by y once, then every edge
+    examines only the points within its y range, so the cost is proportional
+    to the number of edge and horizontal ray crossings rather than to the
+    number of points times the number of edges.
+
+    :param xs: polygon vertices x coordinates.
+    :type xs: sequence of float
+    :param ys: polygon vertices y coordinates.
+    :type ys: sequence of float
+    :param points: examined points, one per row.
+    :type points: numpy.ndarray of shape (N, 2)
+
+    :return: True for the points lying inside the polygon.
+    :rtype: numpy.ndarray of boolean
     """
-    crossProds = [v1.x*v2.y - v1.y*v2.x, \
-                  v1.x*v3.y - v1.y*v3.x, \
-                  v3.x*v2.y - v3.y*v2.x]
-    def matlab_all(lst):
-        """
-        Check whether all elements in a list are non-zero.
-
-        :param lst: list to be examined.
-        :type lst: list of float
-
-        :return: True if none of the list elements equals 0, False otherwise.
-        :rtype: boolean
-        """
-        for i in lst:
-            if(i == 0):
-                return False
-        return True
-    def ge_zero(lst):
-        """
-        Get a list containg 1 if a corresponging input list element is equal 
-        or greater than 0 or 0 otherwise.
-
-        :param lst: list to be examined.
-        :type lst: list of float
-
-        :return: list of 1s and 0s.
-        :rtype: list of integer
-        """
-        result = []
-        for i in lst:
-            if(i >= 0):
-                result.append(1)
-            else:
-                result.append(0)
-        return result
-    def lt_zero(lst):
-        """
-        Get a list containg 1 if a corresponging input list element is lesser 
-        than 0 or 0 otherwise.
-
-        :param lst: list to be examined.
-        :type lst: list of float
-
-        :return: list of 1s and 0s.
-        :rtype: list of integer
-        """
-        result = []
-        for i in lst:
-            if(i < 0):
-                result.append(1)
-            else:
-                result.append(0)
-        return result
-    if(matlab_all(ge_zero(crossProds)) or (crossProds[0] < 0 and not matlab_all(lt_zero(crossProds[1:])))):
-        return True
-    else:
-        result = False
-    return result
-
-
-def intersect(v1, v2, v3, v4):
+    import numpy as np
+    points = np.asarray(points, dtype = float).reshape(-1, 2)
+    inside = np.zeros(len(points), dtype = bool)
+    if(len(xs) < 3 or len(points) == 0):
+        return inside
+    order = np.argsort(points[:, 1], kind = "stable")
+    px = points[order, 0]
+    py = points[order, 1]
+    x1 = np.asarray(xs, dtype = float)
+    y1 = np.asarray(ys, dtype = float)
+    x2 = np.roll(x1, -1)
+    y2 = np.roll(y1, -1)
+    # Edges cross the rays of the points with y in [y_low, y_high)
+    y_low = np.minimum(y1, y2)
+    y_high = np.maximum(y1, y2)
+    lo = np.searchsorted(py, y_low, side = "left")
+    hi = np.searchsorted(py, y_high, side = "left")
+    crossed = np.zeros(len(points), dtype = bool)
+    for i in np.nonzero(hi > lo)[0]:
+        a, b = lo[i], hi[i]
+        x = x1[i] + (py[a:b] - y1[i])*(x2[i] - x1[i])/(y2[i] - y1[i])
+        crossed[a:b] ^= x >= px[a:b]
+    inside[order] = crossed
+    return inside
+
+
+def orientation(v1, v2, v3):
     """
-    Calculate a intersection point of two line segments.
-    Source:
-    https://stackoverflow.com/questions/563198/how-do-you-detect-where-two-line-segments-intersect
+    Calculate the orientation of an ordered triple of points, ie. doubled signed
+    area of the triangle they span.
 
-    :param v1: original point of the first line segment.
+    :param v1: first point.
     :type v1: Vertex
-    :param v2: final point of the first line segment.
+    :param v2: second point.
     :type v2: Vertex
-    :param v3: original point of the second line segment.
+    :param v3: third point.
     :type v3: Vertex
-    :param v4: final point of the second line segment.
-    :type v4: Vertex
-
-    :return: None if line segments do not intersect, a intersection point otherwise.
-    :rtype: Vertex
-    """
-    s1 = Vertex(v2.x - v1.x, v2.y - v1.y)
-    s2 = Vertex(v4.x - v3.x, v4.y - v3.y)
-    try:
-        s = (-s1.y * (v1.x - v3.x) + s1.x * (v1.y - v3.y)) / (-s2.x * s1.y + s1.x * s2.y)
-    except:
-        return None
-    try:
-        t = ( s2.x * (v1.y - v3.y) - s2.y * (v1.x - v3.x)) / (-s2.x * s1.y + s1.x * s2.y)
-    except:
-        return None
-    if(s >= 0 and s <= 1 and t >= 0 and t <= 1):
-        return Vertex(v1.x + (t*s1.x), v1.y + (t*s1.y))
-    return None
-
 
-def overlapping(v1, v2, v3, v4):
+    :return: positive value if the points make a counterclockwise turn, negative
+             if they make a clockwise one, and 0 if they are collinear.
+    :rtype: float
     """
-    Check whether two line segments overlap each other.
-    Source:
-    https://stackoverflow.com/questions/563198/how-do-you-detect-where-two-line-segments-intersect
+    return (v2.x - v1.x)*(v3.y - v1.y) - (v2.y - v1.y)*(v3.x - v1.x)
 
-    :param v1: original point of the first line segment.
-    :type v1: Vertex
-    :param v2: final point of the first line segment.
-    :type v2: Vertex
-    :param v3: original point of the second line segment.
-    :type v3: Vertex
-    :param v4: final point of the second line segment.
-    :type v4: Vertex
-
-    :return: True if line segment overlap each other, False otherwise.
-    :rtype: boolean
-    """
-    s1 = Vertex(v2.x - v1.x, v2.y - v1.y)
-    s2 = Vertex(v4.x - v3.x, v4.y - v3.y)
-    cross1 = s1.x*s2.y - s1.y*s2.x
-    s3 = Vertex(v3.x - v1.x, v3.y - v1.y)
-    cross2 = s3.x*s2.y - s3.y*s2.x
-    if(cross1 == 0.0 and cross2 == 0.0):
-        t0 = (s3.x*s1.x + s3.y*s1.y)/(s1.x*s1.x + s1.y*s1.y)
-        t1 = t0 + (s2.x*s1.x + s2.y*s1.y)/(s1.x*s1.x + s1.y*s1.y)
-        if((t0 < 0 and t1 < 0) or (t0 > 1 and t1 > 1)):
-            return False
-        else:
-            return True
-    return False
 
 def create_edges(p):
     """
@@ -633,6 +542,7 @@ def plot_diags(polygon, diags, point = None, point2 = None, title = None):
     :param title: plot title.
     :type title: string
     """
+    import matplotlib.pyplot as plt
     for i, pt in enumerate(polygon):
         plt.plot([pt.x, polygon[(i+1)%len(polygon)].x], [pt.y, polygon[(i+1)%len(polygon)].y], c = 'b')
     for d in diags:
@@ -650,518 +560,1825 @@ def plot_diags(polygon, diags, point = None, point2 = None, title = None):
     plt.show()
 
 
-def make_monotone(polygon):
+class SweepStatus(object):
     """
-    Divide a polygon into y-monotone pieces.
-    Source: 
-    de Berg, van Kreveld, Overmars, Schwrzkopf 'Computational geometry'
-    Section 3.2
-
-    :param polygon: polygon to be divided.
+    Class represents the status structure of the plane sweep performed by
+    make_monotone. Edges intersecting the sweep line are kept in a sorted list
+    ordered by the x coordinate of their intersection with the sweep line,
+    hence inserting, deleting and finding the edge directly to the left of
+    a vertex take O(log n) time.
+    Non-crossing edges never change their relative order while they are
+    present in the structure, so the ordering may be evaluated lazily at the
+    current sweep line position. If all the coordinates are integers (see
+    to_grid()), intersections are compared exactly as fractions.
+
+    :param polygon: swept polygon, its edges are referred to by indices.
     :type polygon: Polygon
-
-    :return: list of diagonals dividing the polygon into y-monotone pieces.
-    :rtype: list of Edge
     """
 
-    def create_vertices_queue(vertices_list):
+    def __init__(self, polygon):
         """
-        Create vertices queue sorted in descending order by y coordinate, then
-        ascending by x coordinate.
+        Initialise object variables.
+        """
+        from sortedcontainers import SortedList
+        self._xs = polygon.xs
+        self._ys = polygon.ys
+        self._n = polygon.num_of_vertices()
+        self._x = 0.0
+        self._y = 0.0
+        self._ixs = None
+        self._iys = None
+        if(all(x.is_integer() for x in self._xs) and \
+           all(y.is_integer() for y in self._ys)):
+            self._ixs = [int(x) for x in self._xs]
+            self._iys = [int(y) for y in self._ys]
+        self._ix = 0
+        self._iy = 0
+        self._entries = SortedList()
+        self._entries_dict = {}
+
+    def __len__(self):
+        """
+        Get number of edges in the structure.
+
+        :returns: number of edges intersecting the sweep line.
+        :rtype: integer
+        """
+        return len(self._entries)
 
-        :param vertices_list: list of vertices to form the queue of.
-        :type vertices_list: list of Vertex
+    def sweep_to(self, v):
+        """
+        Move the sweep line to a given event vertex.
 
-        :return: vertices queue.
-        :rtype: list of Vertex
+        :param v: index of the currently handled vertex.
+        :type v: integer
         """
-        q = vertices_list[:]
-        q.sort(key = lambda pt: (pt.y, -pt.x))
-        return q
+        self._x = self._xs[v]
+        self._y = self._ys[v]
+        if(self._ixs is not None):
+            self._ix = self._ixs[v]
+            self._iy = self._iys[v]
 
-    def vertex_type(v, polygon):
+    def x_intercept(self, e):
         """
-        Determine type of a vertex.
-        
-        :param v: examined vertex.
-        :type v: Vertex
-        :param polygon: the polygon to which the vertex belongs.
-        :type polygon: Polygon 
+        Calculate x coordinate of the intersection of an edge with the sweep line.
+        Horizontal edges are present in the structure only while the sweep line
+        passes through one of their end points, thus the current event x
+        coordinate is returned for them.
 
-        :return: type of the vertex (start, split, end, merge, regular_up, regular_down)
-        :rtype: string
+        :param e: examined edge index, None denotes the current event vertex.
+        :type e: integer
+
+        :returns: x coordinate of the intersection.
+        :rtype: float
         """
-        v_pre = polygon.previous_vertex(v)
-        v_nex = polygon.next_vertex(v)
-        alpha = angle(v_pre, v, v_nex)
-        def lower(p, q):
-            """
-            Check whether point p is lower than q, according to de Berg et al.
+        if(e is None):
+            return self._x
+        xs, ys = self._xs, self._ys
+        i, j = e, (e + 1)%self._n
+        if(ys[i] == ys[j]):
+            return self._x
+        if(ys[i] == self._y):
+            return xs[i]
+        if(ys[j] == self._y):
+            return xs[j]
+        return xs[j] + (self._y - ys[j])*(xs[i] - xs[j])/(ys[i] - ys[j])
+
+    def exact_x_intercept(self, e):
+        """
+        Calculate x coordinate of the intersection of an edge with the sweep
+        line as a fraction, for integer coordinates only (see x_intercept()).
+
+        :param e: examined edge index, None denotes the current event vertex.
+        :type e: integer
+
+        :returns: numerator and positive denominator of the x coordinate.
+        :rtype: tuple
+        """
+        if(e is None):
+            return self._ix, 1
+        xs, ys = self._ixs, self._iys
+        i, j = e, (e + 1)%self._n
+        if(ys[i] == ys[j]):
+            return self._ix, 1
+        if(ys[i] == self._iy):
+            return xs[i], 1
+        if(ys[j] == self._iy):
+            return xs[j], 1
+        den = ys[i] - ys[j]
+        num = xs[j]*den + (self._iy - ys[j])*(xs[i] - xs[j])
+        if(den < 0):
+            return -num, -den
+        return num, den
+
+    def precedes(self, e1, e2):
+        """
+        Check whether an edge intersects the sweep line to the left of another.
+
+        :param e1: first edge index, None denotes the current event vertex.
+        :type e1: integer
+        :param e2: second edge index, None denotes the current event vertex.
+        :type e2: integer
 
-            :param p: vertex to be compared.
-            :type p: Vertex
-            :param q: vertex to be compared againts.
-            :type q: Vertex
+        :rtype: boolean
+        """
+        if(self._ixs is None):
+            return self.x_intercept(e1) < self.x_intercept(e2)
+        num1, den1 = self.exact_x_intercept(e1)
+        num2, den2 = self.exact_x_intercept(e2)
+        return num1*den2 < num2*den1
 
-            :return: True if p is lower than q, ie. its y coordinate is lesser than q or
-                     they are equal and p.x is greater than q.x, False otherwise.
-            :rtype: boolean
-            """
-            if(p.y < q.y or (p.y == q.y and p.x > q.x)):
-                return True
-            else:
-                return False
-        def upper(p, q):
-            """
-            Check whether point p is above q, according to de Berg et al.
+    def insert(self, e):
+        """
+        Insert an edge into the structure.
 
-            :param p: vertex to be compared.
-            :type p: Vertex
-            :param q: vertex to be compared againts.
-            :type q: Vertex
+        :param e: index of the edge to be inserted.
+        :type e: integer
+        """
+        entry = _StatusEntry(self, e)
+        self._entries_dict[e] = entry
+        self._entries.add(entry)
 
-            :return: True if p is above q, ie. its y coordinate is greater than q or
-                     they are equal and p.x is lesser than q.x, False otherwise.
-            :rtype: boolean
-            """
-            if(p.y > q.y or (p.y == q.y and p.x < q.x)):
-                return True
-            else:
-                return False            
-        if(lower(v_pre, v) and lower(v_nex, v)):
-            if(alpha < pi):
-                v_type = "start"
-            else:
-                v_type = "split"
-        elif(upper(v_pre, v) and upper(v_nex, v)):
-            if(alpha < pi):
-                v_type = "end"
-            else:
-                v_type = "merge"
-        elif((lower(v_pre, v)) and upper(v_nex, v)):
-            v_type = "regular_up"
-        elif(upper(v_pre, v) and lower(v_nex, v)):
-            v_type = "regular_down"
-        return v_type
-    
-    def insert(dictionary, e):
-        """
-        Insert edge to a dictionary.
-
-        :param dictionary: dictionary into which an edge is to be inserted.
-        :type dictionary: sortedcontainers.SortedDict
-        :param e: edge to be inserted.
-        :type e: Edge
+    def delete(self, e):
         """
-        key = min(e.start.x, e.end.x)
-        dk = 1.0e-10
-        while(key in dictionary):
-            key += dk
-        dictionary[key] = e
+        Delete an edge from the structure.
 
-    def delete(dictionary, e):
+        :param e: index of the edge to be deleted.
+        :type e: integer
         """
-        Delete edge from a dictionary.
+        entry = self._entries_dict.pop(e)
+        try:
+            self._entries.remove(entry)
+        except ValueError:
+            # Degenerate input, ordering is ambiguous at the sweep line
+            for i, other in enumerate(self._entries):
+                if(other is entry):
+                    del self._entries[i]
+                    break
 
-        :param dictionary: dictionary from which an edge is to be deleted.
-        :type dictionary: sortedcontainers.SortedDict
-        :param e: edge to be deleted.
-        :type e: Edge
+    def find_left(self, v):
         """
-        key = min(e.start.x, e.end.x)
-        dk = 1.0e-10
-        while((key+dk) in dictionary):
-            key += dk
-        del dictionary[key]
+        Find the edge located directly to the left of a given vertex.
+
+        :param v: index of the examined vertex, the sweep line must pass
+                  through it.
+        :type v: integer
 
-    def find_left(dictionary, v):
+        :returns: index of the nearest edge located to the left of a given
+                  vertex.
+        :rtype: integer
         """
-        Find nearest edge located to the left of a given vertex in the dictionary.
-        Source:
-        https://stackoverflow.com/questions/7934547/python-find-closest-key-in-a-dictionary-from-the-given-input-key
+        i = self._entries.bisect_left(_StatusEntry(self, None))
+        if(i == 0):
+            raise ValueError("No edge found to the left of vertex " + \
+                             str(Vertex(self._xs[v], self._ys[v])))
+        return self._entries[i - 1].edge
 
-        :param dictionary: dictionary in which the edge is to be found.
-        :type dictionary: sortedcontainers.SortedDict
-        :param v: vertex which x coordinate is to be used as a search key.
-        :type v: Vertex
 
-        :return: nearest edge located to the left of a given vertex.
-        :rtype:Edge
-        """
-        key = v.x
-        if(len(dictionary) == 1):
-            ind = next(reversed(dictionary))
-            return dictionary[ind]
-        ind = bisect_left(list(dictionary.keys()), key)
-        if(ind == len(dictionary)):
-            ind -= 1
-        found_key = list(dictionary.keys())[ind]
-        if(found_key > key):
-            found_key = list(dictionary.keys())[ind - 1]
-            ind -= 1
-        e = dictionary[found_key]
-        min_x = min(e.start.x, e.end.y) - 0.1
-        max_x = max(e.start.x, e.end.y) + 0.1
-        tmp_v1 = Vertex(min_x, v.y)
-        tmp_v2 = Vertex(max_x, v.y)
-        s = intersect(e.start, e.end, tmp_v1, tmp_v2)
-        if(debug and left_count >= left_stop):
-            print(v, s)
-        if(s is not None and s.x >= v.x):
-            found_key = list(dictionary.keys())[ind - 1]
-        return dictionary[found_key]
-            
+class _StatusEntry(object):
+    """
+    Class represents an edge stored in SweepStatus, comparing itself with
+    other entries by the x coordinate of its intersection with the sweep line.
+
+    :param status: sweep line status structure the entry belongs to.
+    :type status: SweepStatus
+    :param edge: stored edge index, None for a search key located at the
+                 event vertex.
+    :type edge: integer
+    """
+
+    __slots__ = ("status", "edge")
+
+    def __init__(self, status, edge):
+        """
+        Initialise object variables.
+        """
+        self.status = status
+        self.edge = edge
+
+    def __lt__(self, other):
+        """
+        "<" operator overload.
+
+        :param other: entry to be compared againts.
+        :type other: _StatusEntry
+
+        :returns: True if self intersects the sweep line to the left of other,
+                  False otherwise.
+        :rtype: boolean
+        """
+        return self.status.precedes(self.edge, other.edge)
+
+
+VERTEX_TYPES = ("start", "split", "end", "merge", "regular_up", "regular_down")   #: vertex types of make_monotone.
+
+
+def classify_vertices(xs, ys):
+    """
+    Determine types of all the vertices of a counterclockwise polygon at once
+    from cross products and comparisons on the coordinate arrays.
+    A vertex is lower than another one if its y coordinate is lesser or they
+    are equal and its x coordinate is greater, according to de Berg et al.
+
+    :param xs: vertices x coordinates.
+    :type xs: array of float
+    :param ys: vertices y coordinates.
+    :type ys: array of float
+
+    :return: indices of the vertex types in VERTEX_TYPES.
+    :rtype: list of integer
+    """
+    import numpy as np
+    START, SPLIT, END, MERGE, REGULAR_UP, REGULAR_DOWN = range(len(VERTEX_TYPES))
+    x = np.frombuffer(xs, dtype = float)
+    y = np.frombuffer(ys, dtype = float)
+    x_pre, y_pre = np.roll(x, 1), np.roll(y, 1)
+    x_nex, y_nex = np.roll(x, -1), np.roll(y, -1)
+    # Interior angle is lesser than pi at left turns of the counterclockwise
+    # boundary
+    convex = (x - x_pre)*(y_nex - y_pre) - (y - y_pre)*(x_nex - x_pre) > 0
+    pre_lower = (y_pre < y) | ((y_pre == y) & (x_pre > x))
+    nex_lower = (y_nex < y) | ((y_nex == y) & (x_nex > x))
+    types = np.where(pre_lower, REGULAR_UP, REGULAR_DOWN)
+    both_lower = pre_lower & nex_lower
+    types[both_lower] = np.where(convex, START, SPLIT)[both_lower]
+    both_higher = ~pre_lower & ~nex_lower
+    types[both_higher] = np.where(convex, END, MERGE)[both_higher]
+    return types.tolist()
+
+
+def make_monotone(polygon):
+    """
+    Divide a polygon into y-monotone pieces.
+    Vertices and edges are referred to by their indices, edge i joining
+    vertex i with vertex i + 1, and helpers are kept in an array. Vertices
+    are classified and sorted before the sweep, so the event loop only
+    updates the status structure.
+    Source: 
+    de Berg, van Kreveld, Overmars, Schwrzkopf 'Computational geometry'
+    Section 3.2
+
+    :param polygon: polygon to be divided.
+    :type polygon: Polygon
+
+    :return: list of diagonals dividing the polygon into y-monotone pieces,
+             as pairs of vertex indices.
+    :rtype: list of tuple
+    """
+    xs, ys = polygon.xs, polygon.ys
+    n = polygon.num_of_vertices()
+
     def handle_start_vertex(v):
         """
         Handle encountered start vertex.
 
-        :param v: examined vertex.
-        :type v: Veretx
+        :param v: index of the examined vertex.
+        :type v: integer
         """
-        nonlocal t, polygon
-        e = polygon.get_edge(v)
-        e.helper = v
-        insert(t, e)
-    
+        helper[v] = v
+        t.insert(v)
+
     def handle_end_vertex(v):
         """
         Handle encountered end vertex.
 
-        :param v: examined vertex.
-        :type v: Veretx
-        """
-        nonlocal t, d, polygon
-        e_prev = polygon.previous_edge(v)
-        helper = e_prev.helper
-        if(helper is not None and helper.v_type == "merge"):
-            d.append(Edge(v, e_prev.helper))
-        delete(t, e_prev)
-    
+        :param v: index of the examined vertex.
+        :type v: integer
+        """
+        e_prev = (v - 1)%n
+        if(helper[e_prev] >= 0 and v_types[helper[e_prev]] == MERGE):
+            d.append((v, helper[e_prev]))
+        t.delete(e_prev)
+
     def handle_split_vertex(v):
         """
         Handle encountered split vertex.
 
-        :param v: examined vertex.
-        :type v: Veretx
-        """
-        nonlocal t, d, polygon, left_count
-        e = polygon.get_edge(v)
-        left = find_left(t, v)
-        if(debug):
-            left_count += 1
-            if(left_count >= left_stop):
-                plot_diags(polygon.get_vertices(), [left], v, title = left_count)
-        d.append(Edge(v, left.helper))
-        left.helper = v
-        e.helper = v
-        insert(t, e)
-    
+        :param v: index of the examined vertex.
+        :type v: integer
+        """
+        left = t.find_left(v)
+        d.append((v, helper[left]))
+        helper[left] = v
+        helper[v] = v
+        t.insert(v)
+
     def handle_merge_vertex(v):
         """
         Handle encountered merge vertex.
 
-        :param v: examined vertex.
-        :type v: Veretx
-        """
-        nonlocal t, d, polygon, left_count
-        e_prev = polygon.previous_edge(v)
-        if(e_prev.helper is not None and e_prev.helper.v_type == "merge"):
-            d.append(Edge(v, e_prev.helper))
-        delete(t, e_prev)
-        left = find_left(t, v)
-        if(debug):
-            left_count += 1
-            if(left_count >= left_stop):
-                plot_diags(polygon.get_vertices(), [left], v, title = left_count)
-        if(left.helper.v_type == "merge"):
-            d.append(Edge(v, left.helper))
-        left.helper = v
-    
+        :param v: index of the examined vertex.
+        :type v: integer
+        """
+        e_prev = (v - 1)%n
+        if(helper[e_prev] >= 0 and v_types[helper[e_prev]] == MERGE):
+            d.append((v, helper[e_prev]))
+        t.delete(e_prev)
+        left = t.find_left(v)
+        if(v_types[helper[left]] == MERGE):
+            d.append((v, helper[left]))
+        helper[left] = v
+
     def handle_regular_down_vertex(v):
         """
         Handle encountered regular_down vertex vertex.
 
-        :param v: examined vertex.
-        :type v: Veretx
-        """
-        nonlocal t, d, polygon
-        e_prev = polygon.previous_edge(v) 
-        if(e_prev.helper is not None and e_prev.helper.v_type == "merge"):
-            d.append(Edge(v, e_prev.helper))
-        delete(t, e_prev)
-        e = polygon.get_edge(v)
-        e.helper = v
-        insert(t, e)
-    
+        :param v: index of the examined vertex.
+        :type v: integer
+        """
+        e_prev = (v - 1)%n
+        if(helper[e_prev] >= 0 and v_types[helper[e_prev]] == MERGE):
+            d.append((v, helper[e_prev]))
+        t.delete(e_prev)
+        helper[v] = v
+        t.insert(v)
+
     def handle_regular_up_vertex(v):
         """
         Handle encountered regular_up vertex.
 
-        :param v: examined vertex.
-        :type v: Veretx
-        """
-        nonlocal left_count
-        left = find_left(t, v)
-        if(debug):
-            left_count += 1
-            if(left_count >= left_stop):
-                plot_diags(polygon.get_vertices(), [left], v, title = left_count)
-        if(left.helper.v_type == "merge"):
-            d.append(Edge(v, left.helper))
-        left.helper = v
-
-    q = create_vertices_queue(polygon.get_vertices())
+        :param v: index of the examined vertex.
+        :type v: integer
+        """
+        left = t.find_left(v)
+        if(v_types[helper[left]] == MERGE):
+            d.append((v, helper[left]))
+        helper[left] = v
+
+    import numpy as np
+    # Handlers in the order of VERTEX_TYPES
+    handlers = (handle_start_vertex, handle_split_vertex, handle_end_vertex, \
+                handle_merge_vertex, handle_regular_up_vertex, \
+                handle_regular_down_vertex)
+    MERGE = VERTEX_TYPES.index("merge")
+    v_types = classify_vertices(xs, ys)
+    helper = array("l", [-1])*n
+    # Vertices queue sorted in descending order by y coordinate, then
+    # ascending by x coordinate, popped from the end
+    q = np.lexsort((-np.frombuffer(xs, dtype = float), \
+                    np.frombuffer(ys, dtype = float))).tolist()
     d = []
-    t = SortedDict()
-    debug = False
-    left_stop = 23
-    left_count = 0
+    t = SweepStatus(polygon)
     while(q != []):
         v = q.pop()
-        v.v_type = vertex_type(v, polygon)
-        if(v.v_type == "start"):
-            handle_start_vertex(v)
-        elif(v.v_type == "end"):
-            handle_end_vertex(v)
-        elif(v.v_type == "split"):
-            handle_split_vertex(v)
-        elif(v.v_type == "merge"):
-            handle_merge_vertex(v)
-        elif(v.v_type == "regular_down"):
-            handle_regular_down_vertex(v)
-        elif(v.v_type == "regular_up"):
-            handle_regular_up_vertex(v)
-        else:
-            raise TypeError("Unknown vertex type!")
-        if(debug):
-            print(v, v.v_type)
+        t.sweep_to(v)
+        handlers[v_types[v]](v)
     return d
 
-def inner_diagonal(v1, v2, polygon):
+
+def split_polygons(polygon, diagonals):
     """
-    Check whether given line segment constitutes a inner diagonal of the polygon.
+    Split a polygon into separate shapes along given diagonals.
+    The polygon and its diagonals are treated as a doubly connected edge list:
+    diagonals incident to every vertex are sorted by angle, and the faces are
+    traced by walking each half-edge exactly once, taking the first half-edge
+    clockwise from the one arrived by.
     Source:
-    https://stackoverflow.com/questions/693837/how-to-determine-a-diagonal-is-in-or-out-of-a-concave-polygon
+    de Berg, van Kreveld, Overmars, Schwrzkopf 'Computational geometry'
+    Section 2.2
 
-    :param v1: first diagonal point.
-    :type v1: Vertex
-    :param v2: second diagonal point.
-    :type v2: Vertex
-    :param polygon: examined polygon.
-    :type polygon: Polygon
+    :param polygon: polygon to be split.
+    :type polygon: Polygon.
+    :param diagonals: non-crossing inner diagonals along which the polygon
+                      is to be split, as pairs of vertex indices.
+    :type diagonals: list of tuple
 
-    :return: True if a line segment contitutes an inner polygon diagonal,
-             False otherwise.
-    :rtype: boolean
+    :return: list of vertex index lists (indices into polygon) of the resulting
+             polygons, each one in counterclockwise order.
+    :rtype: list of list of integer
     """
-    debug = False
-    if(debug):
-        plot_diags(polygon.get_vertices(), [Edge(v1, v2)])
-    try:
-        v1_pos = polygon.vertex_index(v1)
-        v2_pos = polygon.vertex_index(v2)
-    except:
-        return False
-    if(v1_pos > v2_pos):
-        v2, v1 = v1, v2
-    if(polygon.next_vertex(v1) == v2):
-        # If v1 and v2 are consecutive they can't constitute a diagonal
-        return False
-    for vj in polygon.get_vertices():
-        # Check instersections with every edge in polygon
-        v_nex = polygon.next_vertex(vj)
-        s = intersect(v1, v2, vj, v_nex)
-        if(s is not None and s.x != v1.x and s.y != v1.y and \
-           s.x != v2.x and s.y != v2.y):
-            return False
-        if(overlapping(v1, v2, vj, v_nex)):
-            return False
-    v1_nex = polygon.next_vertex(v1)
-    v1_pre = polygon.previous_vertex(v1)
-    vec1 = Vertex(v1_nex.x - v1.x, v1_nex.y - v1.y)
-    vec2 = Vertex(v1_pre.x - v1.x, v1_pre.y -v1.y)
-    vec3 = Vertex(v2.x - v1.x, v2.y - v1.y)
-    if(not vector_between_two_other(vec1, vec2, vec3)):
-        return False
-    return True
+    n = polygon.num_of_vertices()
+    xs, ys = polygon.xs, polygon.ys
+    fan = {}
+    for i, j in diagonals:
+        fan.setdefault(i, []).append(j)
+        fan.setdefault(j, []).append(i)
+    # Outgoing half-edges of vertices incident to diagonals in counterclockwise
+    # order, starting with the boundary edge and followed by diagonals sorted
+    # by the angle they form with it. Remaining vertices have the boundary
+    # edge only.
+    outgoing = {}
+    position = {}
+    for i, targets in fan.items():
+        ax = xs[(i + 1)%n] - xs[i]
+        ay = ys[(i + 1)%n] - ys[i]
+        def half_plane(j):
+            """
+            Check on which side of the boundary edge leaving vertex i the
+            diagonal leading to vertex j lies.
 
+            :param j: diagonal end vertex index.
+            :type j: integer
 
-def split_polygons(polygon, diagolnals):
-    """
-    Split a polygon into separate shapes along given diagonals. 
-    Source
-    https://stackoverflow.com/questions/9455875/how-to-split-a-polygon-along-n-given-diagonals
+            :return: 0 if the counterclockwise angle between the edge and the
+                     diagonal is in range [0, pi), 1 otherwise.
+            :rtype: integer
+            """
+            bx = xs[j] - xs[i]
+            by = ys[j] - ys[i]
+            cross = ax*by - ay*bx
+            if(cross > 0 or (cross == 0 and ax*bx + ay*by > 0)):
+                return 0
+            return 1
+        def compare(j, k):
+            """
+            Compare the counterclockwise angles the diagonals leading to
+            vertices j and k form with the boundary edge, using exact
+            orientation tests instead of the angles themselves.
 
-    :param polygon: polygon to be split.
-    :type polygon: Polygon.
-    :param diagonals: diagonals along which the polygon is to be split.
-    :type: diagonal: list of Edge
-    """
-    vert = deepcopy(polygon.get_vertices())
-    polygons = []
-    def arc_lenght(i, j):
-        return min(max(i,j) - min(i,j), polygon.num_of_vertices() - max(i,j) + min(i,j))
-    def sorter(edge):
-        return arc_lenght(polygon.vertex_index(edge.start), polygon.vertex_index(edge.end))
-    sorted_diagonals = diagolnals[:]
-    sorted_diagonals.sort(key = sorter)
-    debug = False
-    diag_count = 0
-    diag_stop = 1
-    for diag, diag_nex in zip(sorted_diagonals[:-1], sorted_diagonals[1:]):
-        if(debug):
-            diag_count += 1
-            if(diag_count >= diag_stop):
-                plt.plot([vert[0].x], [vert[0].y], 'og')
-                plt.title(str(diag_count))
-                for i, pt in enumerate(vert):
-                    plt.plot([pt.x, vert[(i+1)%len(vert)].x], [pt.y, vert[(i+1)%len(vert)].y], c = 'b')
-                plt.plot([diag.start.x, diag.end.x], [diag.start.y, diag.end.y], c = 'r')
-                plt.show()
-        start_pos = min(vert.index(diag.start), vert.index(diag.end))
-        end_pos = max(vert.index(diag.start), vert.index(diag.end))
-        p1 = Polygon(vert[start_pos:(end_pos+1)])
-        p2 = Polygon(vert[:(start_pos+1)] + vert[(end_pos)%len(vert):])
-        next_in = ""
-        if(p1.num_of_vertices() < p2.num_of_vertices()):
-            if(inner_diagonal(diag_nex.start, diag_nex.end, p1)):
-                next_in = "p1"
-            else:
-                next_in = "p2"
-        else:
-            if(inner_diagonal(diag_nex.start, diag_nex.end, p2)):
-                next_in = "p2"
-            else:
-                next_in = "p1"
-        if(next_in == "p1"):
-            polygons.append(p2)
-            if(end_pos + 1 == len(vert)):
-                vert = vert[(start_pos):]
-            else:
-                vert = vert[(start_pos):(end_pos+1)%len(vert)]
+            :param j: first diagonal end vertex index.
+            :type j: integer
+            :param k: second diagonal end vertex index.
+            :type k: integer
+
+            :rtype: integer
+            """
+            half_j, half_k = half_plane(j), half_plane(k)
+            if(half_j != half_k):
+                return half_j - half_k
+            cross = (xs[j] - xs[i])*(ys[k] - ys[i]) - (ys[j] - ys[i])*(xs[k] - xs[i])
+            return -1 if cross > 0 else (1 if cross < 0 else 0)
+        targets.sort(key = cmp_to_key(compare))
+        outgoing[i] = [(i + 1)%n] + targets
+        position[i] = {j: k for k, j in enumerate(outgoing[i])}
+    def visit(u, v):
+        """
+        Mark a half-edge as walked.
+
+        :param u: half-edge origin vertex index.
+        :type u: integer
+        :param v: half-edge target vertex index.
+        :type v: integer
+
+        :return: True if the half-edge has been walked before, False otherwise.
+        :rtype: boolean
+        """
+        if(v == (u + 1)%n):
+            walked = boundary_visited[u]
+            boundary_visited[u] = 1
         else:
-            polygons.append(p1)
-            if(end_pos + 1 == len(vert)):
-                vert = vert[end_pos:] + vert[:(start_pos+1)]
-            else:
-                vert = vert[:(start_pos+1)] + vert[end_pos:]
-    # Last diagonal
-    try:
-        diag = sorted_diagonals[-1]
-    except IndexError:
-        # Triangle, hence the list is empty
-        polygons.append(Polygon(vert))
-    else:
-        start_pos = min(vert.index(diag.start), vert.index(diag.end))
-        end_pos = max(vert.index(diag.start), vert.index(diag.end))
-        p1 = Polygon(vert[start_pos:(end_pos+1)])
-        p2 = Polygon(vert[:(start_pos+1)] + vert[(end_pos)%len(vert):])
-        polygons.append(p1)
-        polygons.append(p2)
+            walked = (u, v) in diagonals_visited
+            diagonals_visited.add((u, v))
+        return walked
+    polygons = []
+    boundary_visited = bytearray(n)
+    diagonals_visited = set()
+    for i in range(n):
+        for j in outgoing.get(i, ((i + 1)%n,)):
+            if(visit(i, j)):
+                continue
+            face = [i]
+            u, v = i, j
+            while(True):
+                if(v in outgoing):
+                    k = position[v].get(u)
+                    if(k is None):
+                        # Arrived along the boundary edge from the previous vertex
+                        w = outgoing[v][-1]
+                    else:
+                        w = outgoing[v][k - 1]
+                else:
+                    w = (v + 1)%n
+                u, v = v, w
+                if(visit(u, v)):
+                    break
+                face.append(u)
+            polygons.append(face)
     return polygons
 
 
-def triangulate_monotone_polygon(polygon):
+def triangulate_monotone_polygon(polygon, indices = None):
     """
-    Triangulate an y-monotone polygon.
+    Triangulate an y-monotone polygon in linear time.
+    Vertices are labelled with the chain they belong to while the two chains
+    are merged into the sweep sequence, and the diagonals are tested for
+    being inner ones with a local orientation predicate.
     Source: 
     de Berg, van Kreveld, Overmars, Schwrzkopf 'Computational geometry'
     Section 3.3
 
-    :param polygon: y-monotone polygon to be triangulated.
+    :param polygon: polygon containing the y-monotone piece.
     :type polygon: Polygon
+    :param indices: vertex indices of the y-monotone piece in counterclockwise
+                    order. If none are given, the whole polygon is triangulated.
+    :type indices: list of integer
+
+    :return: list of triangles as triples of vertex indices into polygon, each
+             one in counterclockwise order.
+    :rtype: list of tuple
     """
+    xs, ys = polygon.xs, polygon.ys
+    if(indices is None):
+        indices = list(range(polygon.num_of_vertices()))
+    n = len(indices)
 
-    def same_chain(v1, v2, polygon):
+    def above(i, j):
         """
-        Check whether two vertices lie on the same polygon edges chain, observing
-        from the topmost one.
+        Check whether vertex i lies above vertex j, according to de Berg et al.
 
-        :param v1:
-        :type v1: Vertex
-        :param v2:
-        :type v2: Vertex
+        :param i: index of a vertex to be compared.
+        :type i: integer
+        :param j: index of a vertex to be compared againts.
+        :type j: integer
 
-        :return: True if given vertices lie on the same polygon edges chain,
-                 False otherwise.
+        :return: True if vertex i has greater y coordinate than vertex j or they
+                 are equal and vertex i has lesser x coordinate, False otherwise.
         :rtype: boolean
         """
-        summit = u[0]
-        bottom = u[-1]
-        v1_found = False
-        v2_found = False
-        reverse = False
-        if(v1 == v2):
-            raise Exception("Both given vertices are the same!")
-        if(v1 == summit or v2 == summit):
-            return False
-        lenght = abs(polygon.vertex_index(summit) - polygon.vertex_index(bottom))
-        if(lenght < polygon.num_of_vertices() - lenght):
-            reverse = True
-        # Walk through shorter branch
-        vj = summit
-        if(not reverse):
-            while(not vj == bottom):
-                if(vj == v1):
-                    v1_found = True
-                if(vj == v2):
-                    v2_found = True
-                vj = polygon.next_vertex(vj)
-        else:
-            while(not vj == bottom):
-                if(vj == v1):
-                    v1_found = True
-                if(vj == v2):
-                    v2_found = True
-                vj = polygon.previous_vertex(vj)
-        if(v1_found is True and v2_found is True):
-            return True
-        elif(v1_found is False and v2_found is False):
-            return True
-        return False
+        return ys[i] > ys[j] or (ys[i] == ys[j] and xs[i] < xs[j])
 
-    def create_vertices_sequence(polygon):
+    def orient(i, j, k):
         """
-        Create vertices sequence sorted in descending order by y coordinate, then
-        ascending by x coordinate.
+        Calculate the orientation of an ordered triple of vertices (see
+        orientation()).
 
-        :param polygon: polygon from which vertices the sequence is to be created.
-        :type polygn: Polygon
+        :param i: first vertex index.
+        :type i: integer
+        :param j: second vertex index.
+        :type j: integer
+        :param k: third vertex index.
+        :type k: integer
 
-        :return: vertices sequence.
-        :rtype: list of Vertex
+        :rtype: float
         """
-        vert = polygon[:]
-        vert.sort(key = lambda pt: (pt.y, -pt.x))
-        vert.reverse()
-        return vert
+        return (xs[j] - xs[i])*(ys[k] - ys[i]) - (ys[j] - ys[i])*(xs[k] - xs[i])
 
-    debug = False
-    u = create_vertices_sequence(polygon.get_vertices())
-    s = [u[0], u[1]]
-    d = []
-    for j in range(2, polygon.num_of_vertices() - 1):
-        if(debug):
-            plot_diags(polygon.get_vertices(), d, u[j], s[-1])
-        if(not same_chain(u[j], s[-1], polygon)):
-            while(s != []):
+    def add_triangle(i, j, k):
+        """
+        Append a triangle to the result list in counterclockwise order.
+
+        :param i: first vertex index.
+        :type i: integer
+        :param j: second vertex index.
+        :type j: integer
+        :param k: third vertex index.
+        :type k: integer
+        """
+        if(orient(i, j, k) < 0):
+            j, k = k, j
+        triangles.append((i, j, k))
+
+    def inner(j, last, top):
+        """
+        Check whether the diagonal between the current vertex and the vertex on
+        top of the stack lies inside the polygon, ie. whether the last popped
+        vertex is convex.
+
+        :param j: sequence position of the current vertex.
+        :type j: integer
+        :param last: sequence position of the last popped vertex.
+        :type last: integer
+        :param top: sequence position of the vertex on top of the stack.
+        :type top: integer
+
+        :rtype: boolean
+        """
+        turn = orient(u[j], u[last], u[top])
+        if(on_left[j]):
+            return turn < 0
+        else:
+            return turn > 0
+
+    top = 0
+    bottom = 0
+    for k in range(1, n):
+        if(above(indices[k], indices[top])):
+            top = k
+        if(above(indices[bottom], indices[k])):
+            bottom = k
+    # Counterclockwise walk from the top vertex descends along the left chain
+    left = []
+    k = (top + 1)%n
+    while(k != bottom):
+        left.append(indices[k])
+        k = (k + 1)%n
+    right = []
+    k = (bottom + 1)%n
+    while(k != top):
+        right.append(indices[k])
+        k = (k + 1)%n
+    right.reverse()
+    # Merge both chains into a single sequence sorted from the top
+    u = [indices[top]]
+    on_left = [False]
+    a = 0
+    b = 0
+    while(a < len(left) or b < len(right)):
+        if(b == len(right) or (a < len(left) and above(left[a], right[b]))):
+            u.append(left[a])
+            on_left.append(True)
+            a += 1
+        else:
+            u.append(right[b])
+            on_left.append(False)
+            b += 1
+    u.append(indices[bottom])
+    on_left.append(False)
+    triangles = []
+    s = [0, 1]
+    for j in range(2, n - 1):
+        if(on_left[j] != on_left[s[-1]]):
+            while(len(s) > 1):
                 last = s.pop()
-                if(len(s) >= 1):
-                    d.append(Edge(u[j], last))
-            s = [u[j-1], u[j]]
+                add_triangle(u[j], u[last], u[s[-1]])
+            s = [j - 1, j]
         else:
             last = s.pop()
-            while(len(s) > 0 and inner_diagonal(u[j], s[-1], polygon)):
-                d.append(Edge(u[j], s[-1]))
-                if(debug):
-                    plot_diags(polygon.get_vertices(), d)
+            while(len(s) > 0 and inner(j, last, s[-1])):
+                add_triangle(u[j], u[last], u[s[-1]])
                 last = s.pop()
             s.append(last)
-            s.append(u[j])
-    s.pop()
-    while(len(s) > 1):
+            s.append(j)
+    last = s.pop()
+    while(len(s) > 0):
+        add_triangle(u[-1], u[last], u[s[-1]])
         last = s.pop()
-        d.append(Edge(u[-1], last))
-    if(debug):
-        plot_diags(polygon.get_vertices(), d, u[-1])
-    return d
+    return triangles
+
+
+def triangulate_polygon(points):
+    """
+    Triangulate a simple polygon by dividing it into y-monotone pieces and
+    triangulating each one of them.
+
+    :param points: polygon vertices, in either orientation.
+    :type points: list of Vertex
+
+    :return: list of triangles as triples of indices into points.
+    :rtype: list of tuple
+    """
+    polygon = Polygon(points)
+    triangles = []
+    for piece in split_polygons(polygon, make_monotone(polygon)):
+        for triangle in triangulate_monotone_polygon(polygon, piece):
+            triangles.append(tuple(polygon.original_index(i) for i in triangle))
+    return triangles
+
+
+class TriangulationEngine(ABC):
+    """
+    An abstract base class for polygon triangulation backends. Subclasses
+    have to define the engine name and implement the triangulate() method.
+    """
+    name = None     #: name identifying the engine in the settings.
+
+    @abstractmethod
+    def triangulate(self, points):
+        """
+        Divide a simple polygon into triangles.
+
+        :param points: polygon vertices, in either orientation.
+        :type points: list of Vertex
+
+        :return: list of triangles as triples of indices into points.
+        :rtype: list of tuple
+        """
+        pass
+
+
+class MonotoneEngine(TriangulationEngine):
+    """
+    Class represents an engine dividing a polygon into y-monotone pieces and
+    triangulating each one of them in linear time. Runs in O(n log n) time.
+    """
+    name = "monotone"
+
+    def triangulate(self, points):
+        """
+        Divide a simple polygon into triangles (see triangulate_polygon()).
+
+        :param points: polygon vertices, in either orientation.
+        :type points: list of Vertex
+
+        :return: list of triangles as triples of indices into points.
+        :rtype: list of tuple
+        """
+        return triangulate_polygon(points)
+
+
+class _EarNode(object):
+    """
+    Class represents a vertex of the polygon being ear clipped, linked both
+    along the polygon boundary and along the z-order curve.
+
+    :param i: index of the vertex in the input list.
+    :type i: integer
+    :param x: vertex x coordinate.
+    :type x: float
+    :param y: vertex y coordinate.
+    :type y: float
+    """
+    __slots__ = ("i", "x", "y", "prev", "next", "z", "prev_z", "next_z")
+
+    def __init__(self, i, x, y):
+        """
+        Initialise object variables.
+        """
+        self.i = i
+        self.x = x
+        self.y = y
+        self.prev = None
+        self.next = None
+        self.z = 0
+        self.prev_z = None
+        self.next_z = None
+
+
+class EarClippingEngine(TriangulationEngine):
+    """
+    Class represents an engine repeatedly clipping ears off the polygon. When
+    the polygon has many vertices, they are hashed along a z-order curve, so
+    that only the vertices lying within an ear's bounding box are tested
+    against it. Collinear and duplicated vertices are dropped, hence a polygon
+    with n vertices might yield less than n - 2 triangles.
+
+    :param hash_threshold: minimal number of vertices for which the z-order
+                           hashing is employed.
+    :type hash_threshold: integer
+    """
+    name = "earclipping"
+
+    def __init__(self, hash_threshold = 32):
+        """
+        Initialise object variables.
+        """
+        self.hash_threshold = hash_threshold
+
+    def triangulate(self, points):
+        """
+        Divide a simple polygon into triangles.
+
+        :param points: polygon vertices, in either orientation.
+        :type points: list of Vertex
+
+        :return: list of triangles as triples of indices into points.
+        :rtype: list of tuple
+        """
+        n = len(points)
+        if(n < 3):
+            return []
+        doubled_area = 0.0
+        for i in range(n):
+            p1, p2 = points[i - 1], points[i]
+            doubled_area += (p1.x - p2.x)*(p1.y + p2.y)
+        # Link the vertices counterclockwise
+        indices = range(n) if doubled_area > 0 else range(n - 1, -1, -1)
+        last = None
+        for i in indices:
+            node = _EarNode(i, points[i].x, points[i].y)
+            if(last is None):
+                node.prev = node
+                node.next = node
+            else:
+                node.next = last.next
+                node.prev = last
+                last.next.prev = node
+                last.next = node
+            last = node
+        self._triangles = []
+        self._inv_size = 0
+        if(n > self.hash_threshold):
+            self._min_x = min(pt.x for pt in points)
+            self._min_y = min(pt.y for pt in points)
+            size = max(max(pt.x for pt in points) - self._min_x, \
+                       max(pt.y for pt in points) - self._min_y)
+            self._inv_size = 32767/size if size else 0
+        self._clip_ears(last, 0)
+        triangles, self._triangles = self._triangles, None
+        return triangles
+
+    def _clip_ears(self, ear, pass_num):
+        """
+        Clip ears off the polygon. If no ear can be found, retry after removing
+        degenerate vertices (pass 1), curing local self-intersections (pass 2)
+        and finally splitting the polygon in two along a valid diagonal.
+
+        :param ear: any node of the polygon.
+        :type ear: _EarNode
+        :param pass_num: number of the pass.
+        :type pass_num: integer
+        """
+        if(ear is None):
+            return
+        if(self._inv_size and not pass_num):
+            self._index_curve(ear)
+        is_ear = self._is_ear_hashed if self._inv_size else self._is_ear
+        stop = ear
+        while(ear.prev is not ear.next):
+            prev, nxt = ear.prev, ear.next
+            if(is_ear(ear)):
+                self._triangles.append((prev.i, ear.i, nxt.i))
+                self._remove_node(ear)
+                # Skipping the next vertex leads to less sliver triangles
+                ear = nxt.next
+                stop = nxt.next
+                continue
+            ear = nxt
+            if(ear is stop):
+                if(pass_num == 0):
+                    self._clip_ears(self._filter_points(ear), 1)
+                elif(pass_num == 1):
+                    ear = self._cure_local_intersections(self._filter_points(ear))
+                    self._clip_ears(ear, 2)
+                else:
+                    self._split(ear)
+                break
+
+    def _is_ear(self, ear):
+        """
+        Check if no vertex lies within an ear candidate.
+
+        :param ear: tip of the candidate.
+        :type ear: _EarNode
+
+        :rtype: boolean
+        """
+        a, b, c = ear.prev, ear, ear.next
+        if(orientation(a, b, c) <= 0):
+            return False
+        p = c.next
+        while(p is not a):
+            if(self._blocks(a, b, c, p)):
+                return False
+            p = p.next
+        return True
+
+    def _is_ear_hashed(self, ear):
+        """
+        Check if no vertex lies within an ear candidate, examining only the
+        vertices whose z-order codes fall into the range spanned by the
+        candidate's bounding box.
+
+        :param ear: tip of the candidate.
+        :type ear: _EarNode
+
+        :rtype: boolean
+        """
+        a, b, c = ear.prev, ear, ear.next
+        if(orientation(a, b, c) <= 0):
+            return False
+        min_z = self._z_order(min(a.x, b.x, c.x), min(a.y, b.y, c.y))
+        max_z = self._z_order(max(a.x, b.x, c.x), max(a.y, b.y, c.y))
+        p = ear.prev_z
+        n = ear.next_z
+        while(p is not None and p.z >= min_z):
+            if(p is not a and p is not c and self._blocks(a, b, c, p)):
+                return False
+            p = p.prev_z
+        while(n is not None and n.z <= max_z):
+            if(n is not a and n is not c and self._blocks(a, b, c, n)):
+                return False
+            n = n.next_z
+        return True
+
+    @staticmethod
+    def _blocks(a, b, c, p):
+        """
+        Check if a reflex or flat vertex lies within or on the boundary of a
+        counterclockwise triangle, which prevents clipping it.
+
+        :param a: first triangle vertex.
+        :type a: _EarNode
+        :param b: second triangle vertex.
+        :type b: _EarNode
+        :param c: third triangle vertex.
+        :type c: _EarNode
+        :param p: examined vertex.
+        :type p: _EarNode
+
+        :rtype: boolean
+        """
+        if(p.x == a.x and p.y == a.y):
+            return False
+        return orientation(a, b, p) >= 0 and orientation(b, c, p) >= 0 and \
+               orientation(c, a, p) >= 0 and orientation(p.prev, p, p.next) <= 0
+
+    def _z_order(self, x, y):
+        """
+        Calculate the z-order curve code of a point.
+
+        :param x: point x coordinate.
+        :type x: float
+        :param y: point y coordinate.
+        :type y: float
+
+        :rtype: integer
+        """
+        x = int((x - self._min_x)*self._inv_size)
+        y = int((y - self._min_y)*self._inv_size)
+        x = (x | (x << 8)) & 0x00FF00FF
+        x = (x | (x << 4)) & 0x0F0F0F0F
+        x = (x | (x << 2)) & 0x33333333
+        x = (x | (x << 1)) & 0x55555555
+        y = (y | (y << 8)) & 0x00FF00FF
+        y = (y | (y << 4)) & 0x0F0F0F0F
+        y = (y | (y << 2)) & 0x33333333
+        y = (y | (y << 1)) & 0x55555555
+        return x | (y << 1)
+
+    def _index_curve(self, start):
+        """
+        Link the polygon nodes in the z-order.
+
+        :param start: any node of the polygon.
+        :type start: _EarNode
+        """
+        nodes = []
+        p = start
+        while(True):
+            p.z = self._z_order(p.x, p.y)
+            nodes.append(p)
+            p = p.next
+            if(p is start):
+                break
+        nodes.sort(key = lambda node: node.z)
+        previous = None
+        for node in nodes:
+            node.prev_z = previous
+            if(previous is not None):
+                previous.next_z = node
+            previous = node
+        previous.next_z = None
+
+    @staticmethod
+    def _remove_node(p):
+        """
+        Unlink a node from both the boundary and the z-order lists.
+
+        :param p: removed node.
+        :type p: _EarNode
+        """
+        p.next.prev = p.prev
+        p.prev.next = p.next
+        if(p.prev_z is not None):
+            p.prev_z.next_z = p.next_z
+        if(p.next_z is not None):
+            p.next_z.prev_z = p.prev_z
+
+    def _filter_points(self, start, end = None):
+        """
+        Remove duplicated and collinear vertices.
+
+        :param start: first examined node.
+        :type start: _EarNode
+        :param end: last examined node, defaults to start.
+        :type end: _EarNode
+
+        :return: a node remaining in the polygon.
+        :rtype: _EarNode
+        """
+        if(start is None):
+            return start
+        if(end is None):
+            end = start
+        p = start
+        while(True):
+            again = False
+            if((p.x == p.next.x and p.y == p.next.y) or \
+               orientation(p.prev, p, p.next) == 0):
+                self._remove_node(p)
+                p = end = p.prev
+                if(p is p.next):
+                    break
+                again = True
+            else:
+                p = p.next
+            if(not again and p is end):
+                break
+        return end
+
+    def _cure_local_intersections(self, start):
+        """
+        Clip triangles off the places where two consecutive edges intersect.
+
+        :param start: any node of the polygon.
+        :type start: _EarNode
+
+        :return: a node remaining in the polygon.
+        :rtype: _EarNode
+        """
+        p = start
+        while(True):
+            a, b = p.prev, p.next.next
+            if(not (a.x == b.x and a.y == b.y) and \
+               self._intersects(a, p, p.next, b) and \
+               self._locally_inside(a, b) and self._locally_inside(b, a)):
+                self._triangles.append((a.i, p.i, b.i))
+                self._remove_node(p)
+                self._remove_node(p.next)
+                p = start = b
+            p = p.next
+            if(p is start):
+                break
+        return self._filter_points(p)
+
+    def _split(self, start):
+        """
+        Split the polygon along a valid diagonal and triangulate both parts
+        separately.
+
+        :param start: any node of the polygon.
+        :type start: _EarNode
+        """
+        a = start
+        while(True):
+            b = a.next.next
+            while(b is not a.prev):
+                if(a.i != b.i and self._is_valid_diagonal(a, b)):
+                    c = self._split_polygon(a, b)
+                    a = self._filter_points(a, a.next)
+                    c = self._filter_points(c, c.next)
+                    self._clip_ears(a, 0)
+                    self._clip_ears(c, 0)
+                    return
+                b = b.next
+            a = a.next
+            if(a is start):
+                break
+
+    @staticmethod
+    def _split_polygon(a, b):
+        """
+        Link two nodes with a diagonal, duplicating them, so that the polygon
+        falls apart into two loops.
+
+        :param a: first diagonal endpoint.
+        :type a: _EarNode
+        :param b: second diagonal endpoint.
+        :type b: _EarNode
+
+        :return: duplicate of b belonging to the loop which does not contain a.
+        :rtype: _EarNode
+        """
+        a2 = _EarNode(a.i, a.x, a.y)
+        b2 = _EarNode(b.i, b.x, b.y)
+        an, bp = a.next, b.prev
+        a.next = b
+        b.prev = a
+        a2.next = an
+        an.prev = a2
+        b2.next = a2
+        a2.prev = b2
+        bp.next = b2
+        b2.prev = bp
+        return b2
+
+    def _is_valid_diagonal(self, a, b):
+        """
+        Check if a diagonal lies inside the polygon and intersects none of
+        its edges.
+
+        :param a: first diagonal endpoint.
+        :type a: _EarNode
+        :param b: second diagonal endpoint.
+        :type b: _EarNode
+
+        :rtype: boolean
+        """
+        if(a.next.i == b.i or a.prev.i == b.i or self._intersects_polygon(a, b)):
+            return False
+        if(self._locally_inside(a, b) and self._locally_inside(b, a) and \
+           self._middle_inside(a, b)):
+            # Sectors facing opposite directions are not allowed
+            return orientation(a.prev, a, b.prev) != 0 or \
+                   orientation(a, b.prev, b) != 0
+        return a.x == b.x and a.y == b.y and \
+               orientation(a.prev, a, a.next) < 0 and \
+               orientation(b.prev, b, b.next) < 0
+
+    @staticmethod
+    def _intersects(p1, q1, p2, q2):
+        """
+        Check if two line segments intersect or touch.
+
+        :param p1: first endpoint of the first segment.
+        :type p1: _EarNode
+        :param q1: second endpoint of the first segment.
+        :type q1: _EarNode
+        :param p2: first endpoint of the second segment.
+        :type p2: _EarNode
+        :param q2: second endpoint of the second segment.
+        :type q2: _EarNode
+
+        :rtype: boolean
+        """
+        def sign(value):
+            """
+            Get a sign of a number.
+
+            :param value: examined number.
+            :type value: float
+
+            :rtype: integer
+            """
+            return (value > 0) - (value < 0)
+        def on_segment(p, q, r):
+            """
+            Check if a point collinear with a segment lies within its
+            bounding box.
+
+            :param p: first segment endpoint.
+            :type p: _EarNode
+            :param q: examined point.
+            :type q: _EarNode
+            :param r: second segment endpoint.
+            :type r: _EarNode
+
+            :rtype: boolean
+            """
+            return min(p.x, r.x) <= q.x <= max(p.x, r.x) and \
+                   min(p.y, r.y) <= q.y <= max(p.y, r.y)
+        o1 = sign(orientation(p1, q1, p2))
+        o2 = sign(orientation(p1, q1, q2))
+        o3 = sign(orientation(p2, q2, p1))
+        o4 = sign(orientation(p2, q2, q1))
+        if(o1 != o2 and o3 != o4):
+            return True
+        return (o1 == 0 and on_segment(p1, p2, q1)) or \
+               (o2 == 0 and on_segment(p1, q2, q1)) or \
+               (o3 == 0 and on_segment(p2, p1, q2)) or \
+               (o4 == 0 and on_segment(p2, q1, q2))
+
+    def _intersects_polygon(self, a, b):
+        """
+        Check if a diagonal intersects any polygon edge not incident to it.
+
+        :param a: first diagonal endpoint.
+        :type a: _EarNode
+        :param b: second diagonal endpoint.
+        :type b: _EarNode
+
+        :rtype: boolean
+        """
+        p = a
+        while(True):
+            if(p.i != a.i and p.next.i != a.i and p.i != b.i and \
+               p.next.i != b.i and self._intersects(p, p.next, a, b)):
+                return True
+            p = p.next
+            if(p is a):
+                return False
+
+    @staticmethod
+    def _locally_inside(a, b):
+        """
+        Check if a diagonal leaves a vertex towards the polygon interior.
+
+        :param a: vertex the diagonal leaves.
+        :type a: _EarNode
+        :param b: second diagonal endpoint.
+        :type b: _EarNode
+
+        :rtype: boolean
+        """
+        if(orientation(a.prev, a, a.next) > 0):
+            return orientation(a, b, a.next) <= 0 and orientation(a, a.prev, b) <= 0
+        return orientation(a, b, a.prev) > 0 or orientation(a, a.next, b) > 0
+
+    @staticmethod
+    def _middle_inside(a, b):
+        """
+        Check if the middle point of a diagonal lies inside the polygon.
+
+        :param a: first diagonal endpoint.
+        :type a: _EarNode
+        :param b: second diagonal endpoint.
+        :type b: _EarNode
+
+        :rtype: boolean
+        """
+        p = a
+        inside = False
+        px, py = (a.x + b.x)/2, (a.y + b.y)/2
+        while(True):
+            if((p.y > py) != (p.next.y > py) and p.next.y != p.y and \
+               px < (p.next.x - p.x)*(py - p.y)/(p.next.y - p.y) + p.x):
+                inside = not inside
+            p = p.next
+            if(p is a):
+                return inside
+
+
+ENGINES = {engine.name: engine for engine in (MonotoneEngine(), EarClippingEngine())}   #: available triangulation engines.
+
+
+def is_convex(points):
+    """
+    Check in linear time whether a polygon is strictly convex: all its turns
+    have the same orientation and its boundary winds around it once, ie. the
+    direction of the x coordinate changes at most twice.
+
+    :param points: polygon vertices, in either orientation.
+    :type points: list of Vertex
+
+    :rtype: boolean
+    """
+    n = len(points)
+    if(n < 3):
+        return False
+    sign = 0
+    x_changes = 0
+    last_dx = 0
+    for i in range(n):
+        a, b, c = points[i - 1], points[i], points[(i + 1)%n]
+        turn = (b.x - a.x)*(c.y - b.y) - (b.y - a.y)*(c.x - b.x)
+        if(turn == 0 or (sign != 0 and (turn > 0) != (sign > 0))):
+            return False
+        sign = turn
+        dx = c.x - b.x
+        if(dx != 0):
+            if(last_dx != 0 and (dx > 0) != (last_dx > 0)):
+                x_changes += 1
+            last_dx = dx
+    # The last change wraps around the first edge
+    first_dx = next((points[(i + 1)%n].x - points[i].x for i in range(n) \
+                     if points[(i + 1)%n].x != points[i].x), 0)
+    if(first_dx != 0 and (first_dx > 0) != (last_dx > 0)):
+        x_changes += 1
+    return x_changes <= 2
+
+
+def convex_fan(points):
+    """
+    Triangulate a strictly convex polygon as a fan of triangles sharing its
+    first vertex. Triangles are counterclockwise, like the ones returned by
+    the engines.
+
+    :param points: polygon vertices, in either orientation.
+    :type points: list of Vertex
+
+    :return: list of triangles as triples of indices into points, None if the
+             polygon is not strictly convex.
+    :rtype: list of tuple
+    """
+    if(not is_convex(points)):
+        return None
+    if(orientation(points[0], points[1], points[2]) < 0):
+        return [(0, i + 1, i) for i in range(1, len(points) - 1)]
+    return [(0, i, i + 1) for i in range(1, len(points) - 1)]
+
+
+def select_engine(num_of_vertices, name = "auto", ear_clipping_max_vertices = 256):
+    """
+    Choose a triangulation engine.
+
+    :param num_of_vertices: number of the polygon vertices.
+    :type num_of_vertices: integer
+    :param name: name of the engine to be used, or 'auto' to choose one by the
+                 number of vertices.
+    :type name: string
+    :param ear_clipping_max_vertices: maximal number of vertices for which
+                                      ear clipping is chosen in the 'auto' mode.
+    :type ear_clipping_max_vertices: integer
+
+    :return: triangulation engine.
+    :rtype: TriangulationEngine
+    """
+    if(name == "auto"):
+        if(num_of_vertices <= ear_clipping_max_vertices):
+            name = EarClippingEngine.name
+        else:
+            name = MonotoneEngine.name
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError("Unknown triangulation engine: " + str(name))
+
+
+def to_grid(points, dx, dy):
+    """
+    Express polygon vertices in integer multiples of the grid steps, so the
+    orientation tests performed by the engines are exact. Triangulations
+    refer to vertices by indices, hence they apply to the original points as
+    well.
+
+    :param points: polygon vertices.
+    :type points: list of Vertex
+    :param dx: grid step in the x direction.
+    :type dx: float
+    :param dy: grid step in the y direction.
+    :type dy: float
+
+    :return: vertices with integer coordinates, or None if any vertex does not
+             lie on a grid node.
+    :rtype: list of Vertex
+    """
+    grid_points = []
+    for pt in points:
+        i = round(pt.x/dx)
+        j = round(pt.y/dy)
+        if(abs(pt.x - i*dx) > 1e-6*dx or abs(pt.y - j*dy) > 1e-6*dy):
+            return None
+        grid_points.append(Vertex(i, j))
+    return grid_points
+
+
+def partition_rectilinear(points, max_cells = None):
+    """
+    Divide a simple rectilinear polygon into a minimal number of rectangles.
+    The polygon is laid over a grid built from its distinct vertex
+    coordinates. Chords joining pairs of reflex vertices are drawn, choosing
+    the maximal set of non-intersecting ones as the complement of a minimum
+    vertex cover of the chords intersection graph, and the remaining reflex
+    vertices are resolved with vertical cuts.
+
+    :param points: polygon vertices, in either orientation.
+    :type points: list of Vertex
+    :param max_cells: maximal number of grid cells, None for no limit.
+    :type max_cells: integer
+
+    :return: rectangles as (x_min, y_min, x_max, y_max) tuples, None if the
+             polygon is not rectilinear or the grid would be too large.
+    :rtype: list of tuple
+    """
+    n = len(points)
+    if(n < 4):
+        return None
+    for i in range(n):
+        p1, p2 = points[i - 1], points[i]
+        if(p1.x != p2.x and p1.y != p2.y):
+            return None
+    xs = sorted(set(pt.x for pt in points))
+    ys = sorted(set(pt.y for pt in points))
+    nx, ny = len(xs) - 1, len(ys) - 1
+    if(max_cells is not None and nx*ny > max_cells):
+        return None
+    x_index = {x: i for i, x in enumerate(xs)}
+    y_index = {y: j for j, y in enumerate(ys)}
+    grid = [(x_index[pt.x], y_index[pt.y]) for pt in points]
+    # Mark the interior cells by toggling columns crossed by horizontal edges
+    inside = [bytearray(nx) for _ in range(ny)]
+    for k in range(n):
+        (i1, j1), (i2, j2) = grid[k - 1], grid[k]
+        if(j1 == j2 and j1 < ny):
+            row = inside[j1]
+            for i in range(min(i1, i2), max(i1, i2)):
+                row[i] ^= 1
+    for j in range(1, ny):
+        row, below = inside[j], inside[j - 1]
+        for i in range(nx):
+            row[i] ^= below[i]
+    def interior(i, j):
+        """
+        Check if a grid cell lies inside the polygon.
+
+        :param i: cell column.
+        :type i: integer
+        :param j: cell row.
+        :type j: integer
+
+        :rtype: boolean
+        """
+        return 0 <= i < nx and 0 <= j < ny and inside[j][i] == 1
+    # Reflex vertices have three interior cells around, the remaining one
+    # tells the direction of the vertical cut
+    reflex = {}
+    for i, j in grid:
+        around = [(di, dj) for di in (-1, 0) for dj in (-1, 0) \
+                  if not interior(i + di, j + dj)]
+        if(len(around) == 1):
+            reflex[(i, j)] = 1 if around[0][1] == -1 else -1
+    # Chords join consecutive reflex vertices lying on a common grid line
+    # and run through the interior
+    def chords(horizontal):
+        """
+        Find chords along one of the axes.
+
+        :param horizontal: toggle looking for horizontal chords.
+        :type horizontal: boolean
+
+        :return: chords as (line, start, end) tuples.
+        :rtype: list of tuple
+        """
+        lines = {}
+        for i, j in reflex:
+            if(horizontal):
+                lines.setdefault(j, []).append(i)
+            else:
+                lines.setdefault(i, []).append(j)
+        found = []
+        for line, positions in sorted(lines.items()):
+            positions.sort()
+            for a, b in zip(positions, positions[1:]):
+                if(horizontal):
+                    inner = all(interior(k, line - 1) and interior(k, line) \
+                                for k in range(a, b))
+                else:
+                    inner = all(interior(line - 1, k) and interior(line, k) \
+                                for k in range(a, b))
+                if(inner):
+                    found.append((line, a, b))
+        return found
+    h_chords = chords(True)
+    v_chords = chords(False)
+    adjacent = [[v for v, (i, c, d) in enumerate(v_chords) \
+                 if a <= i <= b and c <= j <= d] for j, a, b in h_chords]
+    # Maximum bipartite matching with alternating breadth first searches
+    match_h = [None]*len(h_chords)
+    match_v = [None]*len(v_chords)
+    for root in range(len(h_chords)):
+        parent = {}
+        queue = [root]
+        free = None
+        for h in queue:
+            for v in adjacent[h]:
+                if(v in parent):
+                    continue
+                parent[v] = h
+                if(match_v[v] is None):
+                    free = v
+                    break
+                queue.append(match_v[v])
+            if(free is not None):
+                break
+        while(free is not None):
+            h = parent[free]
+            match_v[free], match_h[h], free = h, free, match_h[h]
+    # Koenig's theorem: vertices reached by alternating paths from unmatched
+    # horizontal chords determine the maximal independent set
+    reached_h = set(h for h in range(len(h_chords)) if match_h[h] is None)
+    reached_v = set()
+    queue = list(reached_h)
+    for h in queue:
+        for v in adjacent[h]:
+            if(v not in reached_v):
+                reached_v.add(v)
+                if(match_v[v] is not None and match_v[v] not in reached_h):
+                    reached_h.add(match_v[v])
+                    queue.append(match_v[v])
+    h_cuts = set()
+    v_cuts = set()
+    resolved = set()
+    for h in sorted(reached_h):
+        j, a, b = h_chords[h]
+        h_cuts.update((k, j) for k in range(a, b))
+        resolved.update(((a, j), (b, j)))
+    for v in range(len(v_chords)):
+        if(v not in reached_v):
+            i, c, d = v_chords[v]
+            v_cuts.update((i, k) for k in range(c, d))
+            resolved.update(((i, c), (i, d)))
+    # Cut the remaining reflex vertices vertically until the boundary or
+    # another cut is reached
+    for (i, j), step in sorted(reflex.items()):
+        if((i, j) in resolved):
+            continue
+        k = j
+        while(True):
+            segment = (i, k) if step > 0 else (i, k - 1)
+            if(segment in v_cuts):
+                break
+            v_cuts.add(segment)
+            k += step
+            if((i - 1, k) in h_cuts or (i, k) in h_cuts or \
+               not (interior(i - 1, k - 1) and interior(i, k - 1) and \
+                    interior(i - 1, k) and interior(i, k))):
+                break
+    # Collect the pieces, each of which has to be a rectangle
+    rectangles = []
+    visited = [bytearray(nx) for _ in range(ny)]
+    for j0 in range(ny):
+        for i0 in range(nx):
+            if(not inside[j0][i0] or visited[j0][i0]):
+                continue
+            visited[j0][i0] = 1
+            cells = [(i0, j0)]
+            for i, j in cells:
+                for ni, nj, cut in ((i + 1, j, (i + 1, j) in v_cuts), \
+                                    (i - 1, j, (i, j) in v_cuts), \
+                                    (i, j + 1, (i, j + 1) in h_cuts), \
+                                    (i, j - 1, (i, j) in h_cuts)):
+                    if(not cut and interior(ni, nj) and not visited[nj][ni]):
+                        visited[nj][ni] = 1
+                        cells.append((ni, nj))
+            i_min = min(i for i, j in cells)
+            i_max = max(i for i, j in cells)
+            j_min = min(j for i, j in cells)
+            j_max = max(j for i, j in cells)
+            if((i_max - i_min + 1)*(j_max - j_min + 1) != len(cells)):
+                return None
+            rectangles.append((xs[i_min], ys[j_min], xs[i_max + 1], ys[j_max + 1]))
+    return rectangles
+
+
+def _edges_conflict(points, a, b, c, d):
+    """
+    Check whether two polygon segments given by vertex indices intersect
+    anywhere except at a shared end point. Segments sharing an end point
+    conflict if they overlap.
+
+    :param points: polygon vertices.
+    :type points: list of Vertex
+    :param a: first segment start index.
+    :type a: integer
+    :param b: first segment end index.
+    :type b: integer
+    :param c: second segment start index.
+    :type c: integer
+    :param d: second segment end index.
+    :type d: integer
+
+    :rtype: boolean
+    """
+    def on_segment(p, q, r):
+        """
+        Check whether a point collinear with a segment lies on it.
+
+        :param p: segment start.
+        :type p: Vertex
+        :param q: segment end.
+        :type q: Vertex
+        :param r: examined point.
+        :type r: Vertex
+
+        :rtype: boolean
+        """
+        return min(p.x, q.x) <= r.x <= max(p.x, q.x) and \
+               min(p.y, q.y) <= r.y <= max(p.y, q.y)
+    shared = {a, b} & {c, d}
+    if(len(shared) == 2):
+        return False
+    pa, pb, pc, pd = points[a], points[b], points[c], points[d]
+    if(shared):
+        k = shared.pop()
+        p = b if a == k else a
+        q = d if c == k else c
+        pk, pp, pq = points[k], points[p], points[q]
+        return orientation(pk, pp, pq) == 0 and \
+               (pp.x - pk.x)*(pq.x - pk.x) + (pp.y - pk.y)*(pq.y - pk.y) > 0
+    if(max(pa.x, pb.x) < min(pc.x, pd.x) or max(pc.x, pd.x) < min(pa.x, pb.x) or \
+       max(pa.y, pb.y) < min(pc.y, pd.y) or max(pc.y, pd.y) < min(pa.y, pb.y)):
+        return False
+    o1 = orientation(pa, pb, pc)
+    o2 = orientation(pa, pb, pd)
+    o3 = orientation(pc, pd, pa)
+    o4 = orientation(pc, pd, pb)
+    if(((o1 > 0 and o2 < 0) or (o1 < 0 and o2 > 0)) and \
+       ((o3 > 0 and o4 < 0) or (o3 < 0 and o4 > 0))):
+        return True
+    return (o1 == 0 and on_segment(pa, pb, pc)) or \
+           (o2 == 0 and on_segment(pa, pb, pd)) or \
+           (o3 == 0 and on_segment(pc, pd, pa)) or \
+           (o4 == 0 and on_segment(pc, pd, pb))
+
+
+def repair_triangulation(points, triangles, vertex, edit, engine_name = "auto", \
+                         ear_clipping_max_vertices = 256):
+    """
+    Update a polygon triangulation after a single vertex has been moved,
+    inserted or removed. Only the triangles incident to the vertex (the
+    triangle incident to the split edge for an insertion) are removed and the
+    hole they leave is triangulated again. The repair is refused if the new
+    edges intersect the outline or the hole boundary, ie. if the edit changes
+    the topology of the polygon, and a full rebuild is needed.
+
+    :param points: polygon vertices after the edit.
+    :type points: list of Vertex
+    :param triangles: triangulation of the polygon before the edit as triples
+                      of vertex indices.
+    :type triangles: list of tuple
+    :param vertex: index of the edited vertex; for an insertion the index of
+                   the new vertex, for a removal the index the vertex had.
+    :type vertex: integer
+    :param edit: 'move', 'insert' or 'remove'.
+    :type edit: string
+    :param engine_name: engine used to triangulate the hole (see
+                        select_engine()).
+    :type engine_name: string
+    :param ear_clipping_max_vertices: see select_engine().
+    :type ear_clipping_max_vertices: integer
+
+    :return: triangulation of the polygon after the edit, or None if it has
+             to be rebuilt from scratch.
+    :rtype: list of tuple
+    """
+    n = len(points)
+    if(n < 3):
+        return None
+    if(edit == "move"):
+        n_old = n
+        remap = lambda k: k
+    elif(edit == "insert"):
+        n_old = n - 1
+        remap = lambda k: k + 1 if k >= vertex else k
+    elif(edit == "remove"):
+        n_old = n + 1
+        remap = lambda k: k - 1 if k > vertex else k
+    else:
+        raise ValueError("Unknown edit: " + str(edit))
+    if(len(triangles) != n_old - 2):
+        return None
+    if(edit == "insert"):
+        # Triangle incident to the split edge becomes a quadrilateral
+        i, j = vertex - 1, vertex%n_old
+        removed = [t for t, tr in enumerate(triangles) if i in tr and j in tr]
+        if(len(removed) != 1):
+            return None
+        apex = [k for k in triangles[removed[0]] if k != i and k != j][0]
+        hole = [vertex - 1, vertex, (vertex + 1)%n, remap(apex)]
+        new_edges = [(vertex - 1, vertex), (vertex, (vertex + 1)%n)]
+    else:
+        # Triangles incident to the vertex form a fan, their opposite sides
+        # a chain leading from the next vertex to the previous one
+        removed = [t for t, tr in enumerate(triangles) if vertex in tr]
+        links = {}
+        for t in removed:
+            a, b = [k for k in triangles[t] if k != vertex]
+            links.setdefault(a, []).append(b)
+            links.setdefault(b, []).append(a)
+        first, last = (vertex + 1)%n_old, (vertex - 1)%n_old
+        chain = [first]
+        previous = None
+        while(chain[-1] != last and len(chain) <= len(removed)):
+            following = [k for k in links.get(chain[-1], []) if k != previous]
+            if(len(following) != 1):
+                return None
+            previous = chain[-1]
+            chain.append(following[0])
+        if(chain[-1] != last or len(chain) != len(removed) + 1):
+            return None
+        chain = [remap(k) for k in chain]
+        if(edit == "move"):
+            hole = [vertex] + chain
+            new_edges = [(chain[-1], vertex), (vertex, chain[0])]
+        else:
+            hole = chain
+            new_edges = [(chain[-1], chain[0])]
+    removed = set(removed)
+    kept = [tuple(remap(k) for k in tr) for t, tr in enumerate(triangles) \
+            if t not in removed]
+    # The hole and the triangles kept have to share the orientation of the
+    # polygon, their areas then add up without overlapping
+    area = 0
+    for k in range(n):
+        p, q = points[k], points[(k + 1)%n]
+        area += p.x*q.y - q.x*p.y
+    hole_area = 0
+    for k in range(len(hole)):
+        p, q = points[hole[k]], points[hole[(k + 1)%len(hole)]]
+        hole_area += p.x*q.y - q.x*p.y
+    if(len(hole) > 2 and (area == 0 or hole_area == 0 or (area > 0) != (hole_area > 0))):
+        return None
+    if(kept and (area == hole_area or (area > 0) != (area - hole_area > 0))):
+        return None
+    # New edges must not cross the outline nor the hole boundary
+    segments = [(k, (k + 1)%n) for k in range(n)]
+    segments += [(hole[k], hole[(k + 1)%len(hole)]) for k in range(len(hole))]
+    for a, b in new_edges:
+        for c, d in segments:
+            if(_edges_conflict(points, a, b, c, d)):
+                return None
+    if(len(hole) < 3):
+        return kept
+    engine = select_engine(len(hole), engine_name, ear_clipping_max_vertices)
+    hole_triangles = engine.triangulate([points[k] for k in hole])
+    if(len(hole_triangles) != len(hole) - 2):
+        return None
+    return kept + [tuple(hole[k] for k in tr) for tr in hole_triangles]
+
+
+class TriangulationCache(object):
+    """
+    Class represents a least recently used cache of polygon triangulations,
+    keyed by the polygon vertices coordinates and limited by the estimated
+    memory its entries occupy.
+
+    :param max_bytes: memory limit of the cache in bytes.
+    :type max_bytes: integer
+    """
+
+    def __init__(self, max_bytes = 64*1024*1024):
+        """
+        Initialise object variables.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._entries = OrderedDict()
+
+    def __contains__(self, key):
+        """
+        Check if a triangulation is cached, without affecting its recency or
+        the counters.
+
+        :param key: cache key (see TriangulationCache.key()).
+        :type key: tuple
+
+        :rtype: boolean
+        """
+        return key in self._entries
+
+    def __len__(self):
+        """
+        Get number of cached triangulations.
+
+        :rtype: integer
+        """
+        return len(self._entries)
+
+    def size(self):
+        """
+        Get estimated memory occupied by the cached entries.
+
+        :return: size in bytes.
+        :rtype: integer
+        """
+        return self._size
+
+    @staticmethod
+    def key(points):
+        """
+        Create a cache key from polygon vertices.
+
+        :param points: polygon vertices.
+        :type points: list of Vertex
+
+        :return: hashable tuple of vertices coordinates.
+        :rtype: tuple
+        """
+        return tuple((pt.x, pt.y) for pt in points)
+
+    @staticmethod
+    def _entry_size(key, triangles):
+        """
+        Estimate memory occupied by a cache entry.
+
+        :param key: entry key.
+        :type key: tuple
+        :param triangles: cached triangulation.
+        :type triangles: tuple
+
+        :return: size in bytes.
+        :rtype: integer
+        """
+        size = sys.getsizeof(key) + sys.getsizeof(triangles)
+        if(key):
+            size += len(key)*(sys.getsizeof(key[0]) + 2*sys.getsizeof(0.0))
+        if(triangles):
+            size += len(triangles)*sys.getsizeof(triangles[0])
+        return size
+
+    def get(self, key):
+        """
+        Get a cached triangulation and mark it as recently used.
+
+        :param key: cache key (see TriangulationCache.key()).
+        :type key: tuple
+
+        :return: triangles as triples of vertex indices, None if the key is
+                 not present in the cache.
+        :rtype: tuple
+        """
+        try:
+            size, triangles = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return triangles
+
+    def put(self, key, triangles):
+        """
+        Store a triangulation, evicting least recently used entries if the
+        memory limit is exceeded.
+
+        :param key: cache key (see TriangulationCache.key()).
+        :type key: tuple
+        :param triangles: triangles as triples of vertex indices.
+        :type triangles: list of tuple
+        """
+        self.invalidate(key)
+        triangles = tuple(triangles)
+        size = self._entry_size(key, triangles)
+        if(size > self.max_bytes):
+            return
+        self._entries[key] = (size, triangles)
+        self._size += size
+        while(self._size > self.max_bytes):
+            _, (evicted_size, _) = self._entries.popitem(last = False)
+            self._size -= evicted_size
+
+    def invalidate(self, key):
+        """
+        Remove a triangulation from the cache.
+
+        :param key: cache key (see TriangulationCache.key()).
+        :type key: tuple
+        """
+        entry = self._entries.pop(key, None)
+        if(entry is not None):
+            self._size -= entry[0]
+
+    def clear(self):
+        """
+        Remove all entries and reset the counters.
+        """
+        self._entries.clear()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+
+TRIANGULATION_CACHE = TriangulationCache()  #: cache shared by the parser and polygons.